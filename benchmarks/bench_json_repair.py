@@ -0,0 +1,78 @@
+"""Benchmark für den fehlertoleranten JSON-Parser."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from auto_pcg.ai.json_repair import parse_tolerant  # noqa: E402
+
+CORPUS_DIR = Path(__file__).resolve().parent / "json_repair_corpus"
+
+
+def _best_of(func: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _synthetic_truncated(entries: int) -> str:
+    item = {
+        "asset_path": "/Game/Environment/Trees/SM_Pine_{index:05d}.uasset",
+        "primary_category": "VEGETATION",
+        "sub_category": "Tree",
+        "tags": ["large", "green", "outdoor"],
+        "style": "realistic",
+        "biomes": ["forest", "mountain"],
+        "technical": {"polycount": 12000, "collision": "simple", "lod": True},
+    }
+    template = json.dumps(item)
+    body = ",\n".join(template.replace("{index:05d}", f"{index:05d}") for index in range(entries))
+    text = '{"classifications": [\n' + body + "]}"
+    # Mitten im letzten Eintrag abschneiden, wie bei erreichtem max_tokens.
+    return text[: len(text) - len(template) // 2]
+
+
+def run_corpus(repeat: int) -> None:
+    print(f"{'Datei':40} {'ok':>3} {'µs':>9}  Reparaturen")
+    for path in sorted(CORPUS_DIR.glob("*.txt")):
+        text = path.read_text(encoding="utf-8")
+        result = parse_tolerant(text)
+        elapsed = _best_of(lambda: parse_tolerant(text), repeat)
+        ok = "ja" if isinstance(result.value, dict) and not result.failed else "nein"
+        print(f"{path.name:40} {ok:>3} {elapsed * 1e6:9.1f}  {result.summary()}")
+
+
+def run_scaling(sizes: List[int], repeat: int) -> None:
+    print()
+    print(f"{'Einträge':>9} {'KiB':>9} {'ms':>9} {'µs/KiB':>9} {'gerettet':>9}")
+    for size in sizes:
+        text = _synthetic_truncated(size)
+        result = parse_tolerant(text)
+        elapsed = _best_of(lambda: parse_tolerant(text), repeat)
+        kib = len(text) / 1024
+        recovered = len(result.value.get("classifications", [])) if isinstance(result.value, dict) else 0
+        print(f"{size:9d} {kib:9.1f} {elapsed * 1e3:9.2f} {elapsed * 1e6 / kib:9.1f} {recovered:9d}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run_corpus(args.repeat)
+    run_scaling(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
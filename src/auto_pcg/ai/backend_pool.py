@@ -0,0 +1,777 @@
+"""LLM-Backends (Ollama, lokales GGUF) und Lastverteilung über mehrere Instanzen."""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .endpoint_health import STATE_CLOSED, EndpointHealth
+from .local_llm import LocalGGUFClient, LocalLLMBusy, LocalLLMError
+from .local_pool import LocalProcessPool
+from .telemetry import CallStats
+
+LOGGER = logging.getLogger(__name__)
+
+ROUTING_LEAST_OUTSTANDING = "least_outstanding"
+ROUTING_LATENCY = "latency"
+ROUTING_STRATEGIES = (ROUTING_LEAST_OUTSTANDING, ROUTING_LATENCY)
+
+JSONDecoder = Callable[[str], Optional[Dict[str, object]]]
+T = TypeVar("T")
+
+
+class LLMBackendError(RuntimeError):
+    """Ein Backend konnte die Anfrage nicht beantworten (Transport, Circuit, kaputtes JSON)."""
+
+
+class LLMBackendUnavailable(LLMBackendError):
+    """Das Backend ist gesperrt (offener Circuit) und wurde gar nicht angefragt."""
+
+
+class LLMBackend(ABC):
+    """Gemeinsame Schnittstelle für alle Backends im :class:`BackendPool`.
+
+    ``generate`` liefert ein dekodiertes JSON-Objekt, ``stream`` die Text-Deltas
+    der Antwort. Beide werfen :class:`LLMBackendError`, wenn ein anderes Backend
+    die Anfrage übernehmen soll. Ein übergebenes :class:`CallStats` ergänzen sie
+    um API-Modus und – soweit das Backend sie meldet – Token-Zahlen. ``timeout``
+    verkürzt die Wartezeit des einzelnen Aufrufs (Restbudget des Laufs).
+    """
+
+    kind = "backend"
+    # Kontextfenster und Antwortlimit, sofern bekannt (steuern die Batch-Größen).
+    context_tokens: Optional[int] = None
+    max_tokens: Optional[int] = None
+
+    def __init__(self, name: str, *, weight: float = 1.0, max_concurrency: int = 1) -> None:
+        self.name = name
+        self.weight = max(0.01, float(weight))
+        self.max_concurrency = max(1, int(max_concurrency))
+
+    @abstractmethod
+    def generate(
+        self,
+        prompt: str,
+        *,
+        decode: JSONDecoder,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        stats: Optional[CallStats] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, object]:
+        """Dekodierte JSON-Antwort auf ``prompt``."""
+
+    @abstractmethod
+    def stream(
+        self,
+        prompt: str,
+        *,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        stats: Optional[CallStats] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        """Text-Deltas der Antwort auf ``prompt``."""
+
+    def check(self) -> bool:
+        """Prüft die Erreichbarkeit (z. B. beim Start des Services)."""
+        return True
+
+    def healthy(self) -> bool:
+        """True, solange das Backend nicht gesperrt ist (ohne Netzwerkzugriff)."""
+        return True
+
+    def health(self) -> Dict[str, object]:
+        return {"endpoint": self.name, "state": STATE_CLOSED}
+
+
+class OllamaBackend(LLMBackend):
+    """Ollama-kompatibler HTTP-Endpunkt mit Circuit Breaker und API-Modus-Merker.
+
+    ``context_tokens``, ``max_tokens`` und ``temperature`` gehen als Ollama-
+    ``options`` (``num_ctx``, ``num_predict``, ``temperature``) mit jeder Anfrage.
+    """
+
+    kind = "ollama"
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "llama3",
+        *,
+        timeout: float = 10.0,
+        weight: float = 1.0,
+        max_concurrency: int = 1,
+        failure_threshold: int = 3,
+        backoff: float = 5.0,
+        context_tokens: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+    ) -> None:
+        base_url = base_url.rstrip("/")
+        super().__init__(f"{base_url}#{model}", weight=weight, max_concurrency=max_concurrency)
+        self.base_url = base_url
+        self.model = model
+        self.timeout = timeout
+        self.context_tokens = context_tokens
+        self.max_tokens = max_tokens
+        self.options: Dict[str, object] = {}
+        if context_tokens:
+            self.options["num_ctx"] = int(context_tokens)
+        if max_tokens:
+            self.options["num_predict"] = int(max_tokens)
+        if temperature is not None:
+            self.options["temperature"] = float(temperature)
+        self.session = self._create_session(self.max_concurrency)
+        self._health = EndpointHealth(base_url, failure_threshold=failure_threshold, base_backoff=backoff)
+
+    def resize_pool(self, pool_size: int) -> None:
+        """Passt den Connection-Pool an die Anzahl paralleler Worker an."""
+        if pool_size > self.max_concurrency:
+            self.session = self._create_session(pool_size)
+
+    def check(self) -> bool:
+        """Validiert, ob der Ollama-Endpunkt erreichbar ist."""
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=self.timeout)
+            response.raise_for_status()
+            self._health.record_reachable()
+            return True
+        except requests.RequestException as exc:  # pragma: no cover - nur Netzwerkausnahme
+            LOGGER.warning("Ollama nicht erreichbar (%s): %s", self.base_url, exc)
+            self._health.record_failure(str(exc))
+            return False
+
+    def healthy(self) -> bool:
+        return self._health.state == STATE_CLOSED
+
+    def health(self) -> Dict[str, object]:
+        return self._health.snapshot()
+
+    def generate(
+        self,
+        prompt: str,
+        *,
+        decode: JSONDecoder,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        stats: Optional[CallStats] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, object]:
+        """Sendet einen Prompt an Ollama und dekodiert JSON."""
+        probe = self._require_available()
+        try:
+            return self._generate(prompt, decode=decode, schema=schema, stats=stats, timeout=timeout)
+        finally:
+            if probe:
+                self._health.abort_probe()
+
+    def stream(
+        self,
+        prompt: str,
+        *,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        stats: Optional[CallStats] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        """Streamt die Antwort; ein Moduswechsel ist nur vor dem ersten Delta möglich."""
+        probe = self._require_available()
+        try:
+            yield from self._stream(prompt, schema=schema, stats=stats, timeout=timeout)
+        finally:
+            if probe:
+                self._health.abort_probe()
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _generate(
+        self,
+        prompt: str,
+        *,
+        decode: JSONDecoder,
+        schema: Optional[Dict[str, object]],
+        stats: Optional[CallStats],
+        timeout: Optional[float],
+    ) -> Dict[str, object]:
+        call_timeout = min(self.timeout, timeout) if timeout else self.timeout
+        last_exc: Optional[Exception] = None
+        for mode in self._health.ordered_modes(("chat", "generate")):
+            if stats is not None:
+                stats.mode = mode
+            try:
+                url, body = self._http_request(mode, prompt, stream=False, schema=schema)
+                response = self.session.post(url, json=body, timeout=call_timeout)
+                response.raise_for_status()
+                payload = response.json()
+                self._record_usage(stats, payload)
+                text = self._http_text(mode, payload).strip()
+                if not text:
+                    LOGGER.warning("Ollama-%s-Antwort enthielt keinen Text.", mode)
+                    continue
+                decoded = decode(text)
+                if decoded is None:
+                    raise json.JSONDecodeError("invalid json", text, 0)
+                self._health.record_success(mode)
+                return decoded
+            except (requests.RequestException, json.JSONDecodeError, KeyError) as exc:
+                self._raise_if_budget_timeout(exc, call_timeout)
+                last_exc = exc
+                LOGGER.warning("Ollama-%s-Request fehlgeschlagen (%s): %s", mode, self.base_url, exc)
+                if self._record_transport_failure(mode, exc):
+                    break
+        raise LLMBackendError(f"{self.base_url}: {last_exc or 'keine Antwort'}")
+
+    def _stream(
+        self,
+        prompt: str,
+        *,
+        schema: Optional[Dict[str, object]],
+        stats: Optional[CallStats],
+        timeout: Optional[float],
+    ) -> Iterator[str]:
+        call_timeout = min(self.timeout, timeout) if timeout else self.timeout
+        last_exc: Optional[Exception] = None
+        for mode in self._health.ordered_modes(("chat", "generate")):
+            emitted = False
+            if stats is not None:
+                stats.mode = mode
+            try:
+                url, body = self._http_request(mode, prompt, stream=True, schema=schema)
+                with self.session.post(url, json=body, timeout=call_timeout, stream=True) as response:
+                    response.raise_for_status()
+                    for text in self._iter_http_stream(mode, response, stats):
+                        emitted = True
+                        yield text
+                self._health.record_success(mode)
+                return
+            except (requests.RequestException, json.JSONDecodeError, KeyError) as exc:
+                self._raise_if_budget_timeout(exc, call_timeout)
+                last_exc = exc
+                LOGGER.warning("Ollama-%s-Stream fehlgeschlagen (%s): %s", mode, self.base_url, exc)
+                transport_failure = self._record_transport_failure(mode, exc)
+                if emitted or transport_failure:
+                    break
+        raise LLMBackendError(f"{self.base_url}: {last_exc or 'keine Antwort'}")
+
+    def _require_available(self) -> bool:
+        """Prüft den Circuit; True, wenn dieser Request nach dem Backoff der Half-Open-Probe ist."""
+        if self._health.allow_request():
+            return False
+        if not self._health.begin_probe():
+            raise LLMBackendUnavailable(f"{self.base_url}: Circuit offen")
+        LOGGER.info("LLM-Endpunkt %s: Backoff abgelaufen, nächster Request dient als Probe.", self.base_url)
+        return True
+
+    def _raise_if_budget_timeout(self, exc: Exception, call_timeout: float) -> None:
+        """Ein Timeout durch das verkürzte Restbudget zählt nicht als Ausfall des Endpunkts."""
+        if isinstance(exc, requests.Timeout) and call_timeout < self.timeout:
+            raise LLMBackendError(f"{self.base_url}: Zeitbudget nach {call_timeout:.1f}s erschöpft") from exc
+
+    def _record_transport_failure(self, mode: str, exc: Exception) -> bool:
+        """Meldet Fehler an den Circuit Breaker; True bei Ausfall des gesamten Endpunkts."""
+        if isinstance(exc, requests.HTTPError) and exc.response is not None:
+            status = exc.response.status_code
+            if status == 404:
+                self._health.mark_mode_unsupported(mode)
+                return False
+            if status < 500:
+                return False
+        if not isinstance(exc, requests.RequestException):
+            # Kaputtes JSON heisst: Server lebt, nur die Antwort war unbrauchbar.
+            return False
+        self._health.record_failure(f"{mode}: {exc}")
+        return True
+
+    def _http_request(
+        self,
+        mode: str,
+        prompt: str,
+        *,
+        stream: bool,
+        schema: Optional[Dict[str, object]] = None,
+    ) -> Tuple[str, Dict[str, object]]:
+        """Baut URL und Body für /api/chat bzw. /api/generate.
+
+        Ollama akzeptiert in ``format`` neben ``"json"`` auch ein JSON-Schema und
+        beschränkt die Ausgabe dann per Grammatik darauf.
+        """
+        output_format: object = schema or "json"
+        if mode == "chat":
+            url, body = f"{self.base_url}/api/chat", {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": "Antwort exakt mit gültigem JSON."},
+                    {"role": "user", "content": prompt},
+                ],
+                "stream": stream,
+                "format": output_format,
+                "response_format": {"type": "json_object"},
+            }
+        else:
+            url, body = f"{self.base_url}/api/generate", {
+                "model": self.model,
+                "prompt": prompt,
+                "stream": stream,
+                "format": output_format,
+            }
+        if self.options:
+            body["options"] = dict(self.options)
+        return url, body
+
+    @staticmethod
+    def _http_text(mode: str, payload: Dict[str, object]) -> str:
+        """Liest den Antworttext (bzw. das Stream-Delta) aus einer Ollama-Antwort."""
+        if mode == "chat":
+            message = payload.get("message") or {}
+            return str(message.get("content", "")) if isinstance(message, dict) else ""
+        return str(payload.get("response", ""))
+
+    def _iter_http_stream(
+        self,
+        mode: str,
+        response: requests.Response,
+        stats: Optional[CallStats] = None,
+    ) -> Iterable[str]:
+        """Zerlegt Ollamas NDJSON-Stream in Text-Deltas; der letzte Chunk trägt die Token-Zahlen."""
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            chunk = json.loads(line)
+            text = self._http_text(mode, chunk)
+            if text:
+                yield text
+            if chunk.get("done"):
+                self._record_usage(stats, chunk)
+                break
+
+    @staticmethod
+    def _record_usage(stats: Optional[CallStats], payload: Dict[str, object]) -> None:
+        """Übernimmt Token-Zahlen und Zeiten (Nanosekunden) aus Ollamas Abschlussdaten."""
+        if stats is None:
+            return
+        if isinstance(payload.get("prompt_eval_count"), int):
+            stats.prompt_tokens = payload["prompt_eval_count"]
+        if isinstance(payload.get("eval_count"), int):
+            stats.completion_tokens = payload["eval_count"]
+        prompt_eval = payload.get("prompt_eval_duration")
+        if stats.time_to_first_token is None and isinstance(prompt_eval, (int, float)):
+            load = payload.get("load_duration")
+            stats.time_to_first_token = (prompt_eval + (load if isinstance(load, (int, float)) else 0)) / 1e9
+
+    @staticmethod
+    def _create_session(pool_size: int) -> requests.Session:
+        """Erzeugt eine Session, deren Connection-Pool alle Worker bedienen kann."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(1, pool_size), pool_maxsize=max(1, pool_size))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+
+class LocalBackend(LLMBackend):
+    """Lokales GGUF-Modell; Aufrufe werden im Client ohnehin serialisiert.
+
+    Eine laufende Generierung lässt sich nicht abbrechen. ``timeout`` begrenzt
+    deshalb nur die Wartezeit auf das Modell, solange ein anderer Aufruf es hält;
+    ist es danach noch belegt, gilt das Backend als gesperrt (ohne Generierung).
+    """
+
+    kind = "gguf"
+
+    def __init__(self, client: LocalGGUFClient, *, weight: float = 1.0) -> None:
+        super().__init__(f"gguf:{client.model_path.name}", weight=weight, max_concurrency=1)
+        self.client = client
+        self.context_tokens = client.context_tokens
+        self.max_tokens = client.max_tokens
+
+    def generate(
+        self,
+        prompt: str,
+        *,
+        decode: JSONDecoder,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        stats: Optional[CallStats] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, object]:
+        usage: Dict[str, object] = {}
+        try:
+            text = self.client.complete_text(prompt, prefix=prefix, schema=schema, usage=usage, wait=timeout)
+        except LocalLLMBusy as exc:
+            raise LLMBackendUnavailable(f"{self.name}: {exc}") from exc
+        except LocalLLMError as exc:
+            LOGGER.error("Lokales LLM lieferte einen Fehler: %s", exc)
+            raise LLMBackendError(f"{self.name}: {exc}") from exc
+        if stats is not None:
+            stats.apply_usage(usage)
+        decoded = decode(text)
+        if decoded is None:
+            raise LLMBackendError(f"{self.name}: ungültige JSON-Antwort")
+        return decoded
+
+    def stream(
+        self,
+        prompt: str,
+        *,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        stats: Optional[CallStats] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        try:
+            yield from self.client.stream_text(prompt, prefix=prefix, schema=schema, wait=timeout)
+        except LocalLLMBusy as exc:
+            raise LLMBackendUnavailable(f"{self.name}: {exc}") from exc
+        except LocalLLMError as exc:
+            LOGGER.error("Lokales LLM lieferte einen Fehler: %s", exc)
+            raise LLMBackendError(f"{self.name}: {exc}") from exc
+
+
+class LocalProcessBackend(LLMBackend):
+    """Mehrere lokale GGUF-Prozesse (:class:`LocalProcessPool`), je einer pro parallelem Aufruf."""
+
+    kind = "gguf-pool"
+
+    def __init__(self, pool: LocalProcessPool, *, weight: float = 1.0) -> None:
+        super().__init__(
+            f"gguf:{pool.model_path.name}x{pool.processes}",
+            weight=weight,
+            max_concurrency=pool.processes,
+        )
+        self.pool = pool
+        self.context_tokens = pool.context_tokens
+        self.max_tokens = pool.max_tokens
+
+    def generate(
+        self,
+        prompt: str,
+        *,
+        decode: JSONDecoder,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        stats: Optional[CallStats] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, object]:
+        text = self._complete(prompt, prefix, schema, stats, timeout)
+        decoded = decode(text)
+        if decoded is None:
+            raise LLMBackendError(f"{self.name}: ungültige JSON-Antwort")
+        return decoded
+
+    def stream(
+        self,
+        prompt: str,
+        *,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        stats: Optional[CallStats] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        # Die Worker liefern nur vollständige Antworten; der Stream besteht aus einem Delta.
+        yield self._complete(prompt, prefix, schema, stats, timeout)
+
+    def check(self) -> bool:
+        return self.pool.wait_ready(timeout=self.pool.request_timeout)
+
+    def healthy(self) -> bool:
+        return self.pool.alive_workers > 0
+
+    def health(self) -> Dict[str, object]:
+        return {"endpoint": self.name, "state": STATE_CLOSED, "alive_workers": self.pool.alive_workers}
+
+    def _complete(
+        self,
+        prompt: str,
+        prefix: Optional[str],
+        schema: Optional[Dict[str, object]],
+        stats: Optional[CallStats] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        usage: Dict[str, object] = {}
+        try:
+            text = self.pool.complete_text(prompt, prefix=prefix, schema=schema, usage=usage, timeout=timeout)
+        except LocalLLMError as exc:
+            LOGGER.error("Lokaler LLM-Prozess lieferte einen Fehler: %s", exc)
+            raise LLMBackendError(f"{self.name}: {exc}") from exc
+        if stats is not None:
+            stats.apply_usage(usage)
+        return text
+
+
+class _BackendStats:
+    """Zähler eines Backends; wird nur unter dem Pool-Lock verändert."""
+
+    __slots__ = ("outstanding", "requests", "successes", "failures", "items", "busy_seconds", "latency_ewma")
+
+    def __init__(self) -> None:
+        self.outstanding = 0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.latency_ewma: Optional[float] = None
+
+
+class BackendPool:
+    """Verteilt Anfragen auf mehrere Backends und weicht bei Fehlern aus.
+
+    ``least_outstanding`` wählt das Backend mit den wenigsten laufenden Anfragen
+    relativ zu Gewicht und Parallelität; ``latency`` gewichtet zusätzlich mit der
+    geglätteten Antwortzeit. Gesperrte Backends (offener Circuit) kommen zuletzt
+    dran. Schlägt ein Backend fehl, übernimmt das nächstbeste, bis alle einmal
+    versucht wurden.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[LLMBackend],
+        *,
+        routing: str = ROUTING_LEAST_OUTSTANDING,
+        latency_smoothing: float = 0.3,
+    ) -> None:
+        if not backends:
+            raise ValueError("BackendPool benötigt mindestens ein Backend.")
+        if routing not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unbekannte Routing-Strategie: {routing}")
+        self.backends: List[LLMBackend] = list(backends)
+        self.routing = routing
+        self._alpha = min(1.0, max(0.01, latency_smoothing))
+        self._lock = threading.Lock()
+        # Nach Identität statt Name: zwei gleiche Specs ergeben zwei Backends mit demselben Namen.
+        self._stats: Dict[int, _BackendStats] = {id(backend): _BackendStats() for backend in self.backends}
+        self._started = time.perf_counter()
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    @property
+    def total_concurrency(self) -> int:
+        """Summe der sinnvollen Parallelität aller Backends."""
+        return sum(backend.max_concurrency for backend in self.backends)
+
+    @property
+    def context_tokens(self) -> Optional[int]:
+        """Kleinstes bekanntes Kontextfenster; jede Anfrage muss in jedes Backend passen."""
+        known = [backend.context_tokens for backend in self.backends if backend.context_tokens]
+        return min(known) if known else None
+
+    @property
+    def max_tokens(self) -> Optional[int]:
+        """Kleinstes bekanntes Antwortlimit der Backends."""
+        known = [backend.max_tokens for backend in self.backends if backend.max_tokens]
+        return min(known) if known else None
+
+    def local_backends(self) -> List[LocalBackend]:
+        return [backend for backend in self.backends if isinstance(backend, LocalBackend)]
+
+    def http_backends(self) -> List[OllamaBackend]:
+        return [backend for backend in self.backends if isinstance(backend, OllamaBackend)]
+
+    def call(self, operation: Callable[[LLMBackend], T], *, items: int = 1) -> Optional[T]:
+        """Führt ``operation`` auf dem besten Backend aus, bei Fehlern auf dem nächsten."""
+        tried: Set[int] = set()
+        while len(tried) < len(self.backends):
+            backend = self._acquire(tried)
+            tried.add(id(backend))
+            started = time.perf_counter()
+            try:
+                result = operation(backend)
+            except LLMBackendError as exc:
+                self._release(backend, time.perf_counter() - started, success=False)
+                if isinstance(exc, LLMBackendUnavailable):
+                    LOGGER.debug("Backend %s gesperrt – überspringe.", backend.name)
+                elif len(tried) < len(self.backends):
+                    LOGGER.info("Backend %s fehlgeschlagen (%s) – weiche aus.", backend.name, exc)
+                else:
+                    LOGGER.warning("Alle LLM-Backends fehlgeschlagen, zuletzt %s: %s", backend.name, exc)
+                continue
+            except BaseException:
+                self._release(backend, time.perf_counter() - started, success=False)
+                raise
+            self._release(backend, time.perf_counter() - started, success=True, items=items)
+            return result
+        return None
+
+    def check_all(self) -> bool:
+        """Prüft alle Backends; True, wenn mindestens eines erreichbar ist."""
+        results = [backend.check() for backend in self.backends]
+        return any(results)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Kennzahlen je Backend inkl. Durchsatz (Anfragen bzw. Items pro Sekunde)."""
+        elapsed = max(1e-6, time.perf_counter() - self._started)
+        with self._lock:
+            backends = []
+            for backend in self.backends:
+                stats = self._stats[id(backend)]
+                backends.append(
+                    {
+                        "name": backend.name,
+                        "kind": backend.kind,
+                        "weight": backend.weight,
+                        "max_concurrency": backend.max_concurrency,
+                        "state": backend.health().get("state", STATE_CLOSED),
+                        "outstanding": stats.outstanding,
+                        "requests": stats.requests,
+                        "successes": stats.successes,
+                        "failures": stats.failures,
+                        "items": stats.items,
+                        "latency_ewma": round(stats.latency_ewma, 3) if stats.latency_ewma is not None else None,
+                        "requests_per_second": round(stats.successes / elapsed, 3),
+                        "items_per_second": round(stats.items / elapsed, 3),
+                        "items_per_busy_second": round(stats.items / stats.busy_seconds, 3)
+                        if stats.busy_seconds > 0
+                        else 0.0,
+                    }
+                )
+        return {"routing": self.routing, "elapsed": round(elapsed, 2), "backends": backends}
+
+    def log_summary(self) -> None:
+        """Schreibt den Durchsatz je Backend ins Log (nur bei mehreren Backends)."""
+        if len(self.backends) < 2:
+            return
+        for entry in self.snapshot()["backends"]:  # type: ignore[union-attr]
+            LOGGER.info(
+                "Backend %s: %s Anfragen, %s Fehler, %s Items (%.2f Items/s), Latenz %s s.",
+                entry["name"],
+                entry["requests"],
+                entry["failures"],
+                entry["items"],
+                entry["items_per_second"],
+                entry["latency_ewma"],
+            )
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _acquire(self, exclude: Set[int]) -> LLMBackend:
+        with self._lock:
+            candidates = [backend for backend in self.backends if id(backend) not in exclude]
+            backend = min(candidates, key=self._score)
+            stats = self._stats[id(backend)]
+            stats.outstanding += 1
+            stats.requests += 1
+            return backend
+
+    def _release(self, backend: LLMBackend, latency: float, *, success: bool, items: int = 0) -> None:
+        with self._lock:
+            stats = self._stats[id(backend)]
+            stats.outstanding = max(0, stats.outstanding - 1)
+            stats.busy_seconds += latency
+            if success:
+                stats.successes += 1
+                stats.items += items
+                if stats.latency_ewma is None:
+                    stats.latency_ewma = latency
+                else:
+                    stats.latency_ewma += self._alpha * (latency - stats.latency_ewma)
+            else:
+                stats.failures += 1
+
+    def _score(self, backend: LLMBackend) -> Tuple[int, float, float]:
+        """Kleiner ist besser; gesunde Backends immer vor gesperrten (Lock muss gehalten werden)."""
+        stats = self._stats[id(backend)]
+        load = (stats.outstanding + 1) / (backend.weight * backend.max_concurrency)
+        latency = stats.latency_ewma if stats.latency_ewma is not None else 0.0
+        if self.routing == ROUTING_LATENCY:
+            # Unbekannte Latenz zählt als 0, damit jedes Backend zuerst gemessen wird.
+            primary = load * latency if stats.latency_ewma is not None else 0.0
+            return (0 if backend.healthy() else 1, primary, load)
+        return (0 if backend.healthy() else 1, load, latency)
+
+
+def parse_backend_spec(
+    spec: str,
+    *,
+    default_model: str = "llama3",
+    timeout: float = 10.0,
+) -> LLMBackend:
+    """Erzeugt ein Backend aus einer Kurzbeschreibung.
+
+    Formate (Optionen kommagetrennt nach der Adresse)::
+
+        http://gpu-box-1:11434,model=llama3,weight=2,concurrency=4
+        gguf:/models/llama-3-8b.Q4_K_M.gguf,weight=1,ctx=8192
+        gguf:/models/llama-3-8b.Q4_K_M.gguf,processes=8,threads=8
+
+    ``ctx``, ``max_tokens`` und ``temperature`` gelten für beide Backend-Arten.
+    Mit ``processes`` (> 1) laufen mehrere GGUF-Prozesse mit je ``threads`` Threads.
+    """
+    parts = [part.strip() for part in spec.split(",") if part.strip()]
+    if not parts:
+        raise ValueError("Leere Backend-Beschreibung.")
+    target, options = parts[0], {}
+    for option in parts[1:]:
+        key, _, value = option.partition("=")
+        options[key.strip().lower()] = value.strip()
+    weight = float(options.get("weight", 1.0))
+    if target.lower().startswith("gguf:") or target.lower().endswith(".gguf"):
+        path = Path(target[5:] if target.lower().startswith("gguf:") else target).expanduser()
+        client_kwargs: Dict[str, object] = {}
+        if "ctx" in options:
+            client_kwargs["context_tokens"] = int(options["ctx"])
+        if "gpu_layers" in options:
+            client_kwargs["n_gpu_layers"] = int(options["gpu_layers"])
+        if "max_tokens" in options:
+            client_kwargs["max_tokens"] = int(options["max_tokens"])
+        if "temperature" in options:
+            client_kwargs["temperature"] = float(options["temperature"])
+        processes = int(options.get("processes", 1))
+        if processes > 1:
+            return LocalProcessBackend(
+                LocalProcessPool.shared(
+                    path,
+                    processes=processes,
+                    threads_per_process=int(options["threads"]) if "threads" in options else None,
+                    **client_kwargs,  # type: ignore[arg-type]
+                ),
+                weight=weight,
+            )
+        if "threads" in options:
+            client_kwargs["n_threads"] = int(options["threads"])
+        return LocalBackend(LocalGGUFClient(path, **client_kwargs), weight=weight)  # type: ignore[arg-type]
+    if "://" not in target:
+        target = f"http://{target}"
+    return OllamaBackend(
+        target,
+        options.get("model", default_model),
+        timeout=float(options.get("timeout", timeout)),
+        weight=weight,
+        max_concurrency=int(options.get("concurrency", 1)),
+        context_tokens=int(options["ctx"]) if "ctx" in options else None,
+        max_tokens=int(options["max_tokens"]) if "max_tokens" in options else None,
+        temperature=float(options["temperature"]) if "temperature" in options else None,
+    )
+
+
+def parse_task_route(
+    spec: str,
+    *,
+    default_url: str = "http://localhost:11434",
+    default_model: str = "llama3",
+    timeout: float = 10.0,
+) -> Tuple[str, LLMBackend]:
+    """Zerlegt ``AUFGABE=BACKEND`` in Aufgabe und Backend.
+
+    Beginnt die Backend-Beschreibung direkt mit Optionen, gilt ``default_url``::
+
+        classification=model=qwen2.5:1.5b-instruct-q4_K_M,ctx=2048,max_tokens=512,temperature=0.1
+        pcg_plan=http://gpu-box:11434,model=llama3:70b,ctx=8192
+        layer_plan=gguf:/models/llama-3-8b.Q4_K_M.gguf,temperature=0.3
+    """
+    task, separator, backend_spec = spec.partition("=")
+    task = task.strip().lower()
+    if not separator or not task or not backend_spec.strip():
+        raise ValueError(f"Routing-Eintrag erwartet AUFGABE=BACKEND: {spec}")
+    if "=" in backend_spec.split(",", 1)[0]:
+        backend_spec = f"{default_url},{backend_spec}"
+    return task, parse_backend_spec(backend_spec, default_model=default_model, timeout=timeout)
@@ -0,0 +1,174 @@
+"""Dynamische Batch-Größen für die LLM-Klassifikation (Token-Budget + AIMD)."""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+from auto_pcg.models.schemas import AssetData
+
+from .prompt_engine import PromptEngine
+
+LOGGER = logging.getLogger(__name__)
+
+# Grobe Faustregel für JSON/Deutsch-Mischtext bei Llama-artigen Tokenizern.
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Schätzt die Tokenanzahl eines Texts ohne Tokenizer."""
+    if not text:
+        return 0
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+@dataclass(slots=True)
+class BatchObservation:
+    """Ein abgeschlossener Batch inklusive Kennzahlen für Logs und Metriken."""
+
+    size: int
+    prompt_tokens: int
+    latency: float
+    success: bool
+    window_after: int
+
+
+class AdaptiveBatchSizer:
+    """Wählt Batch-Größen nach Token-Budget und passt das Fenster per AIMD an.
+
+    Das Fenster wächst additiv, solange Batches vollständig und unter der
+    Ziel-Latenz zurückkommen, und halbiert sich bei Parse-Fehlern, fehlenden
+    Einträgen oder zu langsamen Antworten.
+    """
+
+    def __init__(
+        self,
+        prompt_engine: PromptEngine,
+        *,
+        initial_size: int = 10,
+        min_size: int = 1,
+        max_size: int = 64,
+        context_tokens: int = 4096,
+        max_response_tokens: Optional[int] = None,
+        response_tokens_per_asset: int = 96,
+        target_latency: Optional[float] = None,
+        additive_step: int = 1,
+        decrease_factor: float = 0.5,
+        adaptive: bool = True,
+    ) -> None:
+        self._prompt_engine = prompt_engine
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.context_tokens = max(256, context_tokens)
+        self.max_response_tokens = max_response_tokens
+        self.response_tokens_per_asset = max(1, response_tokens_per_asset)
+        self.target_latency = target_latency
+        self.additive_step = max(1, additive_step)
+        self.decrease_factor = min(0.95, max(0.05, decrease_factor))
+        self.adaptive = adaptive
+        self._window = min(self.max_size, max(self.min_size, initial_size))
+        self._overhead_tokens: Optional[int] = None
+        self._asset_tokens: Dict[str, int] = {}
+        self._history: List[BatchObservation] = []
+        self._lock = threading.Lock()
+
+    @property
+    def window(self) -> int:
+        """Aktuelle Obergrenze für die Anzahl Assets pro Batch."""
+        return self._window
+
+    def next_batch_size(self, assets: Sequence[AssetData], start: int = 0) -> int:
+        """Liefert, wie viele Assets ab ``start`` in den nächsten Batch passen."""
+        remaining = len(assets) - start
+        if remaining <= 0:
+            return 0
+        with self._lock:
+            window = self._window
+        limit = min(window, remaining)
+        if self.max_response_tokens:
+            limit = min(limit, max(1, self.max_response_tokens // self.response_tokens_per_asset))
+        budget = self.context_tokens - self._prompt_overhead()
+        size = 0
+        used = 0
+        for asset in assets[start : start + limit]:
+            cost = self._asset_cost(asset) + self.response_tokens_per_asset
+            if size and used + cost > budget:
+                break
+            used += cost
+            size += 1
+        return max(1, size)
+
+    def estimate_prompt_tokens(self, batch: Sequence[AssetData]) -> int:
+        """Schätzt die Prompt-Tokens eines Batches aus den gecachten Einzelkosten."""
+        return self._prompt_overhead() + sum(self._asset_cost(asset) for asset in batch)
+
+    def record(
+        self,
+        batch_size: int,
+        latency: float,
+        returned: int,
+        prompt_tokens: int = 0,
+    ) -> BatchObservation:
+        """Meldet das Ergebnis eines Batches und passt das Fenster an."""
+        success = returned >= batch_size
+        too_slow = self.target_latency is not None and latency > self.target_latency
+        with self._lock:
+            if self.adaptive:
+                if success and not too_slow:
+                    # Nur wachsen, wenn der Batch das Fenster auch ausgeschöpft hat.
+                    if batch_size >= self._window:
+                        self._window = min(self.max_size, self._window + self.additive_step)
+                else:
+                    reduced = int(math.floor(min(self._window, batch_size) * self.decrease_factor))
+                    self._window = max(self.min_size, reduced)
+            observation = BatchObservation(
+                size=batch_size,
+                prompt_tokens=prompt_tokens,
+                latency=round(latency, 3),
+                success=success,
+                window_after=self._window,
+            )
+            self._history.append(observation)
+        if not success or too_slow:
+            LOGGER.info(
+                "Batch-Fenster reduziert auf %s (%s/%s Ergebnisse, %.1fs).",
+                observation.window_after,
+                returned,
+                batch_size,
+                latency,
+            )
+        return observation
+
+    def snapshot(self) -> Dict[str, object]:
+        """Aggregierte Kennzahlen der bisher gewählten Batch-Größen."""
+        with self._lock:
+            history = list(self._history)
+            window = self._window
+        sizes = [entry.size for entry in history]
+        return {
+            "adaptive": self.adaptive,
+            "window": window,
+            "batches": len(history),
+            "chosen_sizes": sizes,
+            "mean_size": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            "failed_batches": sum(1 for entry in history if not entry.success),
+            "history": [asdict(entry) for entry in history],
+        }
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _prompt_overhead(self) -> int:
+        if self._overhead_tokens is None:
+            self._overhead_tokens = estimate_tokens(self._prompt_engine.build_asset_classification_prompt([]))
+        return self._overhead_tokens
+
+    def _asset_cost(self, asset: AssetData) -> int:
+        cost = self._asset_tokens.get(asset.asset_id)
+        if cost is None:
+            single = estimate_tokens(self._prompt_engine.build_asset_classification_prompt([asset]))
+            cost = max(1, single - self._prompt_overhead())
+            self._asset_tokens[asset.asset_id] = cost
+        return cost
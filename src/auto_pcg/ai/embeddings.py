@@ -0,0 +1,175 @@
+"""Embedding-Quellen für den semantischen Asset-Index (Ollama, lokales GGUF)."""
+
+from __future__ import annotations
+
+import logging
+import os
+from functools import partial
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import requests
+
+from auto_pcg.data.vector_index import Embedder, HashedNgramEmbedder
+
+from .local_llm import LocalGGUFClient
+from .model_registry import ModelKey, ModelRegistry, get_model_registry
+
+try:
+    from llama_cpp import Llama  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    Llama = None
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_OLLAMA_EMBEDDING_MODEL = "nomic-embed-text"
+
+
+class EmbeddingError(RuntimeError):
+    """Ein Embedding-Modell konnte keine Vektoren liefern."""
+
+
+class OllamaEmbedder(Embedder):
+    """Vektoren über Ollama; bevorzugt das gebündelte ``/api/embed``.
+
+    Ältere Ollama-Versionen kennen nur ``/api/embeddings`` (ein Text pro
+    Anfrage); nach einem 404 wird dauerhaft dorthin gewechselt.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = DEFAULT_OLLAMA_EMBEDDING_MODEL,
+        *,
+        timeout: float = 30.0,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.name = f"ollama-{model}"
+        self.session = requests.Session()
+        self._batch_endpoint = True
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        try:
+            if self._batch_endpoint:
+                response = self.session.post(
+                    f"{self.base_url}/api/embed",
+                    json={"model": self.model, "input": list(texts)},
+                    timeout=self.timeout,
+                )
+                if response.status_code != 404:
+                    response.raise_for_status()
+                    return self._check([list(map(float, vector)) for vector in response.json()["embeddings"]], texts)
+                LOGGER.info("Ollama ohne /api/embed (%s) – nutze /api/embeddings.", self.base_url)
+                self._batch_endpoint = False
+            vectors = []
+            for text in texts:
+                response = self.session.post(
+                    f"{self.base_url}/api/embeddings",
+                    json={"model": self.model, "prompt": text},
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                vectors.append([float(value) for value in response.json()["embedding"]])
+            return self._check(vectors, texts)
+        except (requests.RequestException, KeyError, TypeError, ValueError) as exc:
+            raise EmbeddingError(f"{self.base_url}#{self.model}: {exc}") from exc
+
+    def _check(self, vectors: List[List[float]], texts: Sequence[str]) -> List[List[float]]:
+        if len(vectors) != len(texts) or any(not vector for vector in vectors):
+            raise EmbeddingError(f"{self.base_url}#{self.model}: unvollständige Embedding-Antwort")
+        self.dimensions = len(vectors[0])
+        return vectors
+
+
+class GGUFEmbedder(Embedder):
+    """Lokales GGUF-Embedding-Modell über llama.cpp (``embedding=True``).
+
+    Die Instanz liegt in der prozessweiten :class:`ModelRegistry`, getrennt von
+    Chat-Instanzen desselben Modells.
+    """
+
+    def __init__(
+        self,
+        model_path: Path,
+        *,
+        context_tokens: int = 2048,
+        n_gpu_layers: Optional[int] = None,
+        registry: Optional[ModelRegistry] = None,
+    ) -> None:
+        if Llama is None:
+            raise EmbeddingError(
+                "llama-cpp-python ist nicht installiert. Bitte `pip install llama-cpp-python` ausführen."
+            )
+        if not model_path.exists():
+            raise EmbeddingError(f"GGUF-Embedding-Modell nicht gefunden: {model_path}")
+        self.model_path = model_path
+        self.name = f"gguf-{model_path.stem}"
+        self._registry = registry or get_model_registry()
+        gpu_layers = LocalGGUFClient._resolve_gpu_layers(n_gpu_layers)
+        self._model_key = ModelKey.create(model_path, context_tokens, gpu_layers, "embedding")
+        self._loader = partial(
+            Llama,
+            model_path=str(model_path),
+            n_ctx=context_tokens,
+            n_threads=os.cpu_count() or 4,
+            n_gpu_layers=gpu_layers,
+            embedding=True,
+            verbose=False,
+        )
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        try:
+            with self._registry.lease(self._model_key, self._loader) as handle:
+                raw = handle.llama.embed(list(texts))
+        except (OSError, RuntimeError, ValueError) as exc:
+            raise EmbeddingError(f"{self.name}: {exc}") from exc
+        vectors = [_pool(vector) for vector in raw]
+        if len(vectors) != len(texts) or any(not vector for vector in vectors):
+            raise EmbeddingError(f"{self.name}: unvollständige Embedding-Antwort")
+        self.dimensions = len(vectors[0])
+        return vectors
+
+
+def create_embedder(
+    spec: str,
+    *,
+    default_url: str = "http://localhost:11434",
+    timeout: float = 30.0,
+) -> Embedder:
+    """Erzeugt eine Embedding-Quelle aus einer Kurzbeschreibung.
+
+    Formate::
+
+        hash                                   (modellfrei, 256 Dimensionen)
+        hash:512
+        ollama                                 (nomic-embed-text am Standard-Endpunkt)
+        ollama:mxbai-embed-large@http://gpu-box:11434
+        gguf:/models/nomic-embed-text-v1.5.Q8_0.gguf
+    """
+    spec = spec.strip()
+    kind, _, target = spec.partition(":")
+    kind = kind.lower()
+    if kind == "hash":
+        return HashedNgramEmbedder(int(target) if target.strip() else 256)
+    if kind == "ollama":
+        model, _, url = target.partition("@")
+        return OllamaEmbedder(url.strip() or default_url, model.strip() or DEFAULT_OLLAMA_EMBEDDING_MODEL, timeout=timeout)
+    if kind == "gguf" or spec.lower().endswith(".gguf"):
+        return GGUFEmbedder(Path(target if kind == "gguf" else spec).expanduser())
+    raise ValueError(f"Unbekannte Embedding-Quelle: {spec}")
+
+
+def _pool(vector: object) -> List[float]:
+    """Mittelt Token-Vektoren, falls das Modell kein gepooltes Embedding liefert."""
+    if not isinstance(vector, list) or not vector:
+        return []
+    if isinstance(vector[0], list):
+        width = len(vector[0])
+        return [sum(token[index] for token in vector) / len(vector) for index in range(width)]
+    return [float(value) for value in vector]
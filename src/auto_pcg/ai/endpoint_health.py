@@ -0,0 +1,177 @@
+"""Gesundheitszustand und Circuit Breaker für LLM-HTTP-Endpunkte."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class EndpointHealth:
+    """Merkt sich funktionierende API-Modi und sperrt ausgefallene Endpunkte.
+
+    Nach ``failure_threshold`` aufeinanderfolgenden Transportfehlern öffnet der
+    Circuit: Requests werden sofort abgewiesen, bis die Backoff-Zeit abgelaufen
+    ist. Danach darf genau ein echter Request als Probe laufen (half-open); sein
+    Erfolg schließt den Circuit und setzt den Backoff zurück, ein Transportfehler
+    öffnet ihn erneut mit verdoppeltem Backoff. Ein Ping auf ``/api/tags`` reicht
+    dafür nicht: Der Server kann Tags liefern, während Generierungen hängen.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 3,
+        base_backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_backoff = max(0.1, base_backoff)
+        self.max_backoff = max(self.base_backoff, max_backoff)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._open_count = 0
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._preferred_mode: Optional[str] = None
+        self._unsupported_modes: Set[str] = set()
+        self._successes = 0
+        self._failures = 0
+        self._rejected = 0
+        self._last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    @property
+    def preferred_mode(self) -> Optional[str]:
+        with self._lock:
+            return self._preferred_mode
+
+    def allow_request(self) -> bool:
+        """True, wenn der Circuit geschlossen ist und normal angefragt werden darf."""
+        with self._lock:
+            return self._state == STATE_CLOSED
+
+    def begin_probe(self) -> bool:
+        """Reserviert den Half-Open-Probe, sobald die Backoff-Zeit abgelaufen ist.
+
+        Der Aufrufer schickt dann seinen eigentlichen Request und meldet das Ergebnis
+        über :meth:`record_success`, :meth:`record_failure` oder :meth:`abort_probe`.
+        """
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return False
+            if self._probe_in_flight or self._clock() < self._open_until:
+                self._rejected += 1
+                return False
+            self._state = STATE_HALF_OPEN
+            self._probe_in_flight = True
+            return True
+
+    def abort_probe(self) -> None:
+        """Gibt einen Probe ohne Aussage frei (z. B. Budget-Timeout, unbrauchbares JSON).
+
+        Der Circuit bleibt offen, der nächste Request darf sofort erneut proben;
+        der Backoff wächst nicht.
+        """
+        with self._lock:
+            if self._state == STATE_HALF_OPEN and self._probe_in_flight:
+                self._probe_in_flight = False
+                self._state = STATE_OPEN
+
+    def ordered_modes(self, modes: Iterable[str]) -> List[str]:
+        """Sortiert API-Modi: bewährter Modus zuerst, bekannte 404-Modi zuletzt."""
+        with self._lock:
+            preferred = self._preferred_mode
+            unsupported = set(self._unsupported_modes)
+        candidates = [mode for mode in modes if mode not in unsupported] or list(modes)
+        if preferred in candidates:
+            candidates.remove(preferred)
+            candidates.insert(0, preferred)
+        return candidates
+
+    def record_success(self, mode: Optional[str] = None) -> None:
+        """Erfolgreiche Generierung: schließt den Circuit und setzt den Backoff zurück."""
+        with self._lock:
+            self._successes += 1
+            self._consecutive_failures = 0
+            self._open_count = 0
+            recovered = self._state != STATE_CLOSED
+            self._state = STATE_CLOSED
+            self._probe_in_flight = False
+            if mode:
+                self._preferred_mode = mode
+        if recovered:
+            LOGGER.info("LLM-Endpunkt %s wieder erreichbar – Circuit geschlossen.", self.name)
+
+    def record_reachable(self) -> None:
+        """Erreichbarkeits-Check (z. B. ``/api/tags``) ohne Einfluss auf einen offenen Circuit."""
+        with self._lock:
+            self._successes += 1
+            if self._state == STATE_CLOSED:
+                self._consecutive_failures = 0
+
+    def record_failure(self, error: str) -> None:
+        """Zählt einen Transportfehler (Timeout, Verbindungsabbruch, 5xx)."""
+        with self._lock:
+            self._failures += 1
+            self._consecutive_failures += 1
+            self._last_error = error
+            self._probe_in_flight = False
+            if self._state == STATE_HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._open_circuit(error)
+
+    def mark_mode_unsupported(self, mode: str) -> None:
+        """Merkt sich, dass ein API-Modus am Endpunkt fehlt (z. B. HTTP 404)."""
+        with self._lock:
+            self._unsupported_modes.add(mode)
+            if self._preferred_mode == mode:
+                self._preferred_mode = None
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "endpoint": self.name,
+                "state": self._state,
+                "preferred_mode": self._preferred_mode,
+                "unsupported_modes": sorted(self._unsupported_modes),
+                "consecutive_failures": self._consecutive_failures,
+                "retry_in": round(max(0.0, self._open_until - self._clock()), 2)
+                if self._state != STATE_CLOSED
+                else 0.0,
+                "successes": self._successes,
+                "failures": self._failures,
+                "rejected": self._rejected,
+                "last_error": self._last_error,
+            }
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _open_circuit(self, error: str) -> None:
+        """Öffnet den Circuit mit exponentiellem Backoff (Lock muss gehalten werden)."""
+        self._open_count += 1
+        backoff = min(self.max_backoff, self.base_backoff * (2 ** (self._open_count - 1)))
+        self._open_until = self._clock() + backoff
+        self._state = STATE_OPEN
+        self._last_error = error
+        LOGGER.warning(
+            "LLM-Endpunkt %s gesperrt fuer %.1fs (%s). Nutze Heuristiken.",
+            self.name,
+            backoff,
+            error,
+        )
@@ -0,0 +1,447 @@
+"""Fehlertoleranter JSON-Parser für unvollständige oder fehlerhafte LLM-Antworten."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+# Reparaturarten, die im Ergebnis gemeldet werden.
+REPAIR_SKIPPED_LEADING_TEXT = "skipped_leading_text"
+REPAIR_IGNORED_TRAILING_TEXT = "ignored_trailing_text"
+REPAIR_TRAILING_COMMA = "removed_trailing_comma"
+REPAIR_MISSING_COMMA = "inserted_comma"
+REPAIR_CLOSED_CONTAINER = "closed_container"
+REPAIR_UNBALANCED_CLOSER = "closed_unbalanced"
+REPAIR_DROPPED_MEMBER = "dropped_incomplete_member"
+REPAIR_DROPPED_ELEMENT = "dropped_incomplete_element"
+REPAIR_DROPPED_VALUE = "dropped_incomplete_value"
+REPAIR_TRUNCATED = "truncated_at_error"
+REPAIR_SINGLE_QUOTES = "single_quoted_string"
+REPAIR_UNQUOTED_KEY = "unquoted_key"
+REPAIR_PYTHON_LITERAL = "python_literal"
+REPAIR_CONTROL_CHARACTER = "raw_control_character"
+REPAIR_INVALID_ESCAPE = "invalid_escape"
+REPAIR_NO_JSON = "no_json_found"
+# Reparaturen, die auf eine abgeschnittene Antwort hindeuten: der Wert ist unvollständig.
+TRUNCATION_REPAIRS = frozenset(
+    {REPAIR_CLOSED_CONTAINER, REPAIR_DROPPED_MEMBER, REPAIR_DROPPED_ELEMENT, REPAIR_DROPPED_VALUE, REPAIR_TRUNCATED}
+)
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_IDENTIFIER = re.compile(r"[A-Za-z_$][A-Za-z0-9_$\-]*")
+_STRING_RUNS = {
+    '"': re.compile(r'[^"\\\x00-\x1f]*'),
+    "'": re.compile(r"[^'\\\x00-\x1f]*"),
+}
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "'": "'"}
+_LITERALS = {
+    "true": (True, False),
+    "false": (False, False),
+    "null": (None, False),
+    "True": (True, True),
+    "False": (False, True),
+    "None": (None, True),
+}
+_CLOSER = {"{": "}", "[": "]"}
+# Höchstzahl an Startpunkten, falls Prosa vor dem JSON selbst Klammern enthält.
+_MAX_START_ATTEMPTS = 8
+
+
+@dataclass(slots=True)
+class JSONRepair:
+    """Eine einzelne Korrektur samt Position im Eingabetext."""
+
+    kind: str
+    position: int
+
+
+@dataclass(slots=True)
+class RepairResult:
+    """Ergebnis von :func:`parse_tolerant`."""
+
+    value: Optional[object]
+    repairs: List[JSONRepair] = field(default_factory=list)
+    consumed: int = 0
+
+    @property
+    def repaired(self) -> bool:
+        return bool(self.repairs)
+
+    @property
+    def failed(self) -> bool:
+        """True ohne verwertbaren Wert: nichts gefunden oder nur ein leerer Container vor einem Fehler."""
+        if self.value is None:
+            return True
+        return self.value in ({}, []) and any(repair.kind == REPAIR_TRUNCATED for repair in self.repairs)
+
+    @property
+    def truncated(self) -> bool:
+        """True, wenn Teile der Antwort fehlten und der Wert nur rekonstruiert ist."""
+        return any(repair.kind in TRUNCATION_REPAIRS for repair in self.repairs)
+
+    def summary(self) -> Dict[str, int]:
+        """Anzahl der Reparaturen je Art, z. B. für Logs."""
+        return dict(Counter(repair.kind for repair in self.repairs))
+
+
+class _Frame:
+    """Offener Container; ``expect`` beschreibt das nächste erlaubte Token."""
+
+    __slots__ = ("kind", "container", "key", "expect", "start")
+
+    def __init__(self, kind: str, start: int) -> None:
+        self.kind = kind
+        self.container: object = {} if kind == "{" else []
+        self.key: Optional[str] = None
+        self.expect = "first"
+        self.start = start
+
+
+class _Incomplete(Exception):
+    """Der Text endet mitten in einem Token."""
+
+
+class _Invalid(Exception):
+    """An der aktuellen Position ist kein gültiges Token möglich."""
+
+
+class _TolerantParser:
+    """Einmaliger Durchlauf mit explizitem Stack (keine Rekursion, kein Backtracking)."""
+
+    def __init__(self, text: str, search_from: int = 0) -> None:
+        self.text = text
+        self.length = len(text)
+        self.search_from = search_from
+        self.start: Optional[int] = None
+        self.pos = 0
+        self.repairs: List[JSONRepair] = []
+        self.stack: List[_Frame] = []
+        self.root: Optional[object] = None
+        self.has_root = False
+
+    def parse(self) -> RepairResult:
+        start = self.start = self._find_start()
+        if start is None:
+            self._repair(REPAIR_NO_JSON, 0)
+            return RepairResult(None, self.repairs, 0)
+        if self.text[:start].strip():
+            self._repair(REPAIR_SKIPPED_LEADING_TEXT, 0)
+        self.pos = start
+        try:
+            while not self.has_root:
+                self._step()
+        except _Incomplete:
+            self._unwind(truncated=False)
+            return RepairResult(self.root, self.repairs, self.pos)
+        except _Invalid:
+            self._repair(REPAIR_TRUNCATED, self.pos)
+            self._unwind(truncated=True)
+            return RepairResult(self.root, self.repairs, self.pos)
+        consumed = self.pos
+        if consumed < self.length:
+            rest = self.text[self.pos :].strip()
+            if rest and rest.strip("`").strip():
+                self._repair(REPAIR_IGNORED_TRAILING_TEXT, self.pos)
+        return RepairResult(self.root, self.repairs, consumed)
+
+    # Zustandsautomat ---------------------------------------------------------------------
+
+    def _step(self) -> None:
+        self._skip_whitespace()
+        if self.pos >= self.length:
+            raise _Incomplete()
+        frame = self.stack[-1] if self.stack else None
+        char = self.text[self.pos]
+        if frame is None:
+            self._read_value(char)
+            return
+        expect = frame.expect
+        if expect == "comma_or_end":
+            self._after_value(frame, char)
+        elif frame.kind == "{":
+            self._in_object(frame, char)
+        else:
+            self._in_array(frame, char)
+
+    def _in_object(self, frame: _Frame, char: str) -> None:
+        expect = frame.expect
+        if expect in ("first", "key"):
+            if char == "}":
+                if expect == "key":
+                    self._repair(REPAIR_TRAILING_COMMA, self.pos)
+                self.pos += 1
+                self._close(frame)
+                return
+            if char == "]":
+                self._close_unbalanced(char)
+                return
+            if char in "\"'":
+                frame.key = self._read_string(char)
+            else:
+                match = _IDENTIFIER.match(self.text, self.pos)
+                if not match:
+                    raise _Invalid()
+                if match.end() >= self.length:
+                    raise _Incomplete()
+                self._repair(REPAIR_UNQUOTED_KEY, self.pos)
+                frame.key = match.group(0)
+                self.pos = match.end()
+            frame.expect = "colon"
+        elif expect == "colon":
+            if char != ":":
+                raise _Invalid()
+            self.pos += 1
+            frame.expect = "value"
+        else:
+            self._read_value(char)
+
+    def _in_array(self, frame: _Frame, char: str) -> None:
+        if char == "]":
+            if frame.expect == "value":
+                self._repair(REPAIR_TRAILING_COMMA, self.pos)
+            self.pos += 1
+            self._close(frame)
+            return
+        if char == "}":
+            if frame.expect == "value":
+                self._repair(REPAIR_TRAILING_COMMA, self.pos)
+            self._close_unbalanced(char)
+            return
+        self._read_value(char)
+
+    def _after_value(self, frame: _Frame, char: str) -> None:
+        if char == ",":
+            self.pos += 1
+            frame.expect = "key" if frame.kind == "{" else "value"
+            return
+        if char == _CLOSER[frame.kind]:
+            self.pos += 1
+            self._close(frame)
+            return
+        if char in "}]":
+            self._close_unbalanced(char)
+            return
+        # Fehlendes Komma zwischen zwei Einträgen (häufig nach Zeilenumbruch).
+        if (frame.kind == "{" and char in "\"'") or (frame.kind == "[" and char in "{[\"'-0123456789tfnTFN"):
+            self._repair(REPAIR_MISSING_COMMA, self.pos)
+            frame.expect = "key" if frame.kind == "{" else "value"
+            return
+        raise _Invalid()
+
+    # Werte -------------------------------------------------------------------------------
+
+    def _read_value(self, char: str) -> None:
+        if char in "{[":
+            frame = _Frame(char, self.pos)
+            self.pos += 1
+            self.stack.append(frame)
+            return
+        if char in "\"'":
+            self._emit(self._read_string(char))
+            return
+        if char == "-" or char.isdigit():
+            self._emit(self._read_number())
+            return
+        match = _IDENTIFIER.match(self.text, self.pos)
+        if match:
+            word = match.group(0)
+            if word in _LITERALS:
+                value, pythonic = _LITERALS[word]
+                if pythonic:
+                    self._repair(REPAIR_PYTHON_LITERAL, self.pos)
+                self.pos = match.end()
+                self._emit(value)
+                return
+            if match.end() >= self.length and any(literal.startswith(word) for literal in _LITERALS):
+                raise _Incomplete()
+        raise _Invalid()
+
+    def _read_number(self) -> object:
+        match = _NUMBER.match(self.text, self.pos)
+        if not match:
+            if self.pos + 1 >= self.length:
+                raise _Incomplete()
+            raise _Invalid()
+        end = match.end()
+        # Eine Zahl direkt am Textende kann abgeschnitten sein ("12" statt "1250").
+        if end >= self.length:
+            raise _Incomplete()
+        if self.text[end] in ".eE":
+            if end + 1 >= self.length:
+                raise _Incomplete()
+            raise _Invalid()
+        self.pos = end
+        literal = match.group(0)
+        if "." in literal or "e" in literal or "E" in literal:
+            return float(literal)
+        return int(literal)
+
+    def _read_string(self, quote: str) -> str:
+        if quote == "'":
+            self._repair(REPAIR_SINGLE_QUOTES, self.pos)
+        runs = _STRING_RUNS[quote]
+        text = self.text
+        pos = self.pos + 1
+        parts: List[str] = []
+        while True:
+            match = runs.match(text, pos)
+            if match.end() > pos:
+                parts.append(match.group(0))
+                pos = match.end()
+            if pos >= self.length:
+                raise _Incomplete()
+            char = text[pos]
+            if char == quote:
+                self.pos = pos + 1
+                return "".join(parts)
+            if char == "\\":
+                if pos + 1 >= self.length:
+                    raise _Incomplete()
+                escape = text[pos + 1]
+                if escape == "u":
+                    digits = text[pos + 2 : pos + 6]
+                    if len(digits) < 4:
+                        raise _Incomplete()
+                    try:
+                        parts.append(chr(int(digits, 16)))
+                    except ValueError:
+                        self._repair(REPAIR_INVALID_ESCAPE, pos)
+                        parts.append(digits)
+                    pos += 6
+                    continue
+                mapped = _ESCAPES.get(escape)
+                if mapped is None:
+                    self._repair(REPAIR_INVALID_ESCAPE, pos)
+                    mapped = escape
+                parts.append(mapped)
+                pos += 2
+                continue
+            # Roh eingebettetes Steuerzeichen (z. B. Zeilenumbruch im String).
+            self._repair(REPAIR_CONTROL_CHARACTER, pos)
+            parts.append(char)
+            pos += 1
+
+    # Container ---------------------------------------------------------------------------
+
+    def _emit(self, value: object) -> None:
+        if not self.stack:
+            self.root = value
+            self.has_root = True
+            return
+        frame = self.stack[-1]
+        if frame.kind == "{":
+            frame.container[frame.key] = value  # type: ignore[index]
+            frame.key = None
+        else:
+            frame.container.append(value)  # type: ignore[union-attr]
+        frame.expect = "comma_or_end"
+
+    def _close(self, frame: _Frame) -> None:
+        self.stack.pop()
+        self._emit(frame.container)
+
+    def _close_unbalanced(self, char: str) -> None:
+        """Behandelt eine falsche Klammerart als Abschluss des innersten Containers."""
+        self._repair(REPAIR_UNBALANCED_CLOSER, self.pos)
+        self.pos += 1
+        self._close(self.stack[-1])
+
+    def _unwind(self, *, truncated: bool) -> None:
+        """Schließt alle offenen Container am Abbruchpunkt.
+
+        Unfertige Elemente eines Arrays werden verworfen, damit nur vollständig
+        empfangene Einträge übrig bleiben; unfertige Objekt-Werte werden
+        geschlossen und behalten (sonst ginge z. B. der ganze Plan verloren).
+        """
+        if not truncated:
+            top = self.stack[-1] if self.stack else None
+            if top is not None and top.key is not None:
+                # Schlüssel ohne (vollständigen) Wert.
+                self._repair(REPAIR_DROPPED_MEMBER, self.pos)
+            elif self.pos < self.length:
+                self._repair(REPAIR_DROPPED_VALUE, self.pos)
+        while self.stack:
+            frame = self.stack.pop()
+            frame.key = None
+            parent = self.stack[-1] if self.stack else None
+            if parent is not None and parent.kind == "[":
+                self._repair(REPAIR_DROPPED_ELEMENT, frame.start)
+                parent.expect = "comma_or_end"
+                continue
+            self._repair(REPAIR_CLOSED_CONTAINER, frame.start)
+            self._emit(frame.container)
+
+    # Hilfen ------------------------------------------------------------------------------
+
+    def _find_start(self) -> Optional[int]:
+        brace = self.text.find("{", self.search_from)
+        bracket = self.text.find("[", self.search_from)
+        candidates = [index for index in (brace, bracket) if index != -1]
+        return min(candidates) if candidates else None
+
+    def _skip_whitespace(self) -> None:
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+
+    def _repair(self, kind: str, position: int) -> None:
+        self.repairs.append(JSONRepair(kind, position))
+
+
+def parse_tolerant(text: str) -> RepairResult:
+    """Parst ``text`` in einem linearen Durchlauf und repariert typische LLM-Fehler.
+
+    Behandelt werden Text/Code-Fences vor und nach dem JSON, fehlende oder
+    überzählige Kommas, einfache Anführungszeichen, unquotierte Schlüssel,
+    Python-Literale sowie abgeschnittene Ausgaben. Bei einem nicht reparierbaren
+    Fehler bleibt das längste gültige Präfix erhalten und offene Container werden
+    geschlossen. Gültiges JSON läuft über ``json.loads`` ohne Zusatzkosten.
+    """
+    stripped = text.strip() if text else ""
+    if not stripped:
+        return RepairResult(None, [JSONRepair(REPAIR_NO_JSON, 0)], 0)
+    if stripped[0] in "{[":
+        try:
+            return RepairResult(json.loads(stripped), [], len(text))
+        except json.JSONDecodeError:
+            pass
+    parser = _TolerantParser(text)
+    result = parser.parse()
+    # Prosa wie "foo {bar} [1]": ergibt der erste Kandidat nichts Brauchbares, ab der nächsten Klammer weiter.
+    for _ in range(_MAX_START_ATTEMPTS - 1):
+        if not result.failed or parser.start is None:
+            break
+        retry = _TolerantParser(text, search_from=parser.start + 1)
+        retry_result = retry.parse()
+        if retry.start is None:
+            break
+        parser, result = retry, retry_result
+    return result
+
+
+def dump_malformed_output(text: str, label: str) -> Optional[Path]:
+    """Legt reparaturbedürftige Rohantworten in ``AUTO_PCG_MALFORMED_DIR`` ab.
+
+    So lässt sich das Benchmark-Korpus unter ``benchmarks/json_repair_corpus``
+    mit echten Modellausgaben erweitern. Ohne Umgebungsvariable passiert nichts.
+    """
+    target = os.getenv("AUTO_PCG_MALFORMED_DIR")
+    if not target or not target.strip():
+        return None
+    directory = Path(target).expanduser()
+    path = directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000:06d}-{label}.txt"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    except OSError as exc:
+        LOGGER.debug("Fehlerhafte LLM-Antwort konnte nicht gespeichert werden: %s", exc)
+        return None
+    return path
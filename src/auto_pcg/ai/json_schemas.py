@@ -0,0 +1,220 @@
+"""JSON-Schemata der LLM-Antworten für grammatikgebundenes Decoding."""
+
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+from .prompt_engine import (
+    TASK_CLASSIFICATION,
+    TASK_HEIGHTMAP_STRATEGY,
+    TASK_LAYER_PLAN,
+    TASK_MATERIAL_BLUEPRINT,
+    TASK_PCG_PLAN,
+)
+
+# Die Schemata spiegeln, was die Parser in LLMManager/AutoPCGService tatsächlich
+# auswerten. Freie Parameter-Objekte bleiben bewusst offen ({"type": "object"}),
+# damit das Modell dort nicht auf ein festes Vokabular gezwungen wird.
+
+PRIMARY_CATEGORIES = [
+    "LANDSCAPE",
+    "VEGETATION",
+    "ARCHITECTURE",
+    "PROP",
+    "CHARACTER",
+    "EFFECTS",
+    "MATERIAL",
+    "BLUEPRINT",
+]
+STYLES = ["realistic", "fantasy", "sci-fi", "medieval", "modern", "cartoon", "low-poly", "stylized"]
+BIOMES = [
+    "forest",
+    "desert",
+    "mountain",
+    "grassland",
+    "tundra",
+    "jungle",
+    "urban",
+    "aquatic",
+    "arctic",
+    "volcanic",
+]
+LAYER_TYPES = ["SURFACE", "SCATTER"]
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+_NUMBER_PAIR = {"type": "array", "items": {"type": "number"}, "minItems": 2, "maxItems": 2}
+_NUMBER_MAP = {"type": "object", "additionalProperties": {"type": "number"}}
+
+CLASSIFICATION_SCHEMA: Dict[str, object] = {
+    "type": "object",
+    "properties": {
+        "classifications": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "asset_path": {"type": "string"},
+                    "primary_category": {"type": "string", "enum": PRIMARY_CATEGORIES},
+                    "sub_category": {"type": "string"},
+                    "tags": _STRING_LIST,
+                    "style": {"type": "string", "enum": STYLES},
+                    "biomes": {"type": "array", "items": {"type": "string", "enum": BIOMES}},
+                    "technical": {
+                        "type": "object",
+                        "properties": {
+                            "polycount": {"type": "integer"},
+                            "texture_resolution": {"type": "array", "items": {"type": "integer"}},
+                            "collision": {"type": "string", "enum": ["simple", "complex", "none"]},
+                            "lod": {"type": "boolean"},
+                            "material_count": {"type": "integer"},
+                        },
+                    },
+                },
+                "required": ["asset_path", "primary_category", "sub_category", "tags", "style", "biomes"],
+            },
+        }
+    },
+    "required": ["classifications"],
+}
+
+PCG_PLAN_SCHEMA: Dict[str, object] = {
+    "type": "object",
+    "properties": {
+        "pcg_plan": {
+            "type": "object",
+            "properties": {
+                "description": {"type": "string"},
+                "target_biome": {"type": "string"},
+                "layers": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "type": {"type": "string", "enum": LAYER_TYPES},
+                            "purpose": {"type": "string"},
+                            "assets": _STRING_LIST,
+                            "parameters": {"type": "object"},
+                            "filters": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {"type": {"type": "string"}},
+                                    "required": ["type"],
+                                },
+                            },
+                        },
+                        "required": ["type", "purpose", "assets"],
+                    },
+                },
+            },
+            "required": ["description", "target_biome", "layers"],
+        }
+    },
+    "required": ["pcg_plan"],
+}
+
+HEIGHTMAP_STRATEGY_SCHEMA: Dict[str, object] = {
+    "type": "object",
+    "properties": {
+        "heightmap_strategy": {
+            "type": "object",
+            "properties": {
+                "recommended_biomes": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "elevation_range": _NUMBER_PAIR,
+                            "slope_range": _NUMBER_PAIR,
+                        },
+                        "required": ["name"],
+                    },
+                },
+                "landscape_settings": {
+                    "type": "object",
+                    "properties": {
+                        "section_size": {"type": "integer"},
+                        "components_x": {"type": "integer"},
+                        "components_y": {"type": "integer"},
+                        "lod_distance": {"type": "number"},
+                    },
+                },
+                "scale": {"type": "array", "items": {"type": "number"}, "minItems": 3, "maxItems": 3},
+                "notes": _STRING_LIST,
+            },
+        }
+    },
+    "required": ["heightmap_strategy"],
+}
+
+MATERIAL_BLUEPRINT_SCHEMA: Dict[str, object] = {
+    "type": "object",
+    "properties": {
+        "material_blueprint": {
+            "type": "object",
+            "properties": {
+                "layers": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "biome": {"type": "string"},
+                            "texture_set": {"type": "object", "additionalProperties": {"type": "string"}},
+                            "tiling": {"type": "number"},
+                            "blending_rules": _NUMBER_MAP,
+                            "exposed_parameters": _NUMBER_MAP,
+                        },
+                        "required": ["biome"],
+                    },
+                },
+                "global_parameters": _NUMBER_MAP,
+                "performance_notes": _STRING_LIST,
+            },
+            "required": ["layers"],
+        }
+    },
+    "required": ["material_blueprint"],
+}
+
+LAYER_PLAN_SCHEMA: Dict[str, object] = {
+    "type": "object",
+    "properties": {
+        "layer_plan": {
+            "type": "object",
+            "properties": {
+                "masks": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "biome": {"type": "string"},
+                            "mask_path": {"type": "string"},
+                            "softness": {"type": "number"},
+                            "recommended_order": {"type": "integer"},
+                        },
+                        "required": ["biome", "softness", "recommended_order"],
+                    },
+                },
+                "adaptive_rules": _NUMBER_MAP,
+            },
+            "required": ["masks"],
+        }
+    },
+    "required": ["layer_plan"],
+}
+
+TASK_SCHEMAS: Dict[str, Dict[str, object]] = {
+    TASK_CLASSIFICATION: CLASSIFICATION_SCHEMA,
+    TASK_PCG_PLAN: PCG_PLAN_SCHEMA,
+    TASK_HEIGHTMAP_STRATEGY: HEIGHTMAP_STRATEGY_SCHEMA,
+    TASK_MATERIAL_BLUEPRINT: MATERIAL_BLUEPRINT_SCHEMA,
+    TASK_LAYER_PLAN: LAYER_PLAN_SCHEMA,
+}
+
+
+def schema_for_task(task: Optional[str]) -> Optional[Dict[str, object]]:
+    """Liefert das Antwort-Schema einer Aufgabe oder ``None``."""
+    if not task:
+        return None
+    return TASK_SCHEMAS.get(task)
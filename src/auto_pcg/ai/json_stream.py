@@ -0,0 +1,151 @@
+"""Inkrementeller JSON-Scanner für gestreamte LLM-Antworten."""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _Frame:
+    """Offener Container im Scanner-Stack."""
+
+    __slots__ = ("kind", "key", "expecting_key", "is_target")
+
+    def __init__(self, kind: str, key: Optional[str], is_target: bool) -> None:
+        self.kind = kind
+        self.key = key
+        self.expecting_key = kind == "{"
+        self.is_target = is_target
+
+
+class IncrementalJSONScanner:
+    """Liefert Elemente eines Ziel-Arrays, sobald deren Objekt geschlossen wurde.
+
+    ``array_path`` beschreibt die Schlüssel vom Wurzelobjekt bis zum Array, z. B.
+    ``("classifications",)`` oder ``("pcg_plan", "layers")``. Text vor dem ersten
+    ``{``/``[`` (Code-Fences, Erklärungen) wird ignoriert. Jeder Chunk wird genau
+    einmal gelesen; nur das gerade offene Element wird zwischengespeichert.
+    """
+
+    def __init__(self, array_path: Sequence[str]) -> None:
+        self.array_path: Tuple[str, ...] = tuple(array_path)
+        self.entries: List[object] = []
+        self._chunks: List[str] = []
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._finished = False
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._key_chars: List[str] = []
+        self._pending_key: Optional[str] = None
+        self._capture: Optional[List[str]] = None
+        self._capture_depth = 0
+
+    @property
+    def text(self) -> str:
+        """Bisher empfangener Rohtext."""
+        return "".join(self._chunks)
+
+    @property
+    def finished(self) -> bool:
+        """True, sobald der Wurzel-Container geschlossen wurde."""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[object]:
+        """Verarbeitet einen Chunk und gibt neu abgeschlossene Elemente zurück."""
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+        emitted: List[object] = []
+        for char in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if char not in "{[":
+                    continue
+                self._started = True
+            if self._capture is not None:
+                self._capture.append(char)
+            if self._in_string:
+                self._consume_string_char(char)
+                continue
+            if char == '"':
+                self._in_string = True
+                frame = self._stack[-1] if self._stack else None
+                self._string_is_key = bool(frame and frame.kind == "{" and frame.expecting_key)
+                self._key_chars = []
+            elif char in "{[":
+                self._open(char)
+            elif char in "}]":
+                entry = self._close()
+                if entry is not None:
+                    emitted.append(entry)
+            elif char == ":":
+                if self._stack and self._stack[-1].kind == "{":
+                    self._stack[-1].expecting_key = False
+            elif char == ",":
+                if self._stack and self._stack[-1].kind == "{":
+                    self._stack[-1].expecting_key = True
+                    self._pending_key = None
+        return emitted
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _consume_string_char(self, char: str) -> None:
+        if self._escape:
+            self._escape = False
+            if self._string_is_key:
+                self._key_chars.append(char)
+            return
+        if char == "\\":
+            self._escape = True
+            return
+        if char == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._pending_key = "".join(self._key_chars)
+            return
+        if self._string_is_key:
+            self._key_chars.append(char)
+
+    def _open(self, kind: str) -> None:
+        parent = self._stack[-1] if self._stack else None
+        key = self._pending_key if parent and parent.kind == "{" else None
+        self._pending_key = None
+        path = tuple(frame.key for frame in self._stack[1:]) + ((key,) if parent else ())
+        is_target = kind == "[" and path == self.array_path
+        if parent and parent.is_target and self._capture is None:
+            self._capture = [kind]
+            self._capture_depth = len(self._stack) + 1
+        self._stack.append(_Frame(kind, key, is_target))
+
+    def _close(self) -> Optional[object]:
+        if not self._stack:
+            return None
+        depth = len(self._stack)
+        self._stack.pop()
+        if not self._stack:
+            self._finished = True
+        if self._capture is None or depth != self._capture_depth:
+            return None
+        raw = "".join(self._capture)
+        self._capture = None
+        try:
+            entry = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            LOGGER.debug("Gestreamtes Element konnte nicht geparst werden: %s", exc)
+            return None
+        self.entries.append(entry)
+        return entry
+
+
+def nest_entries(array_path: Sequence[str], entries: List[object]) -> dict:
+    """Baut aus geretteten Elementen wieder ein Payload mit der erwarteten Struktur."""
+    payload: object = list(entries)
+    for key in reversed(tuple(array_path)):
+        payload = {key: payload}
+    return payload if isinstance(payload, dict) else {"entries": payload}
@@ -2,30 +2,80 @@
 
 from __future__ import annotations
 
-import json
+import concurrent.futures
+import contextlib
 import logging
-import math
+import os
+import threading
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence
-
-import requests
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
 
 from auto_pcg.core.asset_analyzer import AssetAnalyzer
 from auto_pcg.models.schemas import AssetData, Classification, PCGFilterSpec, PCGLayer, PCGPlan
 from auto_pcg.models.terrain import HeightmapAnalysisResult, LandscapeLayerPlan, MaterialBlueprint
 
-from .local_llm import LocalGGUFClient, LocalLLMError, _auto_close_json, _extract_json_block
-from .prompt_engine import PromptEngine
+from .backend_pool import (
+    ROUTING_LEAST_OUTSTANDING,
+    BackendPool,
+    LLMBackend,
+    LLMBackendError,
+    LLMBackendUnavailable,
+    LocalBackend,
+    LocalProcessBackend,
+    OllamaBackend,
+)
+from .batch_sizing import AdaptiveBatchSizer, estimate_tokens
+from .json_repair import dump_malformed_output, parse_tolerant
+from .json_schemas import schema_for_task
+from .json_stream import IncrementalJSONScanner, nest_entries
+from .local_llm import LocalGGUFClient, LocalLLMError
+from .local_pool import LocalProcessPool
+from .prompt_engine import (
+    TASK_CLASSIFICATION,
+    TASK_HEIGHTMAP_STRATEGY,
+    TASK_LAYER_PLAN,
+    TASK_MATERIAL_BLUEPRINT,
+    TASK_PCG_PLAN,
+    TASKS,
+    PromptEngine,
+    resolve_asset_ref,
+)
+from .telemetry import CallStats, LLMTelemetry
+from .time_budget import TimeBudget
 
 LOGGER = logging.getLogger(__name__)
 
+CLASSIFICATION_STREAM_PATH = ("classifications",)
+PCG_LAYER_STREAM_PATH = ("pcg_plan", "layers")
+
 
 class LLMManager:
-    """Kapselt sowohl lokale GGUF-Aufrufe als auch Ollama-kompatibles HTTP."""
+    """Kapselt sowohl lokale GGUF-Aufrufe als auch Ollama-kompatibles HTTP.
+
+    Ohne ``backends`` wird wie bisher das lokale GGUF-Modell oder – falls keines
+    geladen werden kann – ``base_url`` genutzt. Mit mehreren Backends verteilt ein
+    :class:`BackendPool` die Anfragen und weicht bei Fehlern aus.
+
+    ``task_backends`` ordnet einzelnen Aufgaben (siehe ``TASKS``) eigene Backends
+    zu, z. B. ein kleines quantisiertes Modell für die Klassifikation und ein
+    großes für die PCG-Planung. Aufgaben ohne Eintrag nutzen den Standard-Pool.
+
+    Mit ``local_processes`` > 1 läuft das lokale GGUF-Modell in mehreren
+    Prozessen mit je ``local_threads`` Threads (CPU-Maschinen mit vielen Kernen).
+
+    Alle Anfragen akzeptieren ein :class:`TimeBudget`: Jeder Aufruf erhält das
+    Restbudget als Timeout, und reicht es nicht mehr für die bisher gemessene
+    Dauer der Aufgabe, greifen sofort die Heuristiken.
+    """
 
     CLASSIFICATION_BATCH_SIZE = 10
     PCG_CONTEXT_LIMIT = 30
+    DEFAULT_CONTEXT_TOKENS = 4096
+    # Heightmap-Strategie, Material-Blueprint und Layer-Plan laufen gleichzeitig.
+    TERRAIN_REQUESTS = 3
+    # Angenommene Mindestdauer eines LLM-Aufrufs, solange keine Messwerte vorliegen.
+    MIN_LLM_SECONDS = 1.0
 
     def __init__(
         self,
@@ -35,63 +85,232 @@ class LLMManager:
         prompt_engine: Optional[PromptEngine] = None,
         local_model_path: Optional[Path] = None,
         classification_batch_size: Optional[int] = None,
+        classification_workers: Optional[int] = None,
+        batch_timeout: Optional[float] = None,
+        adaptive_batching: bool = True,
+        context_tokens: Optional[int] = None,
+        stream_responses: bool = False,
+        circuit_failure_threshold: int = 3,
+        circuit_backoff: float = 5.0,
+        backends: Optional[Sequence[LLMBackend]] = None,
+        routing: str = ROUTING_LEAST_OUTSTANDING,
+        task_backends: Optional[Mapping[str, Sequence[LLMBackend]]] = None,
+        local_processes: Optional[int] = None,
+        local_threads: Optional[int] = None,
     ) -> None:
         self.base_url = base_url.rstrip("/")
         self.model = model
         self.timeout = timeout
-        self.session = requests.Session()
         self.prompt_engine = prompt_engine or PromptEngine()
+        # Nur für die Token-Bilanz: dieselben Prompts in der ausführlichen Kodierung.
+        self._verbose_prompts = PromptEngine(compact=False) if self.prompt_engine.compact else None
+        self._token_savings: Dict[str, Dict[str, int]] = {}
+        self._token_lock = threading.Lock()
+        self._telemetry = LLMTelemetry()
         self._analyzer = AssetAnalyzer()
-        self._local_client: Optional[LocalGGUFClient] = None
         self._classification_batch_size = (
             max(1, classification_batch_size) if classification_batch_size else self.CLASSIFICATION_BATCH_SIZE
         )
-        if local_model_path:
-            try:
-                self._local_client = LocalGGUFClient(local_model_path)
-                LOGGER.info("Verwende lokales GGUF-Modell: %s", local_model_path)
-            except LocalLLMError as exc:
-                LOGGER.warning("Lokales GGUF-Modell konnte nicht geladen werden: %s", exc)
+        self._stream_responses = stream_responses
+        if backends:
+            pool_backends = list(backends)
+        else:
+            pool_backends = []
+            if local_model_path:
+                try:
+                    if local_processes and local_processes > 1:
+                        pool_backends.append(
+                            LocalProcessBackend(
+                                LocalProcessPool.shared(
+                                    local_model_path,
+                                    processes=local_processes,
+                                    threads_per_process=local_threads,
+                                )
+                            )
+                        )
+                    else:
+                        pool_backends.append(LocalBackend(LocalGGUFClient(local_model_path, n_threads=local_threads)))
+                    LOGGER.info("Verwende lokales GGUF-Modell: %s", local_model_path)
+                except LocalLLMError as exc:
+                    LOGGER.warning("Lokales GGUF-Modell konnte nicht geladen werden: %s", exc)
+            if not pool_backends:
+                pool_backends.append(
+                    OllamaBackend(
+                        self.base_url,
+                        model,
+                        timeout=timeout,
+                        failure_threshold=circuit_failure_threshold,
+                        backoff=circuit_backoff,
+                    )
+                )
+        self._pool = BackendPool(pool_backends, routing=routing)
+        if len(self._pool) > 1:
+            LOGGER.info(
+                "LLM-Backend-Pool (%s): %s",
+                routing,
+                ", ".join(f"{backend.name} x{backend.weight:g}" for backend in self._pool.backends),
+            )
+        self._task_pools: Dict[str, BackendPool] = {}
+        for task, routed in (task_backends or {}).items():
+            if task not in TASKS:
+                raise ValueError(f"Unbekannte LLM-Aufgabe für das Routing: {task} (erlaubt: {', '.join(TASKS)})")
+            if routed:
+                self._task_pools[task] = BackendPool(list(routed), routing=routing)
+                LOGGER.info("LLM-Routing %s → %s", task, ", ".join(backend.name for backend in routed))
+        classification_pool = self._pool_for(TASK_CLASSIFICATION)
+        self._classification_workers = self._resolve_worker_count(
+            classification_workers,
+            default=classification_pool.total_concurrency,
+        )
+        for pool in self._all_pools():
+            for backend in pool.http_backends():
+                workers = self._classification_workers if pool is classification_pool else 0
+                backend.resize_pool(workers + self.TERRAIN_REQUESTS)
+        # chat + generate koennen nacheinander laufen, daher das doppelte HTTP-Timeout als Standard.
+        self._batch_timeout = batch_timeout if batch_timeout and batch_timeout > 0 else timeout * 2 + 5.0
+        # Die Ziel-Latenz schützt vor dem HTTP-Timeout. Lokale GGUF-Backends haben keins und
+        # brauchen auf der CPU für einen normalen Batch länger; dort zählen nur Fehler und Lücken.
+        target_latency = timeout * 0.5 if classification_pool.http_backends() else None
+        self._batch_sizer = AdaptiveBatchSizer(
+            self.prompt_engine,
+            initial_size=self._classification_batch_size,
+            context_tokens=context_tokens or classification_pool.context_tokens or self.DEFAULT_CONTEXT_TOKENS,
+            max_response_tokens=classification_pool.max_tokens,
+            target_latency=target_latency,
+            adaptive=adaptive_batching,
+        )
 
     def setup_ollama_connection(self) -> bool:
-        """Validiert, ob der Ollama-Endpunkt erreichbar ist."""
-        try:
-            response = self.session.get(f"{self.base_url}/api/tags", timeout=self.timeout)
-            response.raise_for_status()
-            return True
-        except requests.RequestException as exc:  # pragma: no cover - nur Netzwerkausnahme
-            LOGGER.warning("Ollama nicht erreichbar: %s", exc)
-            return False
+        """Validiert, ob jeder Pool (Standard und je Aufgabe) ein erreichbares Backend hat."""
+        return all([pool.check_all() for pool in self._all_pools()])
 
-    def send_classification_request(self, assets: Sequence[AssetData]) -> List[Classification]:
-        """Sendet eine Klassifikationsanfrage oder nutzt Fallback-Heuristiken."""
+    @property
+    def uses_local_model(self) -> bool:
+        """True, wenn ausschließlich lokale GGUF-Backends in den Pools sind."""
+        return not any(pool.http_backends() for pool in self._all_pools())
+
+    def endpoint_health(self) -> Dict[str, object]:
+        """Zustand je HTTP-Endpunkt (Circuit, bevorzugter API-Modus, Fehlerzähler)."""
+        return {backend.name: backend.health() for pool in self._all_pools() for backend in pool.http_backends()}
+
+    def backend_stats(self) -> Dict[str, object]:
+        """Durchsatz, Latenz und Fehler je Backend; geroutete Aufgaben unter ``tasks``."""
+        stats = self._pool.snapshot()
+        if self._task_pools:
+            stats["tasks"] = {task: pool.snapshot() for task, pool in self._task_pools.items()}
+        return stats
+
+    def routing_table(self) -> Dict[str, List[str]]:
+        """Backends je Aufgabe (nicht gerouteten Aufgaben steht der Standard-Pool zur Verfügung)."""
+        return {task: [backend.name for backend in self._pool_for(task).backends] for task in TASKS}
+
+    def send_classification_request(
+        self,
+        assets: Sequence[AssetData],
+        on_result: Optional[Callable[[Classification], None]] = None,
+        *,
+        fallback: bool = True,
+        budget: Optional[TimeBudget] = None,
+    ) -> List[Classification]:
+        """Sendet eine Klassifikationsanfrage oder nutzt Fallback-Heuristiken.
+
+        Im Streaming-Modus wird ``on_result`` für jede Klassifikation aufgerufen,
+        sobald ihr Objekt vollständig empfangen wurde (ggf. aus Worker-Threads).
+        Mit ``fallback=False`` fehlen Assets fehlgeschlagener Batches im Ergebnis,
+        statt heuristisch ergänzt zu werden. Reicht ``budget`` nicht mehr für
+        einen weiteren Batch, werden alle übrigen Assets heuristisch klassifiziert.
+        """
+        if self._classification_workers > 1 and len(assets) > self._batch_sizer.window:
+            return self._classify_batches_concurrently(assets, on_result, fallback=fallback, budget=budget)
         results: List[Classification] = []
-        total_batches = math.ceil(len(assets) / self._classification_batch_size) or 1
-        for batch_index, batch in enumerate(_chunked(assets, self._classification_batch_size)):
-            LOGGER.info(
-                "LLM-Klassifikation Batch %s/%s (%s Assets)...",
-                batch_index + 1,
-                total_batches,
-                len(batch),
-            )
-            start = time.perf_counter()
-            prompt = self.prompt_engine.build_asset_classification_prompt(batch)
-            parsed = self._parse_classifications(self._run_prompt(prompt), batch)
-            if parsed:
-                duration = time.perf_counter() - start
-                LOGGER.info(
-                    "LLM-Klassifikation Batch %s abgeschlossen (%.1fs, %s Ergebnisse).",
-                    batch_index + 1,
-                    duration,
-                    len(parsed),
-                )
-                results.extend(parsed)
-            else:
-                duration = time.perf_counter() - start
-                LOGGER.info("Nutze lokale Fallback-Klassifikation (Batch %s).", batch_index)
-                results.extend(self._analyzer.classify_asset_semantics(asset) for asset in batch)
+        cursor = 0
+        batch_index = 0
+        while cursor < len(assets):
+            if self._over_budget(TASK_CLASSIFICATION, budget):
+                if fallback:
+                    results.extend(self._fallback_classifications(assets[cursor:], batch_index))
+                break
+            size = self._batch_sizer.next_batch_size(assets, cursor)
+            batch = assets[cursor : cursor + size]
+            cursor += size
+            parsed = self._classify_batch(batch, batch_index, on_result, budget)
+            results.extend(self._with_fallback(batch, parsed, batch_index) if fallback else parsed)
+            batch_index += 1
+        self._pool_for(TASK_CLASSIFICATION).log_summary()
         return results
 
+    @property
+    def classification_workers(self) -> int:
+        """Anzahl paralleler Klassifikations-Batches."""
+        return self._classification_workers
+
+    def plan_concurrency(self, requested: Optional[int] = None) -> int:
+        """Parallele PCG-Plan-Anfragen für Batch-Läufe.
+
+        Ohne ``requested`` gelten ``AUTO_PCG_LLM_WORKERS``/``OLLAMA_NUM_PARALLEL``
+        bzw. die Kapazität des Plan-Pools. Die HTTP-Sessions des Pools werden so
+        vergrößert, dass jede Anfrage eine eigene Verbindung erhält.
+        """
+        pool = self._pool_for(TASK_PCG_PLAN)
+        workers = self._resolve_worker_count(requested, default=pool.total_concurrency)
+        classification_workers = (
+            self._classification_workers if pool is self._pool_for(TASK_CLASSIFICATION) else 0
+        )
+        for backend in pool.http_backends():
+            backend.resize_pool(workers + classification_workers + self.TERRAIN_REQUESTS)
+        return workers
+
+    def batch_metrics(self) -> Dict[str, object]:
+        """Kennzahlen der gewählten Klassifikations-Batch-Größen."""
+        return self._batch_sizer.snapshot()
+
+    def prompt_token_savings(self) -> Dict[str, Dict[str, int]]:
+        """Geschätzte Prompt-Tokens je Aufgabe: kompakt gesendet vs. ausführlich."""
+        with self._token_lock:
+            return {task: dict(entry) for task, entry in self._token_savings.items()}
+
+    def expected_latency(self, task: str) -> float:
+        """Erwartete Dauer eines Aufrufs: Median der Telemetrie, mindestens ``MIN_LLM_SECONDS``."""
+        return max(self.MIN_LLM_SECONDS, self._telemetry.expected_latency(task) or 0.0)
+
+    def tasks_within_budget(self, tasks: Sequence[str], budget: Optional[TimeBudget]) -> List[str]:
+        """Aufgaben (in Reihenfolge), die bei gleichzeitigem Start noch ins Budget passen.
+
+        Jeder Pool bearbeitet höchstens ``total_concurrency`` Aufrufe zugleich, der
+        Rest wartet; gezählt wird mit der erwarteten Dauer je Aufgabe. Die übrigen
+        Aufgaben werden als ausgewichen vermerkt.
+        """
+        if budget is None or not budget.limited:
+            return list(tasks)
+        remaining = budget.remaining() or 0.0
+        slots: Dict[int, List[float]] = {}
+        accepted: List[str] = []
+        for task in tasks:
+            pool = self._pool_for(task)
+            busy = slots.setdefault(id(pool), [0.0] * max(1, pool.total_concurrency))
+            slot = min(range(len(busy)), key=busy.__getitem__)
+            finish = busy[slot] + self.expected_latency(task)
+            if finish > remaining:
+                budget.degrade(task, f"Restbudget {remaining:.1f}s reicht nicht bis zum Ende des Aufrufs")
+                continue
+            busy[slot] = finish
+            accepted.append(task)
+        return accepted
+
+    def llm_telemetry(self) -> Dict[str, object]:
+        """Messwerte je Aufgabe: Token-, Latenz- und TTFT-Histogramme, Reparaturen, Fallbacks."""
+        return self._telemetry.snapshot()
+
+    def dump_llm_telemetry(self, path: Path) -> Path:
+        """Schreibt die Telemetrie samt Backend-, Batch- und Token-Kennzahlen als JSON."""
+        self._telemetry.log_summary()
+        return self._telemetry.dump(
+            path,
+            backends=self.backend_stats(),
+            batching=self.batch_metrics(),
+            prompt_token_savings=self.prompt_token_savings(),
+        )
+
     def send_pcg_generation_request(
         self,
         user_prompt: str,
@@ -99,8 +318,18 @@ class LLMManager:
         *,
         world_size: float | None = None,
         season: str | None = None,
+        on_layer: Optional[Callable[[int, PCGLayer], None]] = None,
+        budget: Optional[TimeBudget] = None,
+        on_plan: Optional[Callable[[Dict[str, object]], None]] = None,
     ) -> PCGPlan:
-        """Generiert einen PCG-Plan über das LLM oder liefert einen simplen Fallback."""
+        """Generiert einen PCG-Plan über das LLM oder liefert einen simplen Fallback.
+
+        Im Streaming-Modus erhält ``on_layer`` jeden gültigen Layer samt Index,
+        während das Modell noch generiert. ``on_plan`` bekommt das rohe
+        ``pcg_plan``-Objekt eines vollständigen LLM-Plans, etwa für einen Plan-Cache;
+        nicht beim Fallback, wenn das Zeitbudget den Aufruf abgeschnitten hat oder
+        wenn der Plan aus einer abgeschnittenen Antwort rekonstruiert wurde.
+        """
         context_assets = assets[: self.PCG_CONTEXT_LIMIT]
         if len(assets) > self.PCG_CONTEXT_LIMIT:
             LOGGER.info(
@@ -116,26 +345,67 @@ class LLMManager:
         )
         LOGGER.info("LLM-PCG-Anfrage gestartet (Prompt: %s , Assets: %s).", user_prompt, len(context_assets))
         start = time.perf_counter()
-        plan = self._parse_pcg_plan(self._run_prompt(prompt), context_assets)
+        on_entry = None
+        if on_layer:
+            layer_counter = [0]
+
+            def on_entry(raw: object) -> None:
+                try:
+                    layer = self._layer_from_payload(raw, context_assets)
+                except (KeyError, TypeError, ValueError) as exc:
+                    LOGGER.debug("Gestreamter PCG-Layer verworfen: %s", exc)
+                    return
+                if layer is None:
+                    return
+                on_layer(layer_counter[0], layer)
+                layer_counter[0] += 1
+
+        attempts: List[CallStats] = []
+        payload = self._run_prompt(
+            prompt,
+            task=TASK_PCG_PLAN,
+            stream_path=PCG_LAYER_STREAM_PATH,
+            on_entry=on_entry,
+            budget=budget,
+            attempts=attempts,
+        )
+        plan = self._parse_pcg_plan(payload, context_assets)
         if plan:
             LOGGER.info("LLM-PCG-Antwort erhalten (%.1fs).", time.perf_counter() - start)
+            truncated = budget is not None and any(entry["stage"] == TASK_PCG_PLAN for entry in budget.degraded)
+            truncated = truncated or not attempts or attempts[-1].truncated
+            if on_plan and not truncated:
+                on_plan(payload["pcg_plan"])  # type: ignore[index]
             return plan
         LOGGER.info("Nutze lokalen PCG-Fallback.")
+        self._telemetry.record_fallback(TASK_PCG_PLAN)
         return self._fallback_pcg_plan(user_prompt, assets)
 
+    def plan_from_cache(self, plan_data: Dict[str, object], assets: Sequence[AssetData]) -> Optional[PCGPlan]:
+        """Baut einen gespeicherten ``pcg_plan`` neu auf; Asset-Namen werden gegen ``assets`` aufgelöst."""
+        plan = self._parse_pcg_plan({"pcg_plan": plan_data}, assets[: self.PCG_CONTEXT_LIMIT])
+        if plan:
+            self._telemetry.record_cache_hit(TASK_PCG_PLAN)
+        return plan
+
     # Terrain-Workflows ----------------------------------------------------------------------
 
     def plan_heightmap_strategy(
         self,
         analysis: HeightmapAnalysisResult,
+        budget: Optional[TimeBudget] = None,
     ) -> Optional[Dict[str, object]]:
         """Fragt das LLM nach Optimierungen für Heightmap/Biome."""
         prompt = self.prompt_engine.build_heightmap_strategy_prompt(analysis)
-        payload = self._run_prompt(prompt)
-        if not payload:
-            return None
+        self._log_prompt_tokens(
+            TASK_HEIGHTMAP_STRATEGY,
+            prompt,
+            lambda engine: engine.build_heightmap_strategy_prompt(analysis),
+        )
+        payload = self._run_prompt(prompt, task=TASK_HEIGHTMAP_STRATEGY, budget=budget)
         strategy = payload.get("heightmap_strategy") if isinstance(payload, dict) else None
         if not isinstance(strategy, dict):
+            self._telemetry.record_fallback(TASK_HEIGHTMAP_STRATEGY)
             return None
         return strategy
 
@@ -143,25 +413,34 @@ class LLMManager:
         self,
         analysis: HeightmapAnalysisResult,
         blueprint: MaterialBlueprint,
+        budget: Optional[TimeBudget] = None,
     ) -> Optional[Dict[str, object]]:
         """Lässt das LLM Material-Layer Vorschläge liefern."""
         prompt = self.prompt_engine.build_material_blueprint_prompt(analysis, blueprint)
-        payload = self._run_prompt(prompt)
-        if not payload:
-            return None
+        self._log_prompt_tokens(
+            TASK_MATERIAL_BLUEPRINT,
+            prompt,
+            lambda engine: engine.build_material_blueprint_prompt(analysis, blueprint),
+        )
+        payload = self._run_prompt(prompt, task=TASK_MATERIAL_BLUEPRINT, budget=budget)
         result = payload.get("material_blueprint") if isinstance(payload, dict) else None
         if not isinstance(result, dict):
+            self._telemetry.record_fallback(TASK_MATERIAL_BLUEPRINT)
             return None
         return result
 
-    def plan_layer_paint(self, plan: LandscapeLayerPlan) -> Optional[Dict[str, object]]:
+    def plan_layer_paint(
+        self,
+        plan: LandscapeLayerPlan,
+        budget: Optional[TimeBudget] = None,
+    ) -> Optional[Dict[str, object]]:
         """Fragt das LLM nach Layer-Mask-Optimierungen."""
         prompt = self.prompt_engine.build_layer_paint_prompt(plan)
-        payload = self._run_prompt(prompt)
-        if not payload:
-            return None
+        self._log_prompt_tokens(TASK_LAYER_PLAN, prompt, lambda engine: engine.build_layer_paint_prompt(plan))
+        payload = self._run_prompt(prompt, task=TASK_LAYER_PLAN, budget=budget)
         result = payload.get("layer_plan") if isinstance(payload, dict) else None
         if not isinstance(result, dict):
+            self._telemetry.record_fallback(TASK_LAYER_PLAN)
             return None
         return result
 
@@ -177,79 +456,464 @@ class LLMManager:
 
     # Interne Hilfen ---------------------------------------------------------------------------
 
-    def _run_prompt(self, prompt: str) -> Optional[Dict[str, object]]:
-        """Routet Prompts an lokales GGUF oder an den HTTP-Endpunkt."""
-        if self._local_client:
-            try:
-                return self._local_client.generate_json(prompt)
-            except LocalLLMError as exc:
-                LOGGER.error("Lokales LLM lieferte einen Fehler: %s", exc)
-                return None
-        return self._post_prompt_http(prompt)
+    def _classify_batch(
+        self,
+        batch: Sequence[AssetData],
+        batch_index: int,
+        on_result: Optional[Callable[[Classification], None]] = None,
+        budget: Optional[TimeBudget] = None,
+        record_claim: Optional[threading.Lock] = None,
+    ) -> List[Classification]:
+        """Klassifiziert einen einzelnen Batch über das LLM (leer bei Fehlschlag).
 
-    def _post_prompt_http(self, prompt: str) -> Optional[Dict[str, object]]:
-        """Sendet einen Prompt an Ollama und dekodiert JSON."""
-        last_exc: Optional[Exception] = None
-        for mode in ("chat", "generate"):
-            try:
-                if mode == "chat":
-                    response = self.session.post(
-                        f"{self.base_url}/api/chat",
-                        json={
-                            "model": self.model,
-                            "messages": [
-                                {"role": "system", "content": "Antwort exakt mit gültigem JSON."},
-                                {"role": "user", "content": prompt},
-                            ],
-                            "stream": False,
-                            "response_format": {"type": "json_object"},
-                        },
-                        timeout=self.timeout,
+        ``record_claim`` teilt sich der Worker mit dem Timeout-Sammler: Wer den Lock
+        zuerst bekommt, meldet den Batch an den Batch-Sizer, sodass ein abgelaufener
+        Batch nicht ein zweites Mal (mit der verspäteten Latenz) zählt.
+        """
+        prompt_tokens = self._batch_sizer.estimate_prompt_tokens(batch)
+        start = time.perf_counter()
+        prompt = self.prompt_engine.build_asset_classification_prompt(batch)
+        saved = self._record_prompt_tokens(
+            TASK_CLASSIFICATION,
+            prompt,
+            lambda engine: engine.build_asset_classification_prompt(batch),
+        )
+        LOGGER.info(
+            "LLM-Klassifikation Batch %s (%s Assets, ~%s Prompt-Token, ~%s gespart, Fenster %s)...",
+            batch_index + 1,
+            len(batch),
+            prompt_tokens,
+            saved,
+            self._batch_sizer.window,
+        )
+        on_entry = None
+        if on_result:
+            entry_counter = [0]
+
+            def on_entry(item: object) -> None:
+                index = entry_counter[0]
+                entry_counter[0] += 1
+                try:
+                    on_result(self._classification_from_entry(item, index, batch))
+                except (KeyError, IndexError, TypeError, ValueError) as exc:
+                    LOGGER.debug("Gestreamte Klassifikation verworfen: %s", exc)
+
+        payload = self._run_prompt(
+            prompt,
+            task=TASK_CLASSIFICATION,
+            stream_path=CLASSIFICATION_STREAM_PATH,
+            on_entry=on_entry,
+            items=len(batch),
+            budget=budget,
+        )
+        parsed = self._parse_classifications(payload, batch)
+        duration = time.perf_counter() - start
+        if record_claim is None or record_claim.acquire(blocking=False):
+            self._batch_sizer.record(len(batch), duration, len(parsed), prompt_tokens)
+        if parsed:
+            LOGGER.info(
+                "LLM-Klassifikation Batch %s abgeschlossen (%.1fs, %s Ergebnisse).",
+                batch_index + 1,
+                duration,
+                len(parsed),
+            )
+        return parsed
+
+    def _fallback_classifications(self, batch: Sequence[AssetData], batch_index: int) -> List[Classification]:
+        LOGGER.info("Nutze lokale Fallback-Klassifikation (Batch %s).", batch_index + 1)
+        self._telemetry.record_fallback(TASK_CLASSIFICATION, len(batch))
+        return [self._analyzer.classify_asset_semantics(asset) for asset in batch]
+
+    def _with_fallback(
+        self,
+        batch: Sequence[AssetData],
+        parsed: List[Classification],
+        batch_index: int,
+    ) -> List[Classification]:
+        """Ergänzt Assets ohne LLM-Ergebnis (z. B. nach abgebrochenem Stream) heuristisch."""
+        if not parsed:
+            return self._fallback_classifications(batch, batch_index)
+        answered = {classification.asset_path.resolve() for classification in parsed}
+        missing = [asset for asset in batch if asset.asset_path.resolve() not in answered]
+        if not missing:
+            return parsed
+        return parsed + self._fallback_classifications(missing, batch_index)
+
+    def _classify_batches_concurrently(
+        self,
+        assets: Sequence[AssetData],
+        on_result: Optional[Callable[[Classification], None]] = None,
+        *,
+        fallback: bool = True,
+        budget: Optional[TimeBudget] = None,
+    ) -> List[Classification]:
+        """Verteilt Batches auf einen Thread-Pool und setzt die Ergebnisse in Eingabereihenfolge zusammen.
+
+        Batches werden erst gebildet, wenn ein Worker frei wird, damit jede neue
+        Batch-Größe bereits die Rückmeldungen der vorherigen Batches berücksichtigt.
+        Ist ``budget`` erschöpft, werden keine Batches mehr gestartet und laufende
+        wie beim Batch-Timeout durch Heuristiken ersetzt.
+        """
+        workers = self._classification_workers
+        LOGGER.info("Starte parallele LLM-Klassifikation (%s Assets, %s Worker).", len(assets), workers)
+        start = time.perf_counter()
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="auto-pcg-llm",
+        )
+        outcomes: Dict[int, List[Classification]] = {}
+        pending: Dict[concurrent.futures.Future, tuple] = {}
+        cursor = 0
+        batch_index = 0
+        try:
+            while cursor < len(assets) or pending:
+                while cursor < len(assets) and len(pending) < workers:
+                    if self._over_budget(TASK_CLASSIFICATION, budget):
+                        if fallback:
+                            outcomes[batch_index] = self._fallback_classifications(assets[cursor:], batch_index)
+                        cursor = len(assets)
+                        batch_index += 1
+                        break
+                    size = self._batch_sizer.next_batch_size(assets, cursor)
+                    batch = assets[cursor : cursor + size]
+                    cursor += size
+                    claim = threading.Lock()
+                    future = executor.submit(self._classify_batch, batch, batch_index, on_result, budget, claim)
+                    pending[future] = (batch_index, batch, time.perf_counter(), claim)
+                    batch_index += 1
+                if not pending:
+                    continue
+                next_deadline = min(started for _, _, started, _ in pending.values()) + self._batch_timeout
+                wait_timeout = max(0.0, next_deadline - time.perf_counter())
+                remaining = budget.remaining() if budget is not None else None
+                if remaining is not None:
+                    wait_timeout = min(wait_timeout, remaining)
+                done, _ = concurrent.futures.wait(
+                    pending,
+                    timeout=wait_timeout,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    index, batch, _, _ = pending.pop(future)
+                    try:
+                        parsed = future.result()
+                    except Exception as exc:  # pragma: no cover - Worker-Fehler
+                        LOGGER.warning("LLM-Klassifikation Batch %s fehlgeschlagen: %s", index + 1, exc)
+                        parsed = []
+                    outcomes[index] = self._with_fallback(batch, parsed, index) if fallback else parsed
+                now = time.perf_counter()
+                budget_expired = budget is not None and budget.expired()
+                for future, (index, batch, started, claim) in list(pending.items()):
+                    if now - started < self._batch_timeout and not budget_expired:
+                        continue
+                    future.cancel()
+                    del pending[future]
+                    if budget_expired:
+                        LOGGER.warning("LLM-Klassifikation Batch %s am Ende des Zeitbudgets abgebrochen.", index + 1)
+                        budget.degrade(TASK_CLASSIFICATION, "Zeitbudget während laufender Batches abgelaufen")
+                    else:
+                        LOGGER.warning(
+                            "LLM-Klassifikation Batch %s ueberschritt das Timeout (%.1fs).",
+                            index + 1,
+                            self._batch_timeout,
+                        )
+                    if claim.acquire(blocking=False):
+                        self._batch_sizer.record(len(batch), now - started, 0)
+                    if fallback:
+                        outcomes[index] = self._fallback_classifications(batch, index)
+        finally:
+            # Haengende Requests nicht abwarten – ihre Ergebnisse wurden bereits ersetzt.
+            executor.shutdown(wait=False, cancel_futures=True)
+        LOGGER.info(
+            "Parallele LLM-Klassifikation abgeschlossen (%.1fs fuer %s Batches).",
+            time.perf_counter() - start,
+            batch_index,
+        )
+        self._pool_for(TASK_CLASSIFICATION).log_summary()
+        results: List[Classification] = []
+        for index in range(batch_index):
+            results.extend(outcomes.get(index, []))
+        return results
+
+    def _record_prompt_tokens(
+        self,
+        task: str,
+        prompt: str,
+        build_verbose: Callable[[PromptEngine], str],
+    ) -> int:
+        """Verbucht die Token-Ersparnis der kompakten Kodierung und liefert sie zurück."""
+        if self._verbose_prompts is None:
+            return 0
+        sent = estimate_tokens(prompt)
+        verbose = estimate_tokens(build_verbose(self._verbose_prompts))
+        with self._token_lock:
+            entry = self._token_savings.setdefault(task, {"prompts": 0, "sent_tokens": 0, "verbose_tokens": 0})
+            entry["prompts"] += 1
+            entry["sent_tokens"] += sent
+            entry["verbose_tokens"] += verbose
+        return verbose - sent
+
+    def _log_prompt_tokens(self, task: str, prompt: str, build_verbose: Callable[[PromptEngine], str]) -> None:
+        saved = self._record_prompt_tokens(task, prompt, build_verbose)
+        if saved:
+            LOGGER.info("Prompt %s: ~%s Token, ~%s durch kompakte Kodierung gespart.", task, estimate_tokens(prompt), saved)
+
+    @staticmethod
+    def _resolve_worker_count(override: Optional[int], default: int = 1) -> int:
+        """Liest die Parallelität aus Parameter oder Umgebungsvariable."""
+        if override is not None:
+            return max(1, override)
+        env_value = os.getenv("AUTO_PCG_LLM_WORKERS") or os.getenv("OLLAMA_NUM_PARALLEL")
+        if env_value is None or not env_value.strip():
+            return max(1, default)
+        try:
+            return max(1, int(env_value))
+        except ValueError:
+            LOGGER.warning(
+                "LLM-Worker-Anzahl %s konnte nicht interpretiert werden. Verwende %s.",
+                env_value,
+                max(1, default),
+            )
+            return max(1, default)
+
+    def _run_prompt(
+        self,
+        prompt: str,
+        *,
+        task: Optional[str] = None,
+        stream_path: Optional[Sequence[str]] = None,
+        on_entry: Optional[Callable[[object], None]] = None,
+        items: int = 1,
+        budget: Optional[TimeBudget] = None,
+        attempts: Optional[List[CallStats]] = None,
+    ) -> Optional[Dict[str, object]]:
+        """Routet Prompts über den Backend-Pool (lokales GGUF und/oder HTTP).
+
+        Mit ``budget`` bekommt jeder Versuch das Restbudget als Timeout; reicht es
+        nicht für die erwartete Dauer, wird gar nicht erst angefragt (``None``).
+        ``attempts`` sammelt die Messwerte aller Versuche, der letzte gehört zum Ergebnis.
+        """
+        if task and self._over_budget(task, budget):
+            return None
+        prefix = self.prompt_engine.static_prefix(task) if task else None
+        schema = schema_for_task(task)
+        pool = self._pool_for(task)
+        if self._stream_responses and stream_path:
+            result = self._stream_prompt(
+                pool, prompt, stream_path, on_entry, prefix, schema, items, task=task, budget=budget, attempts=attempts
+            )
+        else:
+
+            def attempt(backend: LLMBackend) -> Dict[str, object]:
+                timeout = self._call_timeout(backend, budget, task)
+                with self._measure(task, backend, prompt, attempts=attempts) as stats:
+                    return backend.generate(
+                        prompt,
+                        decode=lambda text: self._decode_llm_json(text, stats),
+                        prefix=prefix,
+                        schema=schema,
+                        stats=stats,
+                        timeout=timeout,
                     )
-                    response.raise_for_status()
-                    payload = response.json()
-                    text = payload.get("message", {}).get("content", "").strip()
-                else:
-                    response = self.session.post(
-                        f"{self.base_url}/api/generate",
-                        json={
-                            "model": self.model,
-                            "prompt": prompt,
-                            "stream": False,
-                            "format": "json",
-                        },
-                        timeout=self.timeout,
+
+            result = pool.call(attempt, items=items)
+        if result is None and budget is not None and budget.expired():
+            budget.degrade(task or "llm", "Zeitbudget während des LLM-Aufrufs abgelaufen")
+        elif result is None and task and budget is not None and not budget.allows(self.expected_latency(task)):
+            budget.degrade(task, "Restbudget reichte nach dem Warten auf das Backend nicht mehr")
+        return result
+
+    def _over_budget(self, task: str, budget: Optional[TimeBudget]) -> bool:
+        """True (und vermerkt), wenn das Restbudget nicht für einen weiteren Aufruf reicht."""
+        if budget is None:
+            return False
+        expected = self.expected_latency(task)
+        if budget.allows(expected):
+            return False
+        budget.degrade(task, f"Restbudget {budget.remaining():.1f}s < erwartete LLM-Dauer {expected:.1f}s")
+        return True
+
+    def _call_timeout(
+        self,
+        backend: LLMBackend,
+        budget: Optional[TimeBudget],
+        task: Optional[str] = None,
+    ) -> Optional[float]:
+        """Restbudget als Timeout; ist es aufgebraucht, wird kein weiteres Backend versucht.
+
+        Ein lokales GGUF-Modell lässt sich nicht abbrechen; dort begrenzt der Wert
+        die Wartezeit auf das Modell, sodass die erwartete Dauer noch ins Budget passt.
+        """
+        if budget is None or not budget.limited:
+            return None
+        if budget.expired():
+            raise LLMBackendUnavailable(f"{backend.name}: Zeitbudget erschöpft")
+        if isinstance(backend, LocalBackend):
+            latest_start = budget.remaining() - (self.expected_latency(task) if task else 0.0)
+            if latest_start <= 0:
+                raise LLMBackendUnavailable(f"{backend.name}: Restbudget reicht nicht für einen lokalen Aufruf")
+            return latest_start
+        return budget.timeout(self.timeout)
+
+    @contextlib.contextmanager
+    def _measure(
+        self,
+        task: Optional[str],
+        backend: LLMBackend,
+        prompt: str,
+        *,
+        stream: bool = False,
+        attempts: Optional[List[CallStats]] = None,
+    ) -> Iterator[CallStats]:
+        """Misst einen Backend-Versuch und verbucht ihn in der Telemetrie.
+
+        Gesperrte Backends (offener Circuit) wurden gar nicht angefragt und zählen
+        nicht als Aufruf. Meldet das Backend keine Token-Zahlen, werden sie aus
+        Prompt bzw. Antworttext geschätzt. ``attempts`` erhält die Messwerte jedes
+        tatsächlich angefragten Versuchs.
+        """
+        stats = CallStats(task=task or "unknown", backend=backend.name, mode=backend.kind, stream=stream)
+        attempted = True
+        try:
+            yield stats
+            stats.success = True
+        except LLMBackendUnavailable:
+            attempted = False
+            raise
+        except Exception as exc:
+            stats.error = str(exc)
+            raise
+        finally:
+            if attempted:
+                stats.latency = time.perf_counter() - stats.started
+                if stats.prompt_tokens is None:
+                    stats.prompt_tokens = estimate_tokens(prompt)
+                    stats.tokens_estimated = True
+                self._telemetry.record(stats)
+                if attempts is not None:
+                    attempts.append(stats)
+
+    def _pool_for(self, task: Optional[str]) -> BackendPool:
+        """Pool der Aufgabe, sonst der Standard-Pool."""
+        return self._task_pools.get(task, self._pool) if task else self._pool
+
+    def _all_pools(self) -> List[BackendPool]:
+        """Alle genutzten Pools; der Standard-Pool nur, wenn eine Aufgabe ihn braucht."""
+        pools = list(self._task_pools.values())
+        if len(self._task_pools) < len(TASKS):
+            pools.insert(0, self._pool)
+        return pools
+
+    def _stream_prompt(
+        self,
+        pool: BackendPool,
+        prompt: str,
+        stream_path: Sequence[str],
+        on_entry: Optional[Callable[[object], None]],
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        items: int = 1,
+        *,
+        task: Optional[str] = None,
+        budget: Optional[TimeBudget] = None,
+        attempts: Optional[List[CallStats]] = None,
+    ) -> Optional[Dict[str, object]]:
+        """Streamt die Antwort und meldet jedes abgeschlossene Element des Ziel-Arrays.
+
+        Ein anderes Backend übernimmt nur, solange noch kein Element gemeldet wurde;
+        danach werden die bereits empfangenen Einträge gerettet. Das gilt auch, wenn
+        ``budget`` während des Streams abläuft.
+        """
+
+        def attempt(backend: LLMBackend) -> Dict[str, object]:
+            scanner = IncrementalJSONScanner(stream_path)
+            timeout = self._call_timeout(backend, budget, task)
+            with self._measure(task, backend, prompt, stream=True, attempts=attempts) as stats:
+                try:
+                    self._consume_stream(
+                        backend.stream(prompt, prefix=prefix, schema=schema, stats=stats, timeout=timeout),
+                        scanner,
+                        on_entry,
+                        stats,
+                        budget,
                     )
-                    response.raise_for_status()
-                    payload = response.json()
-                    text = payload.get("response", "").strip()
-                if not text:
-                    LOGGER.warning("Ollama-%s-Antwort enthielt keinen Text.", mode)
-                    continue
-                decoded = self._decode_llm_json(text)
-                if decoded is None:
-                    raise json.JSONDecodeError("invalid json", text, 0)
-                return decoded
-            except (requests.RequestException, json.JSONDecodeError, KeyError) as exc:
-                last_exc = exc
-                LOGGER.warning("Ollama-%s-Request fehlgeschlagen: %s", mode, exc)
-        if last_exc:
-            LOGGER.warning("LLM-Kommunikation fehlgeschlagen: %s", last_exc)
+                except LLMBackendError:
+                    if not scanner.entries:
+                        raise
+                    if budget is not None and budget.expired():
+                        budget.degrade(task or "llm", "Stream am Ende des Zeitbudgets abgebrochen")
+                result = self._finish_stream(scanner, stats)
+                if result is None:
+                    raise LLMBackendError(f"{backend.name}: Stream ohne verwertbares JSON")
+                return result
+
+        return pool.call(attempt, items=items)
+
+    @staticmethod
+    def _consume_stream(
+        chunks: Iterable[str],
+        scanner: IncrementalJSONScanner,
+        on_entry: Optional[Callable[[object], None]],
+        stats: Optional[CallStats] = None,
+        budget: Optional[TimeBudget] = None,
+    ) -> None:
+        try:
+            for chunk in chunks:
+                if stats is not None:
+                    stats.mark_first_token()
+                for entry in scanner.feed(chunk):
+                    if on_entry:
+                        on_entry(entry)
+                if budget is not None and budget.expired():
+                    raise LLMBackendError("Zeitbudget während des Streams abgelaufen")
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    def _finish_stream(
+        self,
+        scanner: IncrementalJSONScanner,
+        stats: Optional[CallStats] = None,
+    ) -> Optional[Dict[str, object]]:
+        """Dekodiert den vollständigen Stream oder rettet alle abgeschlossenen Elemente."""
+        decoded = self._decode_llm_json(scanner.text, stats)
+        if isinstance(decoded, dict):
+            return decoded
+        if scanner.entries:
+            LOGGER.warning(
+                "LLM-Stream unvollständig – übernehme %s abgeschlossene Einträge.",
+                len(scanner.entries),
+            )
+            if stats is not None:
+                stats.truncated = True
+            return nest_entries(scanner.array_path, scanner.entries)
         return None
 
-    def _decode_llm_json(self, text: str) -> Optional[Dict[str, object]]:
-        trimmed = text.strip()
-        if not trimmed:
+    def _decode_llm_json(self, text: str, stats: Optional[CallStats] = None) -> Optional[Dict[str, object]]:
+        """Dekodiert eine Antwort in einem Durchgang und repariert typische Fehler.
+
+        Reparaturen, Parse-Fehler und (falls vom Backend nicht gemeldet) die
+        geschätzte Antwortlänge landen in ``stats``.
+        """
+        if stats is not None and stats.completion_tokens is None:
+            stats.completion_tokens = estimate_tokens(text or "")
+            stats.tokens_estimated = True
+        if not text or not text.strip():
+            if stats is not None:
+                stats.parse_failed = True
             return None
-        try:
-            return json.loads(trimmed)
-        except json.JSONDecodeError:
-            try:
-                extracted = _extract_json_block(trimmed)
-                repaired = _auto_close_json(extracted)
-                return json.loads(repaired)
-            except json.JSONDecodeError:
-                return None
+        result = parse_tolerant(text)
+        if result.repaired:
+            LOGGER.info("LLM-Antwort repariert: %s", result.summary())
+            dump_malformed_output(text, "llm")
+            if stats is not None:
+                stats.repairs = result.summary()
+                stats.truncated = result.truncated
+        decoded = result.value if isinstance(result.value, dict) and not result.failed else None
+        if decoded is None and stats is not None:
+            stats.parse_failed = True
+        return decoded
 
     def _infer_layer_type(self, payload: Dict[str, object]) -> Optional[str]:
         """Versucht, fehlende Layer-Typen aus Feldern abzuleiten."""
@@ -354,36 +1018,47 @@ class LLMManager:
         result: List[Classification] = []
         for index, item in enumerate(entries):
             try:
-                if not isinstance(item, dict):
-                    raise TypeError("Eintrag ist kein Objekt.")
-                fallback_path = assets[index].asset_path if index < len(assets) else assets[0].asset_path
-                asset_path = Path(item.get("asset_path") or fallback_path)
-                primary_category = item.get("primary_category") or item.get("class") or "PROP"
-                sub_category = item.get("sub_category") or item.get("subclass") or "Generic"
-                tags = item.get("tags") or item.get("classifications") or []
-                style = item.get("style") or item.get("visual_style") or "realistic"
-                biomes = item.get("biomes") or item.get("biome") or []
-                technical = item.get("technical") or {}
-                if isinstance(biomes, str):
-                    biomes = [biomes]
-                if not isinstance(tags, list):
-                    tags = [str(tags)]
-                if not isinstance(technical, dict):
-                    technical = {}
-                classification = Classification(
-                    asset_path=asset_path,
-                    primary_category=str(primary_category),
-                    sub_category=str(sub_category),
-                    tags=[str(tag) for tag in tags],
-                    style=str(style),
-                    biomes=[str(biome) for biome in biomes],
-                    technical=technical,
-                )
-                result.append(classification)
+                result.append(self._classification_from_entry(item, index, assets))
             except (KeyError, IndexError, TypeError, ValueError) as exc:
                 LOGGER.warning("Ungültige Klassifikation im LLM-Output (ignoriert): %s", exc)
         return result
 
+    def _classification_from_entry(
+        self,
+        item: object,
+        index: int,
+        assets: Sequence[AssetData],
+    ) -> Classification:
+        """Wandelt einen einzelnen Eintrag aus ``classifications[]`` um."""
+        if not isinstance(item, dict):
+            raise TypeError("Eintrag ist kein Objekt.")
+        fallback_path = assets[index].asset_path if index < len(assets) else assets[0].asset_path
+        reference = item.get("asset_path") or item.get("id")
+        # Kompakte Prompts referenzieren Assets über Kurz-IDs (a0, a1, ...).
+        referenced = resolve_asset_ref(reference, assets)
+        asset_path = referenced.asset_path if referenced else Path(reference or fallback_path)
+        primary_category = item.get("primary_category") or item.get("class") or "PROP"
+        sub_category = item.get("sub_category") or item.get("subclass") or "Generic"
+        tags = item.get("tags") or item.get("classifications") or []
+        style = item.get("style") or item.get("visual_style") or "realistic"
+        biomes = item.get("biomes") or item.get("biome") or []
+        technical = item.get("technical") or {}
+        if isinstance(biomes, str):
+            biomes = [biomes]
+        if not isinstance(tags, list):
+            tags = [str(tags)]
+        if not isinstance(technical, dict):
+            technical = {}
+        return Classification(
+            asset_path=asset_path,
+            primary_category=str(primary_category),
+            sub_category=str(sub_category),
+            tags=[str(tag) for tag in tags],
+            style=str(style),
+            biomes=[str(biome) for biome in biomes],
+            technical=technical,
+        )
+
     def _parse_pcg_plan(self, payload: Optional[Dict[str, object]], context_assets: Sequence[AssetData]) -> Optional[PCGPlan]:
         """Validiert den LLM-Output für PCG-Pläne."""
         if not payload or "pcg_plan" not in payload:
@@ -399,40 +1074,9 @@ class LLMManager:
         try:
             layers = []
             for raw in raw_layers:
-                if not isinstance(raw, dict):
-                    continue
-                layer_type = (
-                    raw.get("type")
-                    or raw.get("layer_type")
-                    or self._infer_layer_type(raw)
-                )
-                if not layer_type:
-                    LOGGER.warning("PCG-Layer ohne 'type' verworfen: %s", raw)
-                    continue
-                layer_type = self._normalize_layer_type(layer_type, raw)
-                purpose = raw.get("purpose") or raw.get("description") or layer_type
-                assets = self._resolve_assets(raw.get("assets", []), context_assets, raw)
-                parameters = dict(raw.get("parameters", {}))
-                for key in ("count_min", "count_max", "probability", "density"):
-                    if key in raw and key not in parameters:
-                        parameters[key] = raw[key]
-                filters = [
-                    PCGFilterSpec(
-                        filter_spec.get("type", "Unknown"),
-                        {k: v for k, v in filter_spec.items() if k != "type"},
-                    )
-                    for filter_spec in raw.get("filters", [])
-                    if isinstance(filter_spec, dict)
-                ]
-                layers.append(
-                    PCGLayer(
-                        layer_type=str(layer_type),
-                        purpose=str(purpose),
-                        assets=assets,
-                        parameters=parameters,
-                        filters=filters,
-                    )
-                )
+                layer = self._layer_from_payload(raw, context_assets)
+                if layer:
+                    layers.append(layer)
             if not layers:
                 LOGGER.warning("Keine gueltigen Layer im PCG-Plan gefunden.")
                 return None
@@ -445,11 +1089,37 @@ class LLMManager:
             LOGGER.warning("PCG-Plan konnte nicht geparst werden: %s", exc)
             return None
 
-
-def _chunked(sequence: Sequence[AssetData], size: int):
-    """Teilt eine Sequenz in handliche Teilmengen auf."""
-    if size <= 0:
-        yield sequence
-        return
-    for i in range(0, len(sequence), size):
-        yield sequence[i : i + size]
+    def _layer_from_payload(self, raw: object, context_assets: Sequence[AssetData]) -> Optional[PCGLayer]:
+        """Wandelt einen Eintrag aus ``pcg_plan.layers[]`` in einen PCGLayer um."""
+        if not isinstance(raw, dict):
+            return None
+        layer_type = (
+            raw.get("type")
+            or raw.get("layer_type")
+            or self._infer_layer_type(raw)
+        )
+        if not layer_type:
+            LOGGER.warning("PCG-Layer ohne 'type' verworfen: %s", raw)
+            return None
+        layer_type = self._normalize_layer_type(layer_type, raw)
+        purpose = raw.get("purpose") or raw.get("description") or layer_type
+        assets = self._resolve_assets(raw.get("assets", []), context_assets, raw)
+        parameters = dict(raw.get("parameters", {}))
+        for key in ("count_min", "count_max", "probability", "density"):
+            if key in raw and key not in parameters:
+                parameters[key] = raw[key]
+        filters = [
+            PCGFilterSpec(
+                filter_spec.get("type", "Unknown"),
+                {k: v for k, v in filter_spec.items() if k != "type"},
+            )
+            for filter_spec in raw.get("filters", [])
+            if isinstance(filter_spec, dict)
+        ]
+        return PCGLayer(
+            layer_type=str(layer_type),
+            purpose=str(purpose),
+            assets=assets,
+            parameters=parameters,
+            filters=filters,
+        )
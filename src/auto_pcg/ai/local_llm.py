@@ -2,27 +2,243 @@
 
 from __future__ import annotations
 
+import hashlib
+import inspect
 import json
 import logging
 import os
-import re
+import stat
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from functools import partial
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .json_repair import dump_malformed_output, parse_tolerant
+from .model_registry import ModelHandle, ModelKey, ModelRegistry, get_model_registry
 
 try:
     from llama_cpp import Llama  # type: ignore
 except ImportError:  # pragma: no cover - optional dependency
     Llama = None
 
+try:
+    from llama_cpp import LlamaGrammar  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency / ältere Versionen
+    LlamaGrammar = None
+
+try:
+    from llama_cpp import LlamaState  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    LlamaState = None
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency (kommt mit llama-cpp-python)
+    np = None
+
 LOGGER = logging.getLogger(__name__)
 
+DEFAULT_SYSTEM_PROMPT = (
+    "Du bist ein strikter JSON-Generator für den Auto-PCG KI-Assistenten. "
+    "Antworte ausschließlich mit gültigem JSON."
+)
+
+
+# Kopfzeile der Zustandsdateien; danach 4 Byte Header-Länge, JSON-Header und Nutzdaten.
+STATE_FILE_MAGIC = b"AUTO_PCG_LLSTATE 1\n"
+_MAX_STATE_HEADER_BYTES = 1 << 20
+
 
 class LocalLLMError(RuntimeError):
     """Signalisiert Fehler in der lokalen LLM-Ausführung."""
 
 
+class LocalLLMBusy(LocalLLMError):
+    """Das Modell wurde innerhalb der erlaubten Wartezeit nicht frei."""
+
+
+class PrefixStateCache:
+    """LRU-Cache für llama.cpp-Zustände nach gemeinsamen Prompt-Präfixen.
+
+    Ein Zustand enthält Token-IDs und KV-Cache eines früheren Aufrufs mit dem
+    gleichen statischen Präfix. Nach ``load_state`` erkennt llama.cpp den
+    gemeinsamen Token-Anfang und wertet nur noch den variablen Rest aus.
+    Optional werden die Zustände auf die Platte geschrieben (Warmstart).
+
+    Auf der Platte liegt kein Pickle, sondern ein JSON-Header mit Skalarfeldern
+    und SHA-256 sowie die rohen Bytes bzw. NumPy-Puffer des Zustands; Dateien
+    mit falscher Prüfsumme oder fremdem Schlüssel werden ignoriert. Verzeichnisse,
+    die einem anderen Benutzer gehören oder für alle beschreibbar sind, werden
+    nicht verwendet.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_entries: int = 4) -> None:
+        self.cache_dir = cache_dir if cache_dir is not None and _trusted_directory(cache_dir) else None
+        self.max_entries = max(1, max_entries)
+        self._states: "OrderedDict[str, object]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._states
+
+    def get(self, key: str) -> Optional[object]:
+        state = self._states.get(key)
+        if state is not None:
+            self._states.move_to_end(key)
+            return state
+        state = self._load_from_disk(key)
+        if state is not None:
+            self._remember(key, state)
+        return state
+
+    def put(self, key: str, state: object) -> None:
+        self._remember(key, state)
+        self._save_to_disk(key, state)
+
+    def _remember(self, key: str, state: object) -> None:
+        self._states[key] = state
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_entries:
+            self._states.popitem(last=False)
+
+    def _state_file(self, key: str) -> Optional[Path]:
+        return self.cache_dir / f"{key}.llstate" if self.cache_dir else None
+
+    def _load_from_disk(self, key: str) -> Optional[object]:
+        path = self._state_file(key)
+        if not path or not path.exists() or LlamaState is None:
+            return None
+        try:
+            if not _owned_by_current_user(path):
+                raise ValueError("Datei gehört einem anderen Benutzer")
+            with path.open("rb") as stream:
+                values = _read_state_file(stream, key)
+            state = _build_llama_state(values)
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            LOGGER.warning("Präfix-Zustand %s konnte nicht geladen werden: %s", path, exc)
+            return None
+        LOGGER.info("Präfix-Zustand von Platte geladen: %s", path.name)
+        return state
+
+    def _save_to_disk(self, key: str, state: object) -> None:
+        path = self._state_file(key)
+        if not path:
+            return
+        try:
+            header, blobs = _encode_state(key, state)
+            path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            # Mehrere Worker-Prozesse können denselben Zustand gleichzeitig sichern.
+            temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with temp_path.open("wb") as stream:
+                encoded = json.dumps(header).encode("utf-8")
+                stream.write(STATE_FILE_MAGIC)
+                stream.write(len(encoded).to_bytes(4, "big"))
+                stream.write(encoded)
+                for blob in blobs:
+                    stream.write(blob)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError) as exc:
+            LOGGER.warning("Präfix-Zustand konnte nicht gespeichert werden (%s): %s", path, exc)
+
+
+def _trusted_directory(path: Path) -> bool:
+    """Verzeichnis für Zustandsdateien: nur eigene, nicht für alle beschreibbare Ordner."""
+    path = Path(path)
+    if not path.exists():
+        return True  # wird beim ersten Speichern mit 0700 angelegt
+    try:
+        mode = path.stat().st_mode
+    except OSError:
+        return False
+    if not _owned_by_current_user(path) or mode & stat.S_IWOTH:
+        LOGGER.warning(
+            "Präfix-Cache %s gehört einem anderen Benutzer oder ist für alle beschreibbar – nur RAM-Cache.",
+            path,
+        )
+        return False
+    return True
+
+
+def _owned_by_current_user(path: Path) -> bool:
+    getuid = getattr(os, "getuid", None)
+    if getuid is None:  # pragma: no cover - Windows: keine POSIX-Besitzer
+        return True
+    return path.stat().st_uid == getuid()
+
+
+def _encode_state(key: str, state: object) -> Tuple[Dict[str, object], List[bytes]]:
+    """Zerlegt einen ``LlamaState`` in JSON-taugliche Felder und rohe Puffer."""
+    fields: Dict[str, object] = {}
+    buffers: List[Dict[str, object]] = []
+    blobs: List[bytes] = []
+    for name, value in vars(state).items():
+        if value is None or isinstance(value, (bool, int, float, str)):
+            fields[name] = value
+        elif isinstance(value, (bytes, bytearray)):
+            buffers.append({"name": name, "size": len(value)})
+            blobs.append(bytes(value))
+        elif np is not None and isinstance(value, np.ndarray):
+            data = np.ascontiguousarray(value).tobytes()
+            buffers.append({"name": name, "size": len(data), "dtype": value.dtype.str, "shape": list(value.shape)})
+            blobs.append(data)
+        else:
+            raise TypeError(f"Feld {name} ({type(value).__name__}) lässt sich nicht sicher speichern")
+    digest = hashlib.sha256()
+    for blob in blobs:
+        digest.update(blob)
+    header = {"key": key, "fields": fields, "buffers": buffers, "sha256": digest.hexdigest()}
+    return header, blobs
+
+
+def _read_state_file(stream, key: str) -> Dict[str, object]:
+    """Liest und prüft eine Zustandsdatei; wirft ``ValueError`` bei jeder Abweichung."""
+    if stream.read(len(STATE_FILE_MAGIC)) != STATE_FILE_MAGIC:
+        raise ValueError("unbekanntes Dateiformat")
+    header_size = int.from_bytes(stream.read(4), "big")
+    if not 0 < header_size <= _MAX_STATE_HEADER_BYTES:
+        raise ValueError(f"ungültige Header-Länge {header_size}")
+    header = json.loads(stream.read(header_size).decode("utf-8"))
+    if header.get("key") != key:
+        raise ValueError("Schlüssel passt nicht zum Dateinamen")
+    values: Dict[str, object] = dict(header["fields"])
+    digest = hashlib.sha256()
+    for buffer in header["buffers"]:
+        size = int(buffer["size"])
+        data = stream.read(size)
+        if len(data) != size:
+            raise ValueError("Datei abgeschnitten")
+        digest.update(data)
+        if "dtype" in buffer:
+            if np is None:
+                raise ValueError("NumPy fehlt für Array-Felder")
+            array = np.frombuffer(data, dtype=np.dtype(buffer["dtype"])).reshape(buffer["shape"])
+            values[buffer["name"]] = array.copy()
+        else:
+            values[buffer["name"]] = data
+    if stream.read(1):
+        raise ValueError("unerwartete Daten am Dateiende")
+    if digest.hexdigest() != header["sha256"]:
+        raise ValueError("Prüfsumme stimmt nicht")
+    return values
+
+
+def _build_llama_state(values: Dict[str, object]) -> object:
+    """Baut einen ``LlamaState`` aus gelesenen Feldern (unabhängig von der Feldreihenfolge)."""
+    parameters = inspect.signature(LlamaState).parameters
+    state = LlamaState(**{name: value for name, value in values.items() if name in parameters})
+    for name, value in values.items():
+        if name not in parameters:
+            setattr(state, name, value)
+    return state
+
+
 class LocalGGUFClient:
-    """Hilfsklasse, die direkt ein GGUF-Modell über llama.cpp lädt."""
+    """Hilfsklasse, die direkt ein GGUF-Modell über llama.cpp lädt.
+
+    Die Llama-Instanz stammt aus der prozessweiten :class:`ModelRegistry`;
+    weitere Clients mit gleichem Modell und Kontext-Setup teilen sie sich.
+    """
 
     def __init__(
         self,
@@ -32,6 +248,10 @@ class LocalGGUFClient:
         temperature: float = 0.15,
         chat_format: str = "llama-3",
         n_gpu_layers: Optional[int] = None,
+        prefix_cache_dir: Optional[Path] = None,
+        reuse_prefix_state: bool = True,
+        registry: Optional[ModelRegistry] = None,
+        n_threads: Optional[int] = None,
     ) -> None:
         if Llama is None:
             raise LocalLLMError(
@@ -40,45 +260,192 @@ class LocalGGUFClient:
         if not model_path.exists():
             raise LocalLLMError(f"GGUF-Modell nicht gefunden: {model_path}")
         self.model_path = model_path
+        self.context_tokens = context_tokens
+        self.chat_format = chat_format
         self.temperature = temperature
         self.max_tokens = max_tokens
-        gpu_layers = self._resolve_gpu_layers(n_gpu_layers)
-        self._llama = self._init_llama(
-            model_path=model_path,
-            context_tokens=context_tokens,
-            chat_format=chat_format,
-            gpu_layers=gpu_layers,
-        )
-
-    def generate_json(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, object]:
-        """Führt eine Chat Completion aus und gibt JSON zurück."""
-        system_prompt = system_prompt or (
-            "Du bist ein strikter JSON-Generator für den Auto-PCG KI-Assistenten. "
-            "Antworte ausschließlich mit gültigem JSON."
-        )
-        response = self._llama.create_chat_completion(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
+        self._registry = registry or get_model_registry()
+        gpu_layers = self._resolve_gpu_layers(n_gpu_layers)
+        self._model_key = ModelKey.create(model_path, context_tokens, gpu_layers, chat_format)
+        self._loader = partial(
+            self._init_llama,
+            model_path=model_path,
+            context_tokens=context_tokens,
+            chat_format=chat_format,
+            gpu_layers=gpu_layers,
+            n_threads=max(1, n_threads) if n_threads else os.cpu_count() or 4,
         )
-        content = response["choices"][0]["message"]["content"].strip()
-        content = _extract_json_block(content)
+        self._reuse_prefix_state = reuse_prefix_state
+        self._prefix_cache_dir = self._resolve_prefix_cache_dir(prefix_cache_dir) if reuse_prefix_state else None
+        # Lädt sofort, damit Fehler beim Erzeugen des Clients auffallen (bereits geladen = sofort).
+        self.warmup()
+
+    def warmup(self) -> None:
+        """Stellt sicher, dass das Modell geladen ist (z. B. vor dem ersten Lauf)."""
+        self._registry.acquire(self._model_key, self._loader)
+
+    def generate_json(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        *,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+    ) -> Dict[str, object]:
+        """Führt eine Chat Completion aus und gibt JSON zurück.
+
+        ``prefix`` ist der statische Anfang von ``prompt``; dessen KV-Cache wird
+        zwischen Aufrufen wiederverwendet. Mit ``schema`` wird die Ausgabe per
+        Grammatik auf dieses JSON-Schema beschränkt und endet mit dem Wurzelobjekt.
+        """
+        content = self.complete_text(prompt, system_prompt, prefix=prefix, schema=schema)
+        result = parse_tolerant(content)
+        if result.repaired:
+            # Mit Schema nur möglich, wenn max_tokens die Ausgabe abgeschnitten hat.
+            LOGGER.warning("GGUF-Antwort repariert: %s", result.summary())
+            dump_malformed_output(content, "gguf")
+        if not isinstance(result.value, dict) or result.failed:
+            LOGGER.error("LLM-Antwort konnte nicht als JSON geparst werden.\nAntwort: %s", content)
+            raise LocalLLMError("Ungültige JSON-Antwort durch das GGUF-Modell")
+        return result.value
+
+    def complete_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        *,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        usage: Optional[Dict[str, object]] = None,
+        wait: Optional[float] = None,
+    ) -> str:
+        """Wie :meth:`generate_json`, liefert aber den unverarbeiteten Antworttext.
+
+        Ein übergebenes ``usage``-Dict erhält die Token-Zahlen der Completion.
+        ``wait`` begrenzt die Wartezeit auf das (evtl. belegte) Modell; danach
+        folgt :class:`LocalLLMBusy`, ohne dass generiert wurde.
+        """
+        system_prompt = system_prompt or DEFAULT_SYSTEM_PROMPT
+        with self._lease(wait) as handle:
+            prefix_key = self._activate_prefix(handle, prompt, prefix, system_prompt)
+            response = handle.llama.create_chat_completion(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                **_constraint_kwargs(schema),
+            )
+            self._remember_prefix(handle, prefix_key)
+        if usage is not None and isinstance(response.get("usage"), dict):
+            usage.update(response["usage"])
         try:
-            return json.loads(content)
-        except json.JSONDecodeError:
-            repaired = _auto_close_json(content)
+            return str(response["choices"][0]["message"]["content"] or "")
+        except (KeyError, IndexError, TypeError) as exc:
+            raise LocalLLMError(f"Unerwartete Antwortstruktur des GGUF-Modells: {exc}") from exc
+
+    def stream_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        *,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        wait: Optional[float] = None,
+    ) -> Iterator[str]:
+        """Streamt die Chat Completion als Text-Deltas, während das Modell generiert."""
+        system_prompt = system_prompt or DEFAULT_SYSTEM_PROMPT
+        with self._lease(wait) as handle:
+            prefix_key = self._activate_prefix(handle, prompt, prefix, system_prompt)
             try:
-                return json.loads(repaired)
-            except json.JSONDecodeError as exc:
-                LOGGER.error(
-                    "LLM-Antwort konnte nicht als JSON geparst werden: %s\nAntwort: %s",
-                    exc,
-                    content,
+                chunks = handle.llama.create_chat_completion(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    **_constraint_kwargs(schema),
                 )
-                raise LocalLLMError("Ungültige JSON-Antwort durch das GGUF-Modell") from exc
+                for chunk in chunks:
+                    delta = chunk["choices"][0].get("delta") or {}
+                    content = delta.get("content")
+                    if content:
+                        yield content
+            except (KeyError, IndexError, RuntimeError, ValueError) as exc:
+                handle.active_prefix = None
+                raise LocalLLMError(f"Streaming durch das GGUF-Modell fehlgeschlagen: {exc}") from exc
+            self._remember_prefix(handle, prefix_key)
+
+    @contextmanager
+    def _lease(self, wait: Optional[float]) -> Iterator[ModelHandle]:
+        """Leiht die geteilte Instanz; ``TimeoutError`` der Registry wird zu :class:`LocalLLMBusy`."""
+        with ExitStack() as stack:
+            try:
+                handle = stack.enter_context(self._registry.lease(self._model_key, self._loader, wait=wait))
+            except TimeoutError as exc:
+                raise LocalLLMBusy(str(exc)) from exc
+            yield handle
+
+    def _activate_prefix(
+        self,
+        handle: ModelHandle,
+        prompt: str,
+        prefix: Optional[str],
+        system_prompt: str,
+    ) -> Optional[str]:
+        """Stellt den gespeicherten Zustand für das Präfix wieder her (Lock muss gehalten werden)."""
+        if not self._reuse_prefix_state or not prefix or not prompt.startswith(prefix):
+            handle.active_prefix = None
+            return None
+        if handle.prefix_cache is None:
+            handle.prefix_cache = PrefixStateCache(self._prefix_cache_dir)
+        key = self._prefix_key(prefix, system_prompt)
+        if key == handle.active_prefix:
+            # Der letzte Aufruf hatte dasselbe Präfix – llama.cpp erkennt es selbst.
+            return key
+        state = handle.prefix_cache.get(key)
+        if state is not None:
+            try:
+                handle.llama.load_state(state)
+                LOGGER.debug("Präfix-Zustand %s wiederhergestellt.", key[:12])
+            except (AttributeError, RuntimeError, ValueError) as exc:
+                LOGGER.warning("Präfix-Zustand konnte nicht geladen werden: %s", exc)
+        return key
+
+    def _remember_prefix(self, handle: ModelHandle, prefix_key: Optional[str]) -> None:
+        """Sichert den Zustand nach dem ersten Aufruf eines neuen Präfixes."""
+        handle.active_prefix = prefix_key
+        cache = handle.prefix_cache
+        if cache is None or prefix_key is None or prefix_key in cache:
+            return
+        try:
+            cache.put(prefix_key, handle.llama.save_state())
+        except (AttributeError, RuntimeError, ValueError) as exc:
+            LOGGER.warning("Präfix-Zustand konnte nicht gesichert werden: %s", exc)
+
+    def _prefix_key(self, prefix: str, system_prompt: str) -> str:
+        """Schlüssel aus Modell-Datei, Kontext-Setup und Präfixtext."""
+        try:
+            file_stat = self.model_path.stat()
+            model_marker = f"{self.model_path.resolve()}|{file_stat.st_size}|{int(file_stat.st_mtime)}"
+        except OSError:
+            model_marker = str(self.model_path)
+        material = "|".join([model_marker, str(self.context_tokens), self.chat_format, system_prompt, prefix])
+        return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _resolve_prefix_cache_dir(override: Optional[Path]) -> Optional[Path]:
+        """Liest das Verzeichnis für persistierte Präfix-Zustände."""
+        if override is not None:
+            return Path(override)
+        env_value = os.getenv("AUTO_PCG_PREFIX_CACHE")
+        if env_value is not None:
+            # Leerer Wert deaktiviert die Persistenz, der RAM-Cache bleibt aktiv.
+            return Path(env_value).expanduser() if env_value.strip() else None
+        return Path.home() / ".cache" / "auto_pcg" / "prefix_states"
 
 
     def _init_llama(
@@ -88,6 +455,7 @@ class LocalGGUFClient:
         context_tokens: int,
         chat_format: str,
         gpu_layers: int,
+        n_threads: int,
     ) -> "Llama":
         """Initialisiert das Llama-Objekt und fällt bei Fehlern auf CPU zurück."""
         use_gpu = gpu_layers != 0
@@ -101,7 +469,7 @@ class LocalGGUFClient:
                 model_path=str(model_path),
                 n_ctx=context_tokens,
                 chat_format=chat_format,
-                n_threads=os.cpu_count() or 4,
+                n_threads=n_threads,
                 n_gpu_layers=gpu_layers,
             )
         except (OSError, RuntimeError) as exc:
@@ -115,7 +483,7 @@ class LocalGGUFClient:
                         model_path=str(model_path),
                         n_ctx=context_tokens,
                         chat_format=chat_format,
-                        n_threads=os.cpu_count() or 4,
+                        n_threads=n_threads,
                         n_gpu_layers=0,
                     )
                 except (OSError, RuntimeError) as cpu_exc:
@@ -139,158 +507,29 @@ class LocalGGUFClient:
             )
             return -1
 
-def _extract_json_block(text: str) -> str:
-    """Entfernt Code-Fences und versucht, nur den JSON-Teil zu extrahieren."""
-    stripped = text.strip()
-    if stripped.startswith("```"):
-        stripped = re.sub(r"^```(?:json)?", "", stripped, flags=re.IGNORECASE).strip()
-        stripped = re.sub(r"```$", "", stripped).strip()
-    if stripped.startswith("{") or stripped.startswith("["):
-        return stripped
-    match = re.search(r"(\{.*\})", stripped, re.DOTALL)
-    if match:
-        return match.group(1)
-    match = re.search(r"(\[.*\])", stripped, re.DOTALL)
-    if match:
-        return match.group(1)
-    return stripped
-
-
-
-def _append_missing_closers(text: str) -> str:
-    """Hängt fehlende schließende Klammern basierend auf einer Stack-Analyse an."""
-    stack: list[str] = []
-    in_string = False
-    escape = False
-    for char in text:
-        if in_string:
-            if escape:
-                escape = False
-            elif char == "\\":
-                escape = True
-            elif char == '"':
-                in_string = False
-            continue
-        if char == '"':
-            in_string = True
-            continue
-        if char in "{[":
-            stack.append(char)
-        elif char in "}]":
-            if stack and ((char == "}" and stack[-1] == "{") or (char == "]" and stack[-1] == "[")):
-                stack.pop()
-            else:
-                break
-    closing = "".join("}" if ch == "{" else "]" for ch in reversed(stack))
-    return text + closing
-
-
-def _auto_close_json(text: str) -> str:
-    """Versucht, fehlende Klammern am Ende zu ergänzen."""
-    candidate = _append_missing_closers(text)
-    try:
-        json.loads(candidate)
-        return candidate
-    except json.JSONDecodeError:
-        return _repair_json_lines(candidate)
-
 
-def _repair_json_lines(text: str) -> str:
-    """Versucht, abgeschnittene JSON-Dokumente aggressiver zu reparieren."""
-    parsed = _try_parse_with_trimming(text)
-    if parsed is not None:
-        return json.dumps(_prune_classifications(parsed), ensure_ascii=False)
+_GRAMMAR_CACHE: Dict[str, object] = {}
+_GRAMMAR_LOCK = threading.Lock()
 
-    if '"asset_path"' in text:
-        entries = _extract_objects_with_key(text, "asset_path")
-        if entries:
-            payload = {"classifications": entries}
-            return json.dumps(_prune_classifications(payload), ensure_ascii=False)
 
-    return text
+def _constraint_kwargs(schema: Optional[Dict[str, object]]) -> Dict[str, object]:
+    """Übersetzt ein JSON-Schema in Parameter für ``create_chat_completion``.
 
-
-def _try_parse_with_trimming(text: str) -> Optional[object]:
-    """Schneidet sukzessive ungültige Enden ab und versucht nach jedem Schritt zu parsen."""
-    candidate = text
-    while candidate:
-        try:
-            return json.loads(candidate)
-        except json.JSONDecodeError as exc:
-            trim_point = _find_trim_point(candidate, exc.pos)
-            if trim_point is None:
-                break
-            trimmed = candidate[:trim_point].rstrip()
-            if not trimmed:
-                break
-            sanitized = _strip_dangling_openers(_strip_trailing_comma(trimmed)).rstrip()
-            if not sanitized:
-                break
-            candidate = _append_missing_closers(sanitized)
-    return None
-
-
-def _find_trim_point(text: str, error_pos: int) -> Optional[int]:
-    """Bestimmt die Position, bis zu der Text abgeschnitten werden soll."""
-    if error_pos <= 0:
-        return None
-    newline_index = text.rfind("\n", 0, error_pos)
-    if newline_index != -1:
-        return newline_index
-    return error_pos - 1 if error_pos > 0 else None
-
-
-def _strip_trailing_comma(text: str) -> str:
-    """Entfernt ein finales Komma inklusive Leerraum."""
-    return re.sub(r",\s*$", "", text)
-
-
-def _strip_dangling_openers(text: str) -> str:
-    """Entfernt offene geschweifte oder eckige Klammern am Ende."""
-    return re.sub(r"[\t ]*[\{\[]\s*$", "", text)
-
-
-def _extract_objects_with_key(text: str, key: str) -> list[Dict[str, object]]:
-    """Extrahiert vollständige JSON-Objekte, die den angegebenen Schlüssel enthalten."""
-    results: list[Dict[str, object]] = []
-    brace_stack: list[int] = []
-    in_string = False
-    escape = False
-    for idx, char in enumerate(text):
-        if in_string:
-            if escape:
-                escape = False
-            elif char == "\\":
-                escape = True
-            elif char == '"':
-                in_string = False
-            continue
-        if char == '"':
-            in_string = True
-            continue
-        if char == "{":
-            brace_stack.append(idx)
-        elif char == "}" and brace_stack:
-            start = brace_stack.pop()
-            chunk = text[start : idx + 1]
-            if f'"{key}"' not in chunk:
-                continue
+    Bevorzugt eine vorkompilierte GBNF-Grammatik (einmal pro Schema); ältere
+    llama-cpp-python-Versionen ohne ``LlamaGrammar`` erhalten ``response_format``.
+    """
+    if not schema:
+        return {}
+    if LlamaGrammar is None:
+        return {"response_format": {"type": "json_object", "schema": schema}}
+    schema_json = json.dumps(schema, sort_keys=True)
+    with _GRAMMAR_LOCK:
+        grammar = _GRAMMAR_CACHE.get(schema_json)
+        if grammar is None:
             try:
-                obj = json.loads(chunk)
-            except json.JSONDecodeError:
-                continue
-            if isinstance(obj, dict) and key in obj:
-                results.append(obj)
-    return results
-
-
-def _prune_classifications(payload: object) -> object:
-    """Entfernt Klassifikationsobjekte ohne asset_path, falls vorhanden."""
-    if isinstance(payload, dict):
-        entries = payload.get("classifications")
-        if isinstance(entries, list):
-            payload = payload.copy()
-            payload["classifications"] = [
-                entry for entry in entries if isinstance(entry, dict) and entry.get("asset_path")
-            ]
-    return payload
+                grammar = LlamaGrammar.from_json_schema(schema_json, verbose=False)
+            except (TypeError, ValueError, RuntimeError) as exc:
+                LOGGER.warning("JSON-Schema konnte nicht in eine Grammatik übersetzt werden: %s", exc)
+                return {"response_format": {"type": "json_object", "schema": schema}}
+            _GRAMMAR_CACHE[schema_json] = grammar
+    return {"grammar": grammar}
@@ -0,0 +1,345 @@
+"""Mehrere llama.cpp-Prozesse für CPU-Maschinen mit vielen Kernen.
+
+Eine einzelne llama.cpp-Instanz skaliert auf großen CPU-Maschinen schlecht über
+etwa 16 Threads hinaus. :class:`LocalProcessPool` startet deshalb ``processes``
+Worker, die das GGUF-Modell je einmal mit ``threads_per_process`` Threads laden
+(die Gewichte teilen sich die Prozesse über den Page-Cache des Betriebssystems)
+und Prompts aus einer gemeinsamen Warteschlange abarbeiten. Antworttexte landen
+in einem Shared-Memory-Bereich je Worker; über die Ergebnis-Queue laufen nur
+kurze Statusmeldungen.
+"""
+
+from __future__ import annotations
+
+import atexit
+import concurrent.futures
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import weakref
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import ClassVar, Dict, List, Optional, Set, Tuple
+
+from .local_llm import Llama, LocalGGUFClient, LocalLLMError
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_THREADS_PER_PROCESS = 8
+# Größere Antworten gehen ausnahmsweise direkt über die Ergebnis-Queue.
+DEFAULT_RESULT_BYTES = 1 << 20
+
+
+class LocalProcessPool:
+    """Verteilt Prompts auf mehrere Worker-Prozesse mit je einem GGUF-Modell.
+
+    ``complete_text`` blockiert wie :meth:`LocalGGUFClient.complete_text`, kann
+    aber aus bis zu ``processes`` Threads gleichzeitig aufgerufen werden. Stirbt
+    ein Worker, schlägt nur sein laufender Auftrag fehl; fallen alle aus, werden
+    weitere Aufrufe sofort mit :class:`LocalLLMError` beantwortet.
+
+    :meth:`shared` liefert prozessweit einen Pool je Konfiguration, damit z. B.
+    jeder GUI-Lauf dieselben, bereits geladenen Worker nutzt.
+    """
+
+    _shared: ClassVar[Dict[Tuple[object, ...], "LocalProcessPool"]] = {}
+    _shared_lock: ClassVar[threading.Lock] = threading.Lock()
+    _instances: ClassVar["weakref.WeakSet[LocalProcessPool]"] = weakref.WeakSet()
+
+    def __init__(
+        self,
+        model_path: Path,
+        *,
+        processes: Optional[int] = None,
+        threads_per_process: Optional[int] = None,
+        context_tokens: int = 4096,
+        max_tokens: int = 768,
+        temperature: float = 0.15,
+        n_gpu_layers: Optional[int] = None,
+        request_timeout: float = 600.0,
+        result_bytes: int = DEFAULT_RESULT_BYTES,
+    ) -> None:
+        if Llama is None:
+            raise LocalLLMError(
+                "llama-cpp-python ist nicht installiert. Bitte `pip install llama-cpp-python` ausführen."
+            )
+        if not model_path.exists():
+            raise LocalLLMError(f"GGUF-Modell nicht gefunden: {model_path}")
+        cpu_count = os.cpu_count() or 4
+        self.model_path = model_path
+        self.threads_per_process = max(1, threads_per_process or min(DEFAULT_THREADS_PER_PROCESS, cpu_count))
+        self.processes = max(1, processes or cpu_count // self.threads_per_process)
+        self.context_tokens = context_tokens
+        self.max_tokens = max_tokens
+        self.request_timeout = request_timeout
+        client_kwargs: Dict[str, object] = {
+            "context_tokens": context_tokens,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "n_threads": self.threads_per_process,
+            # Mehrere Prozesse auf einer GPU würden sich gegenseitig verdrängen.
+            "n_gpu_layers": 0 if n_gpu_layers is None else n_gpu_layers,
+        }
+        context = multiprocessing.get_context("spawn")
+        self._jobs = context.Queue()
+        self._results = context.Queue()
+        self._slots = [shared_memory.SharedMemory(create=True, size=max(1024, result_bytes)) for _ in range(self.processes)]
+        self._slot_free = [context.Semaphore(1) for _ in range(self.processes)]
+        self._workers = [
+            context.Process(
+                target=_worker_main,
+                args=(
+                    index,
+                    str(model_path),
+                    client_kwargs,
+                    self._jobs,
+                    self._results,
+                    self._slots[index].name,
+                    self._slot_free[index],
+                ),
+                name=f"auto-pcg-llm-{index}",
+                daemon=True,
+            )
+            for index in range(self.processes)
+        ]
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._futures: Dict[int, concurrent.futures.Future] = {}
+        self._claims: Dict[int, int] = {}
+        self._ready: Set[int] = set()
+        self._dead: Set[int] = set()
+        self._all_ready = threading.Event()
+        self._closed = False
+        self._failure: Optional[str] = None
+        for worker in self._workers:
+            worker.start()
+        LocalProcessPool._instances.add(self)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="auto-pcg-llm-dispatch", daemon=True)
+        self._dispatcher.start()
+        LOGGER.info(
+            "Starte %s lokale LLM-Prozesse mit je %s Threads (%s).",
+            self.processes,
+            self.threads_per_process,
+            model_path.name,
+        )
+
+    @classmethod
+    def shared(cls, model_path: Path, **kwargs: object) -> "LocalProcessPool":
+        """Liefert einen offenen Pool gleicher Konfiguration oder startet einen neuen."""
+        try:
+            resolved = str(Path(model_path).expanduser().resolve())
+        except OSError:
+            resolved = str(model_path)
+        key = (resolved, *sorted(kwargs.items()))
+        with cls._shared_lock:
+            pool = cls._shared.get(key)
+            if pool is None or pool._closed or pool._failure:
+                pool = cls(Path(model_path), **kwargs)  # type: ignore[arg-type]
+                cls._shared[key] = pool
+            return pool
+
+    def complete_text(
+        self,
+        prompt: str,
+        *,
+        prefix: Optional[str] = None,
+        schema: Optional[Dict[str, object]] = None,
+        usage: Optional[Dict[str, object]] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Reiht den Prompt ein und wartet auf den Antworttext eines beliebigen Workers.
+
+        Ein übergebenes ``usage``-Dict erhält die Token-Zahlen des Workers.
+        ``timeout`` verkürzt die Wartezeit; die Antwort eines Workers, der danach
+        noch fertig wird, wird verworfen.
+        """
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed or self._failure:
+                raise LocalLLMError(self._failure or "Prozess-Pool ist geschlossen")
+            job_id = next(self._job_ids)
+            self._futures[job_id] = future
+        self._jobs.put((job_id, prompt, prefix, schema))
+        wait = min(self.request_timeout, timeout) if timeout else self.request_timeout
+        try:
+            text, job_usage = future.result(timeout=wait)
+        except concurrent.futures.TimeoutError as exc:
+            with self._lock:
+                self._futures.pop(job_id, None)
+            raise LocalLLMError(f"Keine Antwort eines LLM-Prozesses nach {wait:.0f}s") from exc
+        if usage is not None:
+            usage.update(job_usage)
+        return text
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wartet, bis alle Worker ihr Modell geladen haben (oder ausgefallen sind)."""
+        self._all_ready.wait(timeout)
+        with self._lock:
+            return bool(self._ready - self._dead)
+
+    @property
+    def alive_workers(self) -> int:
+        with self._lock:
+            return self.processes - len(self._dead)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Beendet alle Worker und gibt den Shared Memory frei."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            pending = list(self._futures.values())
+            self._futures.clear()
+        for future in pending:
+            future.set_exception(LocalLLMError("Prozess-Pool wurde geschlossen"))
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self._dispatcher.join(timeout)
+        for slot in self._slots:
+            slot.close()
+            try:
+                slot.unlink()
+            except FileNotFoundError:  # pragma: no cover - bereits freigegeben
+                pass
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _dispatch(self) -> None:
+        """Ordnet Statusmeldungen der Worker den wartenden Aufrufen zu."""
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):  # pragma: no cover - Queue beim Beenden geschlossen
+                return
+            kind, index = message[0], message[1]
+            if kind == "ready":
+                self._mark_ready(index)
+            elif kind == "failed":
+                LOGGER.warning("LLM-Prozess %s konnte das Modell nicht laden: %s", index, message[2])
+                self._mark_dead(index)
+            elif kind == "claim":
+                with self._lock:
+                    self._claims[index] = message[2]
+            elif kind == "done":
+                self._finish(index, *message[2:])
+
+    def _finish(
+        self,
+        index: int,
+        job_id: int,
+        length: int,
+        inline_text: Optional[str],
+        error: Optional[str],
+        usage: Optional[Dict[str, object]] = None,
+    ) -> None:
+        text = inline_text
+        if error is None and inline_text is None:
+            text = bytes(self._slots[index].buf[:length]).decode("utf-8")
+            self._slot_free[index].release()
+        with self._lock:
+            self._claims.pop(index, None)
+            future = self._futures.pop(job_id, None)
+        if future is None:
+            return  # Aufrufer hat bereits aufgegeben (Timeout)
+        if error is not None:
+            future.set_exception(LocalLLMError(error))
+        else:
+            future.set_result((text, usage or {}))
+
+    def _mark_ready(self, index: int) -> None:
+        with self._lock:
+            self._ready.add(index)
+            complete = len(self._ready | self._dead) == self.processes
+        if complete:
+            self._all_ready.set()
+            LOGGER.info("%s/%s LLM-Prozesse bereit.", self.alive_workers, self.processes)
+
+    def _check_workers(self) -> None:
+        if self._closed:
+            return
+        for index, worker in enumerate(self._workers):
+            if not worker.is_alive() and index not in self._dead:
+                LOGGER.warning("LLM-Prozess %s unerwartet beendet (Exit-Code %s).", index, worker.exitcode)
+                self._mark_dead(index)
+
+    def _mark_dead(self, index: int) -> None:
+        failed: List[concurrent.futures.Future] = []
+        with self._lock:
+            if index in self._dead:
+                return
+            self._dead.add(index)
+            job_id = self._claims.pop(index, None)
+            if job_id is not None and job_id in self._futures:
+                failed.append(self._futures.pop(job_id))
+            if len(self._dead) == self.processes:
+                self._failure = "Alle lokalen LLM-Prozesse sind ausgefallen"
+                failed.extend(self._futures.values())
+                self._futures.clear()
+            complete = len(self._ready | self._dead) == self.processes
+        if complete:
+            self._all_ready.set()
+        for future in failed:
+            future.set_exception(LocalLLMError(self._failure or f"LLM-Prozess {index} ausgefallen"))
+
+
+@atexit.register
+def _close_pools() -> None:
+    with LocalProcessPool._shared_lock:
+        LocalProcessPool._shared.clear()
+    for pool in list(LocalProcessPool._instances):
+        pool.close(timeout=2.0)
+
+
+def _worker_main(
+    index: int,
+    model_path: str,
+    client_kwargs: Dict[str, object],
+    jobs: "multiprocessing.Queue",
+    results: "multiprocessing.Queue",
+    slot_name: str,
+    slot_free: "multiprocessing.synchronize.Semaphore",
+) -> None:
+    """Einstiegspunkt eines Worker-Prozesses: Modell laden, dann Aufträge abarbeiten."""
+    slot = shared_memory.SharedMemory(name=slot_name)
+    try:
+        try:
+            client = LocalGGUFClient(Path(model_path), **client_kwargs)  # type: ignore[arg-type]
+        except LocalLLMError as exc:
+            results.put(("failed", index, str(exc)))
+            return
+        results.put(("ready", index))
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            job_id, prompt, prefix, schema = job
+            results.put(("claim", index, job_id))
+            usage: Dict[str, object] = {}
+            try:
+                text = client.complete_text(prompt, prefix=prefix, schema=schema, usage=usage)
+            except Exception as exc:  # pragma: no cover - Fehler gehen an den Aufrufer zurück
+                results.put(("done", index, job_id, 0, None, str(exc)))
+                continue
+            data = text.encode("utf-8")
+            if len(data) > slot.size:
+                results.put(("done", index, job_id, len(data), text, None, usage))
+                continue
+            # Der Bereich ist erst wieder frei, wenn der Hauptprozess die letzte Antwort gelesen hat.
+            slot_free.acquire()
+            slot.buf[: len(data)] = data
+            results.put(("done", index, job_id, len(data), None, None, usage))
+    finally:
+        slot.close()
@@ -0,0 +1,288 @@
+"""Prozessweite Registry für geladene GGUF-Modelle."""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+# Standard: Modelle bleiben 15 Minuten ohne Aufruf im Speicher.
+DEFAULT_IDLE_TIMEOUT = 900.0
+
+
+@dataclass(frozen=True, slots=True)
+class ModelKey:
+    """Identifiziert eine llama.cpp-Instanz eindeutig."""
+
+    model_path: str
+    context_tokens: int
+    gpu_layers: int
+    chat_format: str
+
+    @classmethod
+    def create(cls, model_path: Path, context_tokens: int, gpu_layers: int, chat_format: str) -> "ModelKey":
+        try:
+            resolved = str(Path(model_path).expanduser().resolve())
+        except OSError:
+            resolved = str(model_path)
+        return cls(resolved, int(context_tokens), int(gpu_layers), chat_format)
+
+
+@dataclass(slots=True)
+class ModelHandle:
+    """Geteilte Llama-Instanz samt Lock und instanzgebundenem Zustand.
+
+    ``lock`` serialisiert alle Aufrufe, weil ein llama.cpp-Kontext nicht
+    threadsicher ist. ``prefix_cache`` und ``active_prefix`` gehören zum
+    KV-Cache genau dieser Instanz und werden deshalb hier statt im Client gehalten.
+    """
+
+    key: ModelKey
+    llama: object
+    load_seconds: float
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    prefix_cache: Optional[object] = None
+    active_prefix: Optional[str] = None
+    last_used: float = field(default_factory=time.monotonic)
+    uses: int = 0
+
+
+class ModelRegistry:
+    """Lädt jedes GGUF-Modell nur einmal pro Prozess und gibt es bei Leerlauf frei.
+
+    Mehrere ``LocalGGUFClient``-Instanzen (z. B. je GUI-Lauf ein neuer Service)
+    teilen sich so dieselbe Llama-Instanz. Ein Hintergrund-Thread entlädt Modelle,
+    die länger als ``idle_timeout`` Sekunden nicht benutzt wurden; ``0`` oder ein
+    negativer Wert deaktiviert die Auslagerung.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: Optional[float] = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.idle_timeout = self._resolve_idle_timeout(idle_timeout)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._handles: Dict[ModelKey, ModelHandle] = {}
+        self._loading: Dict[ModelKey, threading.Lock] = {}
+        self._janitor: Optional[threading.Thread] = None
+        self._stop_janitor = threading.Event()
+        self._loads = 0
+        self._hits = 0
+        self._evictions = 0
+
+    def acquire(self, key: ModelKey, loader: Callable[[], object]) -> ModelHandle:
+        """Liefert die geteilte Instanz für ``key`` und lädt sie bei Bedarf."""
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                self._hits += 1
+                handle.last_used = self._clock()
+                return handle
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        # Pro Schlüssel nur ein Ladevorgang; andere Threads warten auf dessen Ergebnis.
+        with load_lock:
+            with self._lock:
+                handle = self._handles.get(key)
+                if handle is not None:
+                    self._hits += 1
+                    handle.last_used = self._clock()
+                    return handle
+            started = time.perf_counter()
+            llama = loader()
+            elapsed = time.perf_counter() - started
+            handle = ModelHandle(key=key, llama=llama, load_seconds=elapsed, last_used=self._clock())
+            with self._lock:
+                self._handles[key] = handle
+                self._loading.pop(key, None)
+                self._loads += 1
+            LOGGER.info("GGUF-Modell geladen in %.1fs: %s", elapsed, Path(key.model_path).name)
+        self._ensure_janitor()
+        return handle
+
+    @contextmanager
+    def lease(
+        self,
+        key: ModelKey,
+        loader: Callable[[], object],
+        *,
+        wait: Optional[float] = None,
+    ) -> Iterator[ModelHandle]:
+        """Hält den Lock der Instanz für die Dauer eines Aufrufs.
+
+        Eine zwischenzeitlich ausgelagerte Instanz wird transparent neu geladen.
+        Mit ``wait`` wird höchstens so viele Sekunden auf einen laufenden Aufruf
+        gewartet, danach folgt ``TimeoutError``.
+        """
+        deadline = None if wait is None else time.monotonic() + max(0.0, wait)
+        while True:
+            handle = self.acquire(key, loader)
+            lock_timeout = -1.0 if deadline is None else max(0.0, deadline - time.monotonic())
+            if not handle.lock.acquire(timeout=lock_timeout):
+                raise TimeoutError(f"GGUF-Modell nach {wait:.1f}s noch belegt")
+            try:
+                with self._lock:
+                    current = self._handles.get(key)
+                if current is not handle:
+                    continue
+                handle.uses += 1
+                try:
+                    yield handle
+                finally:
+                    handle.last_used = self._clock()
+                return
+            finally:
+                handle.lock.release()
+
+    def evict_idle(self) -> int:
+        """Entlädt alle Instanzen, die länger als ``idle_timeout`` ungenutzt sind."""
+        if self.idle_timeout <= 0:
+            return 0
+        now = self._clock()
+        with self._lock:
+            candidates = [
+                handle for handle in self._handles.values() if now - handle.last_used >= self.idle_timeout
+            ]
+        evicted = 0
+        for handle in candidates:
+            # Eine gerade laufende Anfrage hält den Lock – dann bleibt das Modell geladen.
+            if not handle.lock.acquire(blocking=False):
+                continue
+            try:
+                if self._clock() - handle.last_used < self.idle_timeout:
+                    continue
+                if self._drop(handle.key, handle):
+                    evicted += 1
+                    LOGGER.info(
+                        "GGUF-Modell nach %.0fs Leerlauf entladen: %s",
+                        self.idle_timeout,
+                        Path(handle.key.model_path).name,
+                    )
+            finally:
+                handle.lock.release()
+        return evicted
+
+    def evict(self, key: ModelKey) -> bool:
+        """Entlädt eine bestimmte Instanz, sobald laufende Aufrufe beendet sind."""
+        with self._lock:
+            handle = self._handles.get(key)
+        if handle is None:
+            return False
+        with handle.lock:
+            return self._drop(key, handle)
+
+    def clear(self) -> None:
+        """Entlädt alle Modelle und beendet den Aufräum-Thread."""
+        with self._lock:
+            keys = list(self._handles)
+        for key in keys:
+            self.evict(key)
+        self._stop_janitor.set()
+
+    def loaded_models(self) -> List[ModelKey]:
+        with self._lock:
+            return list(self._handles)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Kennzahlen für Logs und Diagnose."""
+        now = self._clock()
+        with self._lock:
+            return {
+                "idle_timeout": self.idle_timeout,
+                "loads": self._loads,
+                "hits": self._hits,
+                "evictions": self._evictions,
+                "models": [
+                    {
+                        "model_path": handle.key.model_path,
+                        "context_tokens": handle.key.context_tokens,
+                        "gpu_layers": handle.key.gpu_layers,
+                        "chat_format": handle.key.chat_format,
+                        "load_seconds": round(handle.load_seconds, 2),
+                        "idle_seconds": round(now - handle.last_used, 1),
+                        "uses": handle.uses,
+                    }
+                    for handle in self._handles.values()
+                ],
+            }
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _drop(self, key: ModelKey, handle: ModelHandle) -> bool:
+        with self._lock:
+            if self._handles.get(key) is not handle:
+                return False
+            del self._handles[key]
+            self._evictions += 1
+        close = getattr(handle.llama, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as exc:  # pragma: no cover - abhängig von llama-cpp-Version
+                LOGGER.debug("Llama.close() fehlgeschlagen: %s", exc)
+        handle.llama = None
+        handle.prefix_cache = None
+        handle.active_prefix = None
+        return True
+
+    def _ensure_janitor(self) -> None:
+        if self.idle_timeout <= 0:
+            return
+        with self._lock:
+            if self._janitor is not None and self._janitor.is_alive():
+                return
+            self._stop_janitor.clear()
+            self._janitor = threading.Thread(
+                target=self._janitor_loop,
+                name="auto-pcg-model-janitor",
+                daemon=True,
+            )
+            self._janitor.start()
+
+    def _janitor_loop(self) -> None:
+        interval = max(1.0, min(60.0, self.idle_timeout / 4))
+        while not self._stop_janitor.wait(interval):
+            self.evict_idle()
+            with self._lock:
+                if not self._handles:
+                    self._janitor = None
+                    return
+
+    @staticmethod
+    def _resolve_idle_timeout(override: Optional[float]) -> float:
+        if override is not None:
+            return float(override)
+        env_value = os.getenv("AUTO_PCG_MODEL_IDLE_TIMEOUT")
+        if env_value is None or not env_value.strip():
+            return DEFAULT_IDLE_TIMEOUT
+        try:
+            return float(env_value)
+        except ValueError:
+            LOGGER.warning(
+                "AUTO_PCG_MODEL_IDLE_TIMEOUT=%s konnte nicht interpretiert werden. Verwende %.0fs.",
+                env_value,
+                DEFAULT_IDLE_TIMEOUT,
+            )
+            return DEFAULT_IDLE_TIMEOUT
+
+
+_DEFAULT_REGISTRY: Optional[ModelRegistry] = None
+_DEFAULT_REGISTRY_LOCK = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Gibt die prozessweite Standard-Registry zurück."""
+    global _DEFAULT_REGISTRY
+    with _DEFAULT_REGISTRY_LOCK:
+        if _DEFAULT_REGISTRY is None:
+            _DEFAULT_REGISTRY = ModelRegistry()
+        return _DEFAULT_REGISTRY
@@ -3,9 +3,10 @@
 from __future__ import annotations
 
 import json
+import re
 import textwrap
 from dataclasses import asdict
-from typing import Iterable, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence
 
 from auto_pcg.models.schemas import AssetData
 from auto_pcg.models.terrain import (
@@ -15,24 +16,21 @@ from auto_pcg.models.terrain import (
 )
 
 
-class PromptEngine:
-    """Produces JSON-only prompts tailored to the Auto-PCG workflow."""
-
-    # Asset & PCG Prompts --------------------------------------------------------------------
+TASK_CLASSIFICATION = "classification"
+TASK_PCG_PLAN = "pcg_plan"
+TASK_HEIGHTMAP_STRATEGY = "heightmap_strategy"
+TASK_MATERIAL_BLUEPRINT = "material_blueprint"
+TASK_LAYER_PLAN = "layer_plan"
+TASKS = (
+    TASK_CLASSIFICATION,
+    TASK_PCG_PLAN,
+    TASK_HEIGHTMAP_STRATEGY,
+    TASK_MATERIAL_BLUEPRINT,
+    TASK_LAYER_PLAN,
+)
 
-    def build_asset_classification_prompt(self, assets: Sequence[AssetData]) -> str:
-        """Creates a JSON-centric prompt requesting semantic asset categories."""
-        asset_snippets = [
-            {
-                "asset_path": str(asset.asset_path),
-                "asset_type": asset.asset_type,
-                "metadata": asdict(asset.metadata),
-            }
-            for asset in assets
-        ]
-        asset_json = json.dumps(asset_snippets, ensure_ascii=False, indent=2)
-        instructions = textwrap.dedent(
-            """
+_CLASSIFICATION_INSTRUCTIONS = textwrap.dedent(
+    """
 ROLLE: Du bist ein Asset-Klassifikator für Unreal Engine 5.4.
 AUFGABE: Ordne jedes Asset mehreren Ebenen zu.
 
@@ -72,8 +70,136 @@ ANTWORTFORMAT: Gib ausschließlich valides JSON ohne Markdown zurück:
 {"classifications": [ ... ]}. Falls keine Klassifikation möglich ist, antworte mit
 {"classifications": []}.
 """
-        ).strip()
-        return f"{instructions}\nASSETS:\n{asset_json}"
+).strip()
+
+# Compact variant: same rules, one line each, assets referenced by short ids.
+_CLASSIFICATION_INSTRUCTIONS_COMPACT = textwrap.dedent(
+    """
+ROLLE: Asset-Klassifikator für Unreal Engine 5.4. Antworte nur mit JSON ohne Markdown:
+{"classifications":[{"asset_path":"<id>","primary_category":"","sub_category":"","tags":[],"style":"","biomes":[],"technical":{"polycount":0,"texture_resolution":[0,0],"collision":"","lod":false,"material_count":0}}]}
+primary_category: LANDSCAPE|VEGETATION|ARCHITECTURE|PROP|CHARACTER|EFFECTS|MATERIAL|BLUEPRINT
+sub_category z.B.: Tree, Bush, Terrain, Cliff, Building, Bridge, Furniture, Weapon, Particle, Ground, Interactive
+tags: Größe, Farbe, Zustand, Jahreszeit, Umgebung (indoor/outdoor/underground/underwater), Genre
+style: realistic|fantasy|sci-fi|medieval|modern|cartoon|low-poly|stylized
+biomes: forest|desert|mountain|grassland|tundra|jungle|urban|aquatic|arctic|volcanic
+technical aus den Metadaten schätzen; collision: simple|complex|none.
+asset_path = id aus der Tabelle (z.B. "a0"). Dateipfade: Px/ steht für das Verzeichnis Px aus PFADE.
+Keine Klassifikation möglich: {"classifications":[]}
+"""
+).strip()
+
+_COMPACT_ASSET_COLUMNS = "id|typ|datei|bounds_xyz|vertices|materialien|kb"
+_ASSET_REF_PATTERN = re.compile(r"^a(\d+)$")
+
+_PCG_GENERATION_HEADER = (
+    "ROLLE: Du bist ein PCG-Architekt für Unreal Engine 5.4.\n"
+    "ANTWORTFORMAT: Gib ausschließlich reines JSON mit dem Objekt 'pcg_plan' zurück. "
+    "Kein erläuternder Text, keine Codeblöcke. Falls nicht möglich, antworte mit "
+    '{"pcg_plan": {"description": "", "target_biome": "unknown", "layers": []}}.\n'
+)
+
+_HEIGHTMAP_STRATEGY_HEADER = textwrap.dedent(
+    """
+ROLLE: Du bist ein Landscape Technical Director für Unreal Engine 5.4.
+AUFGABE: Analysiere die gelieferten Heightmap-Daten und liefere Empfehlungen
+für Landscape-Settings, Biome-Zuordnung und Skalierung.
+
+VORGABEN:
+- Antworte ausschließlich mit JSON im Format {"heightmap_strategy": {...}}
+- Füge Felder wie "recommended_biomes", "landscape_settings" und "notes" hinzu.
+- Ergänze Werte nur wenn du dir sicher bist, ansonsten lasse sie weg.
+
+DATEN:
+"""
+).lstrip()
+
+_MATERIAL_BLUEPRINT_HEADER = textwrap.dedent(
+    """
+ROLLE: Du bist ein UE5-Materialguru.
+AUFGABE: Verbessere den Material-Blueprint für die erkannten Biome.
+ANTWORTFORMAT: {"material_blueprint": {"layers": [...], "global_parameters": {...} } }
+EINTRÄGE SOLLEN MIT LANDSCAPE LAYER BLEND KOMPATIBEL SEIN.
+
+DATEN:
+"""
+).lstrip()
+
+_LAYER_PAINT_HEADER = textwrap.dedent(
+    """
+ROLLE: Du bist eine Echtzeit-Painting-KI für UE Landscapes.
+AUFGABE: Optimiere Layer-Masken und adaptive Regeln.
+ANTWORTFORMAT: {"layer_plan": {"masks": [...], "adaptive_rules": {...} } }
+
+PLAN:
+"""
+).lstrip()
+
+_STATIC_PREFIXES = {
+    TASK_CLASSIFICATION: f"{_CLASSIFICATION_INSTRUCTIONS}\nASSETS:\n",
+    TASK_PCG_PLAN: _PCG_GENERATION_HEADER,
+    TASK_HEIGHTMAP_STRATEGY: _HEIGHTMAP_STRATEGY_HEADER,
+    TASK_MATERIAL_BLUEPRINT: _MATERIAL_BLUEPRINT_HEADER,
+    TASK_LAYER_PLAN: _LAYER_PAINT_HEADER,
+}
+_COMPACT_STATIC_PREFIXES = {
+    **_STATIC_PREFIXES,
+    TASK_CLASSIFICATION: f"{_CLASSIFICATION_INSTRUCTIONS_COMPACT}\nASSETS:\n",
+}
+
+
+def asset_ref(index: int) -> str:
+    """Short per-batch id used for asset ``index`` in compact prompts."""
+    return f"a{index}"
+
+
+def resolve_asset_ref(value: object, assets: Sequence[AssetData]) -> Optional[AssetData]:
+    """Maps a short id from a compact prompt back to its asset (``None`` if it is no id)."""
+    match = _ASSET_REF_PATTERN.match(str(value).strip()) if value is not None else None
+    if not match:
+        return None
+    index = int(match.group(1))
+    return assets[index] if index < len(assets) else None
+
+
+class PromptEngine:
+    """Produces JSON-only prompts tailored to the Auto-PCG workflow.
+
+    Every prompt starts with a task-specific static prefix (role, rules, answer
+    format) followed by the variable data, so local backends can reuse the
+    evaluated prefix across calls.
+
+    With ``compact=True`` (default) data blocks are encoded for token economy:
+    assets become a pipe-separated table with short ids (``a0``, ``a1``, ...)
+    and a shared directory table, JSON payloads are minified and floats rounded.
+    ``compact=False`` restores the original indented JSON prompts.
+    """
+
+    FLOAT_DIGITS = 3
+
+    def __init__(self, compact: bool = True) -> None:
+        self.compact = compact
+
+    def static_prefix(self, task: str) -> str:
+        """Returns the invariant leading part of every prompt for ``task``."""
+        prefixes = _COMPACT_STATIC_PREFIXES if self.compact else _STATIC_PREFIXES
+        return prefixes.get(task, "")
+
+    # Asset & PCG Prompts --------------------------------------------------------------------
+
+    def build_asset_classification_prompt(self, assets: Sequence[AssetData]) -> str:
+        """Creates a JSON-centric prompt requesting semantic asset categories."""
+        if self.compact:
+            return f"{self.static_prefix(TASK_CLASSIFICATION)}{self._compact_asset_table(assets)}"
+        asset_snippets = [
+            {
+                "asset_path": str(asset.asset_path),
+                "asset_type": asset.asset_type,
+                "metadata": asdict(asset.metadata),
+            }
+            for asset in assets
+        ]
+        asset_json = json.dumps(asset_snippets, ensure_ascii=False, indent=2)
+        return f"{self.static_prefix(TASK_CLASSIFICATION)}{asset_json}"
 
     def build_pcg_generation_prompt(
         self,
@@ -92,19 +218,12 @@ ANTWORTFORMAT: Gib ausschließlich valides JSON ohne Markdown zurück:
             metadata_lines.append(f"SAISON: {season}")
         metadata = "\n".join(metadata_lines)
         parts = [
-            "ROLLE: Du bist ein PCG-Architekt für Unreal Engine 5.4.\n",
+            self.static_prefix(TASK_PCG_PLAN),
             f"AUFGABE: Erstelle einen PCG-Plan für den Befehl: {user_input}.\n",
         ]
         if metadata:
             parts.append(metadata + "\n")
-        parts.extend(
-            [
-                f"VERFÜGBARE ASSETS: {asset_list}.\n",
-                "ANTWORTFORMAT: Gib ausschließlich reines JSON mit dem Objekt 'pcg_plan' zurück. ",
-                "Kein erläuternder Text, keine Codeblöcke. Falls nicht möglich, antworte mit ",
-                '{"pcg_plan": {"description": "", "target_biome": "unknown", "layers": []}}.',
-            ]
-        )
+        parts.append(f"VERFÜGBARE ASSETS: {asset_list}.")
         return "".join(parts)
 
     def build_asset_selection_prompt(self, biome_type: str, available_assets: Iterable[AssetData]) -> str:
@@ -129,22 +248,7 @@ ANTWORTFORMAT: Gib ausschließlich valides JSON ohne Markdown zurück:
 
     def build_heightmap_strategy_prompt(self, analysis: HeightmapAnalysisResult) -> str:
         """Describes the heightmap state and asks for strategic improvements."""
-        payload = analysis.to_dict()
-        return textwrap.dedent(
-            f"""
-ROLLE: Du bist ein Landscape Technical Director für Unreal Engine 5.4.
-AUFGABE: Analysiere die gelieferten Heightmap-Daten und liefere Empfehlungen
-für Landscape-Settings, Biome-Zuordnung und Skalierung.
-
-VORGABEN:
-- Antworte ausschließlich mit JSON im Format {{"heightmap_strategy": {{...}}}}
-- Füge Felder wie "recommended_biomes", "landscape_settings" und "notes" hinzu.
-- Ergänze Werte nur wenn du dir sicher bist, ansonsten lasse sie weg.
-
-DATEN:
-{json.dumps(payload, ensure_ascii=False, indent=2)}
-"""
-        ).strip()
+        return self.static_prefix(TASK_HEIGHTMAP_STRATEGY) + self._dump_payload(analysis.to_dict())
 
     def build_material_blueprint_prompt(
         self,
@@ -156,28 +260,57 @@ DATEN:
             "analysis": analysis.to_dict(),
             "current_blueprint": blueprint.to_dict(),
         }
-        return textwrap.dedent(
-            f"""
-ROLLE: Du bist ein UE5-Materialguru.
-AUFGABE: Verbessere den Material-Blueprint für die erkannten Biome.
-ANTWORTFORMAT: {{"material_blueprint": {{"layers": [...], "global_parameters": {{...}} }} }}
-EINTRÄGE SOLLEN MIT LANDSCAPE LAYER BLEND KOMPATIBEL SEIN.
-
-DATEN:
-{json.dumps(payload, ensure_ascii=False, indent=2)}
-"""
-        ).strip()
+        return self.static_prefix(TASK_MATERIAL_BLUEPRINT) + self._dump_payload(payload)
 
     def build_layer_paint_prompt(self, plan: LandscapeLayerPlan) -> str:
         """Asks the LLM to optimise mask ordering and adaptive rules."""
-        payload = plan.to_dict()
-        return textwrap.dedent(
-            f"""
-ROLLE: Du bist eine Echtzeit-Painting-KI für UE Landscapes.
-AUFGABE: Optimiere Layer-Masken und adaptive Regeln.
-ANTWORTFORMAT: {{"layer_plan": {{"masks": [...], "adaptive_rules": {{...}} }} }}
+        return self.static_prefix(TASK_LAYER_PLAN) + self._dump_payload(plan.to_dict())
 
-PLAN:
-{json.dumps(payload, ensure_ascii=False, indent=2)}
-"""
-        ).strip()
+    # Encoding helpers ------------------------------------------------------------------------
+
+    def _dump_payload(self, payload: object) -> str:
+        if not self.compact:
+            return json.dumps(payload, ensure_ascii=False, indent=2)
+        return json.dumps(self._round_floats(payload), ensure_ascii=False, separators=(",", ":"))
+
+    def _round_floats(self, value: object) -> object:
+        if isinstance(value, float):
+            rounded = round(value, self.FLOAT_DIGITS)
+            return int(rounded) if rounded.is_integer() else rounded
+        if isinstance(value, dict):
+            return {key: self._round_floats(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._round_floats(item) for item in value]
+        return value
+
+    def _compact_asset_table(self, assets: Sequence[AssetData]) -> str:
+        """One row per asset; directories are listed once and referenced as ``Px/``."""
+        directories: Dict[str, str] = {}
+        rows: List[str] = []
+        for index, asset in enumerate(assets):
+            directory = asset.asset_path.parent.as_posix()
+            alias = directories.setdefault(directory, f"P{len(directories)}")
+            bounds = asset.metadata.bounds
+            size = ",".join(self._format_number(bounds.get(axis, 0.0)) for axis in ("x", "y", "z"))
+            rows.append(
+                "|".join(
+                    (
+                        asset_ref(index),
+                        asset.asset_type,
+                        f"{alias}/{asset.asset_path.name}",
+                        size,
+                        str(asset.metadata.vertex_count),
+                        str(asset.metadata.material_slots),
+                        str(max(0, asset.metadata.file_size) // 1024),
+                    )
+                )
+            )
+        lines = ["PFADE:"]
+        lines.extend(f"{alias}={directory}" for directory, alias in directories.items())
+        lines.append(_COMPACT_ASSET_COLUMNS)
+        lines.extend(rows)
+        return "\n".join(lines)
+
+    def _format_number(self, value: object) -> str:
+        rounded = self._round_floats(float(value)) if isinstance(value, (int, float)) else value
+        return str(rounded)
@@ -0,0 +1,575 @@
+"""Ollama-kompatibler Stand-in-Server für reproduzierbare Benchmarks ohne GPU.
+
+Bedient die von :class:`OllamaBackend` genutzte Teilmenge (``/api/tags``,
+``/api/chat``, ``/api/generate`` inkl. NDJSON-Streaming) in drei Modi:
+
+* ``synthesize`` – erzeugt gültiges JSON passend zur erkannten Aufgabe,
+* ``replay`` – spielt aufgezeichnete Antworten anhand des Prompt-Hashes ab,
+* ``record`` – leitet an einen echten Server weiter und zeichnet Antworten auf.
+
+Latenz, Token-Durchsatz, parallele Slots sowie Fehler- und Defektquoten sind
+einstellbar; alle Zufallsentscheidungen hängen nur von ``seed`` und Prompt ab.
+
+Beispiel::
+
+    python -m auto_pcg.ai.standin_server --port 11500 --latency 0.4 --tokens-per-second 60 \\
+        --slots 2 --error-rate 0.05 --malformed-rate 0.1
+    python -m auto_pcg.cli --no-local-model --ollama-url http://127.0.0.1:11500 ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from auto_pcg.core.asset_analyzer import AssetAnalyzer
+from auto_pcg.models.schemas import AssetData, AssetMetadata
+
+from .batch_sizing import estimate_tokens
+from .prompt_engine import (
+    TASK_CLASSIFICATION,
+    TASK_HEIGHTMAP_STRATEGY,
+    TASK_LAYER_PLAN,
+    TASK_MATERIAL_BLUEPRINT,
+    TASK_PCG_PLAN,
+    PromptEngine,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+MODE_SYNTHESIZE = "synthesize"
+MODE_REPLAY = "replay"
+MODE_RECORD = "record"
+MODES = (MODE_SYNTHESIZE, MODE_REPLAY, MODE_RECORD)
+
+_STREAM_CHUNK_CHARS = 12
+
+
+class _UpstreamError(RuntimeError):
+    """Der Upstream-Server im Record-Modus hat nicht geantwortet."""
+
+
+def prompt_hash(prompt: str) -> str:
+    """Schlüssel einer Aufzeichnung; unabhängig von Modell und API-Modus."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:20]
+
+
+@dataclass(slots=True)
+class StandInConfig:
+    """Verhalten des Stand-in-Servers."""
+
+    mode: str = MODE_SYNTHESIZE
+    recording: Optional[Path] = None
+    upstream: Optional[str] = None
+    model: str = "standin"
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    tokens_per_second: float = 0.0
+    slots: int = 0
+    error_rate: float = 0.0
+    malformed_rate: float = 0.0
+    replay_miss: str = MODE_SYNTHESIZE
+    seed: int = 0
+
+
+class _Recording:
+    """Aufgezeichnete Antworten als JSONL (eine Zeile pro Prompt-Hash)."""
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = path
+        self._entries: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        if path and path.exists():
+            with path.open("r", encoding="utf-8") as stream:
+                for line in stream:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._entries[str(entry.get("key"))] = entry
+            LOGGER.info("Stand-in: %s Aufzeichnungen geladen (%s).", len(self._entries), path)
+
+    def get(self, key: str) -> Optional[Dict[str, object]]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def add(self, entry: Dict[str, object]) -> None:
+        with self._lock:
+            self._entries[str(entry["key"])] = entry
+            if not self.path:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as stream:
+                stream.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class _Synthesizer:
+    """Erzeugt plausible, schema-konforme Antworten für die Auto-PCG-Aufgaben."""
+
+    def __init__(self) -> None:
+        self._analyzer = AssetAnalyzer()
+        # Kompakte und ausführliche Kodierung erkennen; längere Präfixe zuerst prüfen.
+        self._prefixes = sorted(
+            {
+                (task, engine.static_prefix(task))
+                for engine in (PromptEngine(compact=True), PromptEngine(compact=False))
+                for task in (
+                    TASK_CLASSIFICATION,
+                    TASK_PCG_PLAN,
+                    TASK_HEIGHTMAP_STRATEGY,
+                    TASK_MATERIAL_BLUEPRINT,
+                    TASK_LAYER_PLAN,
+                )
+            },
+            key=lambda item: -len(item[1]),
+        )
+
+    def detect_task(self, prompt: str) -> Optional[str]:
+        return self._match_prefix(prompt)[0]
+
+    def respond(self, prompt: str, rng: random.Random) -> str:
+        task, prefix = self._match_prefix(prompt)
+        if task == TASK_CLASSIFICATION:
+            payload: Dict[str, object] = self._classifications(prompt[len(prefix) :])
+        elif task == TASK_PCG_PLAN:
+            payload = self._pcg_plan(prompt, rng)
+        elif task == TASK_HEIGHTMAP_STRATEGY:
+            payload = {"heightmap_strategy": {"notes": ["Stand-in: keine Änderungen empfohlen."]}}
+        elif task == TASK_MATERIAL_BLUEPRINT:
+            payload = {"material_blueprint": {"layers": [], "global_parameters": {"macro_variation": 0.5}}}
+        elif task == TASK_LAYER_PLAN:
+            payload = {"layer_plan": {"masks": [], "adaptive_rules": {"slope_bias": 0.5}}}
+        else:
+            payload = {}
+        return json.dumps(payload, ensure_ascii=False)
+
+    def _match_prefix(self, prompt: str) -> Tuple[Optional[str], str]:
+        for task, prefix in self._prefixes:
+            if prefix and prompt.startswith(prefix):
+                return task, prefix
+        return None, ""
+
+    def _classifications(self, asset_block: str) -> Dict[str, object]:
+        if asset_block.startswith("PFADE:"):
+            entries: object = _parse_asset_table(asset_block)
+        else:
+            try:
+                entries = json.loads(asset_block)
+            except json.JSONDecodeError:
+                entries = []
+        results: List[Dict[str, object]] = []
+        for index, entry in enumerate(entries if isinstance(entries, list) else []):
+            if not isinstance(entry, dict):
+                continue
+            try:
+                asset = AssetData(
+                    asset_id=f"standin-{index}",
+                    asset_path=Path(str(entry.get("asset_path", f"asset_{index}"))),
+                    asset_type=str(entry.get("asset_type", "StaticMesh")),
+                    metadata=AssetMetadata(**entry.get("metadata", {})),
+                )
+            except TypeError:
+                continue
+            classification = self._analyzer.classify_asset_semantics(asset)
+            results.append(
+                {
+                    "asset_path": str(entry.get("id") or entry.get("asset_path")),
+                    "primary_category": classification.primary_category,
+                    "sub_category": classification.sub_category,
+                    "tags": classification.tags,
+                    "style": classification.style,
+                    "biomes": classification.biomes,
+                    "technical": classification.technical,
+                }
+            )
+        return {"classifications": results}
+
+    @staticmethod
+    def _pcg_plan(prompt: str, rng: random.Random) -> Dict[str, object]:
+        match = re.search(r"VERFÜGBARE ASSETS:\s*(.*?)\.?\s*$", prompt, re.DOTALL)
+        names = [name.strip() for name in match.group(1).split(",") if name.strip()] if match else []
+        layers: List[Dict[str, object]] = [
+            {"type": "SURFACE", "purpose": "Grundfläche", "assets": names[:1], "parameters": {"density": 1.0}}
+        ]
+        for start in range(1, len(names), 4):
+            layers.append(
+                {
+                    "type": "SCATTER",
+                    "purpose": f"Streuung {len(layers)}",
+                    "assets": names[start : start + 4],
+                    "parameters": {
+                        "density": round(rng.uniform(0.2, 0.9), 2),
+                        "count_min": rng.randint(5, 20),
+                        "count_max": rng.randint(30, 120),
+                    },
+                }
+            )
+        return {"pcg_plan": {"description": "Stand-in-Plan", "target_biome": "forest", "layers": layers}}
+
+
+class StandInLLMServer:
+    """Startet den Stand-in-Server in einem Hintergrund-Thread.
+
+    Lässt sich als Kontextmanager in Benchmarks verwenden::
+
+        with StandInLLMServer(StandInConfig(latency=0.2)) as server:
+            manager = LLMManager(base_url=server.url, model="standin")
+    """
+
+    def __init__(self, config: Optional[StandInConfig] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or StandInConfig()
+        if self.config.mode not in MODES:
+            raise ValueError(f"Unbekannter Modus: {self.config.mode}")
+        if self.config.mode == MODE_RECORD and not self.config.upstream:
+            raise ValueError("Der Record-Modus benötigt eine Upstream-URL.")
+        self._recording = _Recording(self.config.recording)
+        self._synthesizer = _Synthesizer()
+        self._slots = threading.BoundedSemaphore(self.config.slots) if self.config.slots > 0 else None
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "errors": 0,
+            "malformed": 0,
+            "replayed": 0,
+            "synthesized": 0,
+            "recorded": 0,
+            "streamed": 0,
+        }
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="auto-pcg-standin", daemon=True)
+        self._thread.start()
+        LOGGER.info("Stand-in-LLM (%s) lauscht auf %s", self.config.mode, self.url)
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self) -> None:
+        LOGGER.info("Stand-in-LLM (%s) lauscht auf %s", self.config.mode, self.url)
+        self._httpd.serve_forever()
+
+    def __enter__(self) -> "StandInLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    # Anfragebehandlung -------------------------------------------------------------------
+
+    def handle_completion(self, mode: str, body: Dict[str, object]) -> Tuple[int, str]:
+        """Liefert HTTP-Status und Antworttext für chat/generate."""
+        prompt = _extract_prompt(mode, body)
+        key = prompt_hash(prompt)
+        rng = self._rng_for(key)
+        self._count("requests")
+        if self._slots:
+            self._slots.acquire()
+        try:
+            self._sleep_latency(rng)
+            if rng.random() < self.config.error_rate:
+                self._count("errors")
+                return 500, "stand-in: simulierter Serverfehler"
+            # 404 hieße für OllamaBackend "Modus nicht unterstützt"; Fehlschläge sind 5xx.
+            try:
+                text = self._response_text(mode, body, prompt, key, rng)
+            except _UpstreamError as exc:
+                self._count("errors")
+                return 502, f"stand-in: Upstream-Aufruf fehlgeschlagen: {exc}"
+            if text is None:
+                self._count("errors")
+                return 503, "stand-in: keine Aufzeichnung für diesen Prompt"
+            if rng.random() < self.config.malformed_rate:
+                self._count("malformed")
+                text = _corrupt(text, rng)
+            if self.config.tokens_per_second > 0 and not body.get("stream"):
+                time.sleep(estimate_tokens(text) / self.config.tokens_per_second)
+            return 200, text
+        finally:
+            if self._slots:
+                self._slots.release()
+
+    def stream_pacing(self, chunk: str) -> float:
+        """Wartezeit je Stream-Chunk entsprechend dem Token-Durchsatz."""
+        if self.config.tokens_per_second <= 0:
+            return 0.0
+        return estimate_tokens(chunk) / self.config.tokens_per_second
+
+    def _response_text(
+        self,
+        mode: str,
+        body: Dict[str, object],
+        prompt: str,
+        key: str,
+        rng: random.Random,
+    ) -> Optional[str]:
+        if self.config.mode == MODE_RECORD:
+            return self._record(mode, body, prompt, key)
+        if self.config.mode == MODE_REPLAY:
+            entry = self._recording.get(key)
+            if entry is not None:
+                self._count("replayed")
+                return str(entry.get("text", ""))
+            if self.config.replay_miss != MODE_SYNTHESIZE:
+                return None
+        self._count("synthesized")
+        return self._synthesizer.respond(prompt, rng)
+
+    def _record(self, mode: str, body: Dict[str, object], prompt: str, key: str) -> str:
+        upstream_body = dict(body)
+        upstream_body["stream"] = False
+        started = time.perf_counter()
+        try:
+            response = requests.post(f"{self.config.upstream.rstrip('/')}/api/{mode}", json=upstream_body, timeout=600)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as exc:
+            LOGGER.warning("Stand-in: Upstream-Aufruf fehlgeschlagen: %s", exc)
+            raise _UpstreamError(str(exc)) from exc
+        if mode == "chat":
+            message = payload.get("message") or {}
+            text = str(message.get("content", "")) if isinstance(message, dict) else ""
+        else:
+            text = str(payload.get("response", ""))
+        self._recording.add(
+            {
+                "key": key,
+                "mode": mode,
+                "model": body.get("model"),
+                "task": self._synthesizer.detect_task(prompt),
+                "latency": round(time.perf_counter() - started, 3),
+                "text": text,
+            }
+        )
+        self._count("recorded")
+        return text
+
+    def _rng_for(self, key: str) -> random.Random:
+        """Deterministischer Zufall je Prompt; Wiederholungen erhalten neue Würfe."""
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        return random.Random(f"{self.config.seed}:{key}:{attempt}")
+
+    def _sleep_latency(self, rng: random.Random) -> None:
+        delay = self.config.latency
+        if self.config.latency_jitter > 0:
+            delay += rng.uniform(-self.config.latency_jitter, self.config.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+
+def _extract_prompt(mode: str, body: Dict[str, object]) -> str:
+    if mode == "chat":
+        messages = body.get("messages") or []
+        users = [m.get("content", "") for m in messages if isinstance(m, dict) and m.get("role") == "user"]
+        return str(users[-1]) if users else ""
+    return str(body.get("prompt", ""))
+
+
+def _parse_asset_table(block: str) -> List[Dict[str, object]]:
+    """Liest die kompakte Asset-Tabelle (``PFADE:`` + ``id|typ|datei|...``) zurück."""
+    directories: Dict[str, str] = {}
+    entries: List[Dict[str, object]] = []
+    for line in block.splitlines()[1:]:
+        if "|" not in line:
+            alias, _, directory = line.partition("=")
+            directories[alias.strip()] = directory.strip()
+            continue
+        fields = line.split("|")
+        if len(fields) < 7 or fields[0] == "id":
+            continue
+        alias, _, name = fields[2].partition("/")
+        try:
+            x, y, z = (float(value) for value in fields[3].split(","))
+            metadata = {
+                "bounds": {"x": x, "y": y, "z": z},
+                "vertex_count": int(fields[4]),
+                "material_slots": int(fields[5]),
+                "file_size": int(fields[6]) * 1024,
+            }
+        except ValueError:
+            continue
+        entries.append(
+            {
+                "id": fields[0],
+                "asset_path": f"{directories.get(alias, alias)}/{name}",
+                "asset_type": fields[1],
+                "metadata": metadata,
+            }
+        )
+    return entries
+
+
+def _corrupt(text: str, rng: random.Random) -> str:
+    """Erzeugt typische Defekte: abgeschnitten, Code-Fence, überzähliges Komma."""
+    choice = rng.random()
+    if choice < 0.6 and len(text) > 8:
+        return text[: rng.randint(len(text) // 2, len(text) - 2)]
+    if choice < 0.8:
+        return f"```json\n{text}\n```"
+    return re.sub(r"\}\s*\]", "},]", text, count=1) if "}]" in text else text + ","
+
+
+def _chunks(text: str) -> Iterator[str]:
+    for start in range(0, len(text), _STREAM_CHUNK_CHARS):
+        yield text[start : start + _STREAM_CHUNK_CHARS]
+
+
+def _make_handler(server: StandInLLMServer) -> type:
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002 - Signatur der Basisklasse
+            LOGGER.debug("Stand-in: " + format, *args)
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server-Konvention
+            if self.path.rstrip("/") == "/api/tags":
+                self._send_json(200, {"models": [{"name": server.config.model, "model": server.config.model}]})
+            elif self.path.rstrip("/") == "/api/standin/stats":
+                self._send_json(200, dict(server.stats))
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server-Konvention
+            path = self.path.rstrip("/")
+            if path not in ("/api/chat", "/api/generate"):
+                self._send_json(404, {"error": "not found"})
+                return
+            mode = path.rsplit("/", 1)[-1]
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except (ValueError, json.JSONDecodeError):
+                self._send_json(400, {"error": "invalid request body"})
+                return
+            status, text = server.handle_completion(mode, body)
+            if status != 200:
+                self._send_json(status, {"error": text})
+                return
+            # Wie Ollama: Token-Zahlen stehen im abschließenden Objekt.
+            usage = {"prompt_eval_count": estimate_tokens(_extract_prompt(mode, body)), "eval_count": estimate_tokens(text)}
+            if body.get("stream"):
+                server._count("streamed")
+                self._send_stream(mode, text, usage)
+            else:
+                self._send_json(200, {**_wrap(mode, text, done=True), **usage})
+
+        def _send_json(self, status: int, payload: Dict[str, object]) -> None:
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                LOGGER.debug("Stand-in: Client hat vor der Antwort aufgegeben.")
+
+        def _send_stream(self, mode: str, text: str, usage: Dict[str, object]) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for chunk in _chunks(text):
+                    delay = server.stream_pacing(chunk)
+                    if delay:
+                        time.sleep(delay)
+                    self._write_chunk(json.dumps(_wrap(mode, chunk, done=False), ensure_ascii=False) + "\n")
+                self._write_chunk(json.dumps({**_wrap(mode, "", done=True), **usage}) + "\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                LOGGER.debug("Stand-in: Client hat den Stream abgebrochen.")
+
+        def _write_chunk(self, line: str) -> None:
+            data = line.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return _Handler
+
+
+def _wrap(mode: str, text: str, *, done: bool) -> Dict[str, object]:
+    if mode == "chat":
+        return {"message": {"role": "assistant", "content": text}, "done": done}
+    return {"response": text, "done": done}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ollama-kompatibler Stand-in-Server für Benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--mode", choices=MODES, default=MODE_SYNTHESIZE)
+    parser.add_argument("--recording", type=Path, default=None, help="JSONL-Datei für Replay/Record")
+    parser.add_argument("--upstream", default=None, help="Echter Ollama-Server für den Record-Modus")
+    parser.add_argument("--model", default="standin", help="Modellname für /api/tags")
+    parser.add_argument("--latency", type=float, default=0.0, help="Grundlatenz je Anfrage in Sekunden")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Zufällige Abweichung (+/-) in Sekunden")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Simulierter Generierungsdurchsatz")
+    parser.add_argument("--slots", type=int, default=0, help="Parallel bearbeitete Anfragen (0 = unbegrenzt)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil HTTP-500-Antworten")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Anteil absichtlich defekter Antworten")
+    parser.add_argument(
+        "--replay-miss",
+        choices=[MODE_SYNTHESIZE, "error"],
+        default=MODE_SYNTHESIZE,
+        help="Verhalten bei fehlender Aufzeichnung im Replay-Modus (error: HTTP 503)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    config = StandInConfig(
+        mode=args.mode,
+        recording=args.recording,
+        upstream=args.upstream,
+        model=args.model,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        tokens_per_second=args.tokens_per_second,
+        slots=args.slots,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        replay_miss=args.replay_miss,
+        seed=args.seed,
+    )
+    server = StandInLLMServer(config, host=args.host, port=args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:  # pragma: no cover - interaktiv
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Messwerte je LLM-Aufruf und ihre Verdichtung zu Histogrammen je Aufgabe.
+
+Backends und :class:`~auto_pcg.ai.llm_manager.LLMManager` füllen für jeden
+Versuch einen :class:`CallStats`-Datensatz (Tokens, Time-to-First-Token,
+Gesamtlatenz, API-Modus, Reparaturen, Parse-Fehler). :class:`LLMTelemetry`
+fasst sie je Aufgabe zusammen und zählt zusätzlich, wie oft auf Heuristiken
+ausgewichen wurde.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _exponential_bounds(start: float, factor: float, count: int) -> List[float]:
+    return [start * factor**index for index in range(count)]
+
+
+# Obergrenzen der Histogramm-Buckets; Werte darüber landen im Überlauf-Bucket.
+LATENCY_BOUNDS = _exponential_bounds(0.01, 2.0, 17)  # 10 ms … ~11 min
+TOKEN_BOUNDS = _exponential_bounds(8.0, 2.0, 14)  # 8 … 65536 Tokens
+THROUGHPUT_BOUNDS = _exponential_bounds(0.5, 2.0, 14)  # 0,5 … 4096 Tokens/s
+
+
+@dataclass(slots=True)
+class CallStats:
+    """Messwerte eines einzelnen Backend-Versuchs.
+
+    Token-Zahlen stammen vom Backend (Ollama ``prompt_eval_count``/``eval_count``,
+    llama.cpp ``usage``); fehlen sie, schätzt der Manager sie aus dem Text und
+    setzt ``tokens_estimated``.
+    """
+
+    task: str
+    backend: str = ""
+    mode: str = ""
+    stream: bool = False
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    tokens_estimated: bool = False
+    time_to_first_token: Optional[float] = None
+    latency: float = 0.0
+    success: bool = False
+    parse_failed: bool = False
+    repairs: Dict[str, int] = field(default_factory=dict)
+    # Antwort war abgeschnitten (z. B. bei ``max_tokens``) und wurde nur teilweise übernommen.
+    truncated: bool = False
+    error: Optional[str] = None
+    started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def mark_first_token(self) -> None:
+        """Hält beim ersten Stream-Delta die Zeit seit Beginn des Versuchs fest."""
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.started
+
+    def apply_usage(self, usage: Mapping[str, object]) -> None:
+        """Übernimmt ``prompt_tokens``/``completion_tokens`` eines OpenAI-artigen ``usage``-Blocks."""
+        for key in ("prompt_tokens", "completion_tokens"):
+            value = usage.get(key)
+            if isinstance(value, int):
+                setattr(self, key, value)
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Generierungsrate ohne die Zeit bis zum ersten Token (sofern bekannt)."""
+        if not self.completion_tokens:
+            return None
+        generation = self.latency - (self.time_to_first_token or 0.0)
+        if generation <= 0:
+            generation = self.latency
+        return self.completion_tokens / generation if generation > 0 else None
+
+
+class Histogram:
+    """Histogramm mit festen Bucket-Grenzen; Perzentile werden im Bucket interpoliert."""
+
+    __slots__ = ("bounds", "counts", "count", "total", "minimum", "maximum")
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            if not bucket or seen + bucket < rank:
+                seen += bucket
+                continue
+            lower = self.bounds[index - 1] if index > 0 else self.minimum
+            upper = self.bounds[index] if index < len(self.bounds) else self.maximum
+            lower, upper = max(lower, self.minimum), min(upper, self.maximum)
+            return lower + (upper - lower) * max(0.0, rank - seen) / bucket
+        return self.maximum
+
+    def snapshot(self) -> Dict[str, object]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4),
+            "min": round(self.minimum, 4),
+            "max": round(self.maximum, 4),
+            "p50": round(self.percentile(0.5) or 0.0, 4),
+            "p90": round(self.percentile(0.9) or 0.0, 4),
+            "p99": round(self.percentile(0.99) or 0.0, 4),
+            # [Obergrenze, Anzahl]; ``None`` steht für den Überlauf-Bucket.
+            "buckets": [
+                [self.bounds[index] if index < len(self.bounds) else None, bucket]
+                for index, bucket in enumerate(self.counts)
+                if bucket
+            ],
+        }
+
+
+class _TaskMetrics:
+    """Aggregat einer Aufgabe; wird nur unter dem Telemetrie-Lock verändert."""
+
+    __slots__ = (
+        "calls",
+        "successes",
+        "failures",
+        "parse_failures",
+        "repaired_calls",
+        "estimated_calls",
+        "repairs",
+        "modes",
+        "backends",
+        "fallbacks",
+        "fallback_items",
+        "cache_hits",
+        "latency",
+        "time_to_first_token",
+        "prompt_tokens",
+        "completion_tokens",
+        "tokens_per_second",
+    )
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.parse_failures = 0
+        self.repaired_calls = 0
+        self.estimated_calls = 0
+        self.repairs: Counter = Counter()
+        self.modes: Counter = Counter()
+        self.backends: Counter = Counter()
+        self.fallbacks = 0
+        self.fallback_items = 0
+        self.cache_hits = 0
+        self.latency = Histogram(LATENCY_BOUNDS)
+        self.time_to_first_token = Histogram(LATENCY_BOUNDS)
+        self.prompt_tokens = Histogram(TOKEN_BOUNDS)
+        self.completion_tokens = Histogram(TOKEN_BOUNDS)
+        self.tokens_per_second = Histogram(THROUGHPUT_BOUNDS)
+
+
+class LLMTelemetry:
+    """Threadsichere Sammlung aller :class:`CallStats` eines Laufs, gruppiert nach Aufgabe."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, _TaskMetrics] = {}
+        self._started = time.time()
+
+    def record(self, stats: CallStats) -> None:
+        """Verbucht einen abgeschlossenen Backend-Versuch."""
+        with self._lock:
+            metrics = self._metrics(stats.task)
+            metrics.calls += 1
+            if stats.success:
+                metrics.successes += 1
+            else:
+                metrics.failures += 1
+            if stats.parse_failed:
+                metrics.parse_failures += 1
+            if stats.repairs:
+                metrics.repaired_calls += 1
+                metrics.repairs.update(stats.repairs)
+            if stats.tokens_estimated:
+                metrics.estimated_calls += 1
+            metrics.modes[f"{stats.mode}-stream" if stats.stream else stats.mode] += 1
+            metrics.backends[stats.backend] += 1
+            metrics.latency.add(stats.latency)
+            if stats.time_to_first_token is not None:
+                metrics.time_to_first_token.add(stats.time_to_first_token)
+            if stats.prompt_tokens is not None:
+                metrics.prompt_tokens.add(stats.prompt_tokens)
+            if stats.completion_tokens is not None:
+                metrics.completion_tokens.add(stats.completion_tokens)
+            rate = stats.tokens_per_second if stats.success else None
+            if rate is not None:
+                metrics.tokens_per_second.add(rate)
+
+    def record_fallback(self, task: str, items: int = 1) -> None:
+        """Zählt, dass eine Aufgabe (für ``items`` Elemente) auf Heuristiken ausweichen musste."""
+        with self._lock:
+            metrics = self._metrics(task)
+            metrics.fallbacks += 1
+            metrics.fallback_items += items
+
+    def record_cache_hit(self, task: str) -> None:
+        """Zählt eine Antwort, die ohne LLM-Aufruf aus einem Cache kam."""
+        with self._lock:
+            self._metrics(task).cache_hits += 1
+
+    def expected_latency(self, task: str) -> Optional[float]:
+        """Median der bisherigen Latenz einer Aufgabe (``None`` ohne Messwerte)."""
+        with self._lock:
+            metrics = self._tasks.get(task)
+            return metrics.latency.percentile(0.5) if metrics else None
+
+    def snapshot(self) -> Dict[str, object]:
+        """Kennzahlen und Histogramme je Aufgabe als JSON-taugliches Dict."""
+        with self._lock:
+            tasks = {task: self._task_snapshot(metrics) for task, metrics in sorted(self._tasks.items())}
+        return {"started": round(self._started, 3), "tasks": tasks}
+
+    def dump(self, path: Path, **extra: object) -> Path:
+        """Schreibt den Snapshot (plus ``extra``-Abschnitte) als JSON nach ``path``."""
+        payload = {**self.snapshot(), **extra}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+        return path
+
+    def log_summary(self) -> None:
+        """Eine Zeile je Aufgabe mit Aufrufen, Latenz-Perzentilen und Ausweichquote."""
+        for task, entry in self.snapshot()["tasks"].items():  # type: ignore[union-attr]
+            latency = entry["latency"]
+            LOGGER.info(
+                "LLM %s: %s Aufrufe (%s fehlgeschlagen, %s repariert), Latenz p50 %ss / p90 %ss, "
+                "%s Tokens/s, %s Fallbacks.",
+                task,
+                entry["calls"],
+                entry["failures"],
+                entry["repaired_calls"],
+                latency.get("p50", "-"),
+                latency.get("p90", "-"),
+                entry["tokens_per_second"].get("p50", "-"),
+                entry["fallbacks"],
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tasks.clear()
+            self._started = time.time()
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _metrics(self, task: str) -> _TaskMetrics:
+        metrics = self._tasks.get(task)
+        if metrics is None:
+            metrics = self._tasks[task] = _TaskMetrics()
+        return metrics
+
+    @staticmethod
+    def _task_snapshot(metrics: _TaskMetrics) -> Dict[str, object]:
+        return {
+            "calls": metrics.calls,
+            "successes": metrics.successes,
+            "failures": metrics.failures,
+            "parse_failures": metrics.parse_failures,
+            "repaired_calls": metrics.repaired_calls,
+            "repairs": dict(metrics.repairs),
+            "estimated_token_calls": metrics.estimated_calls,
+            "modes": dict(metrics.modes),
+            "backends": dict(metrics.backends),
+            "fallbacks": metrics.fallbacks,
+            "fallback_items": metrics.fallback_items,
+            "cache_hits": metrics.cache_hits,
+            "prompt_tokens_total": int(metrics.prompt_tokens.total),
+            "completion_tokens_total": int(metrics.completion_tokens.total),
+            "latency": metrics.latency.snapshot(),
+            "time_to_first_token": metrics.time_to_first_token.snapshot(),
+            "prompt_tokens": metrics.prompt_tokens.snapshot(),
+            "completion_tokens": metrics.completion_tokens.snapshot(),
+            "tokens_per_second": metrics.tokens_per_second.snapshot(),
+        }
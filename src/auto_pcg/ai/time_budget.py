@@ -0,0 +1,101 @@
+"""Zeitbudget für interaktive Läufe (z. B. "Plan innerhalb von 20 s")."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Kürzester Timeout, mit dem ein LLM-Aufruf überhaupt noch gestartet wird.
+MIN_CALL_TIMEOUT = 0.1
+
+
+class TimeBudget:
+    """Gemeinsame Deadline aller Pipeline-Stufen.
+
+    ``seconds=None`` bedeutet unbegrenzt; dann ist jede Prüfung erfüllt und
+    :meth:`timeout` liefert den Standardwert. Stufen, die das Budget nicht mehr
+    einhalten können, weichen auf Heuristiken aus und melden das über
+    :meth:`degrade`. Mit :meth:`reserve` abgeleitete Budgets enden früher, teilen
+    aber den Bericht mit dem ursprünglichen Budget; :meth:`fork` liefert dieselbe
+    Deadline mit eigenem Bericht.
+    """
+
+    def __init__(self, seconds: Optional[float] = None) -> None:
+        self.seconds = seconds if seconds is None else max(0.0, float(seconds))
+        self.started = time.monotonic()
+        self.deadline = None if self.seconds is None else self.started + self.seconds
+        self._lock = threading.Lock()
+        self._degraded: Dict[str, Dict[str, object]] = {}
+
+    @property
+    def limited(self) -> bool:
+        return self.deadline is not None
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> Optional[float]:
+        """Verbleibende Sekunden (nie negativ) oder ``None`` ohne Budget."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0.0
+
+    def allows(self, seconds: float) -> bool:
+        """True, wenn noch mindestens ``seconds`` Sekunden übrig sind."""
+        remaining = self.remaining()
+        return remaining is None or remaining >= seconds
+
+    def timeout(self, default: float) -> float:
+        """Timeout für den nächsten Aufruf: Standardwert, höchstens das Restbudget."""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return max(MIN_CALL_TIMEOUT, min(default, remaining))
+
+    def reserve(self, seconds: float) -> "TimeBudget":
+        """Budget, das ``seconds`` vor diesem endet (für nachfolgende Stufen)."""
+        child = TimeBudget.__new__(TimeBudget)
+        child.seconds = self.seconds
+        child.started = self.started
+        child.deadline = None if self.deadline is None else max(self.started, self.deadline - max(0.0, seconds))
+        child._lock = self._lock
+        child._degraded = self._degraded
+        return child
+
+    def fork(self) -> "TimeBudget":
+        """Budget mit derselben Deadline, aber eigenem Bericht (z. B. je Prompt eines Batches)."""
+        child = TimeBudget.__new__(TimeBudget)
+        child.seconds = self.seconds
+        child.started = self.started
+        child.deadline = self.deadline
+        child._lock = threading.Lock()
+        child._degraded = {}
+        return child
+
+    def degrade(self, stage: str, reason: str) -> None:
+        """Vermerkt, dass ``stage`` wegen des Budgets auf Heuristiken ausgewichen ist."""
+        with self._lock:
+            entry = self._degraded.get(stage)
+            if entry is None:
+                self._degraded[stage] = {"stage": stage, "reason": reason, "at": round(self.elapsed, 3), "count": 1}
+            else:
+                entry["count"] = int(entry["count"]) + 1  # type: ignore[arg-type]
+
+    @property
+    def degraded(self) -> List[Dict[str, object]]:
+        """Ausgewichene Stufen in der Reihenfolge ihres ersten Auftretens."""
+        with self._lock:
+            return [dict(entry) for entry in self._degraded.values()]
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "seconds": self.seconds,
+            "elapsed": round(self.elapsed, 3),
+            "degraded": self.degraded,
+        }
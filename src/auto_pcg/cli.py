@@ -6,7 +6,7 @@ import argparse
 import json
 import logging
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 
 from auto_pcg.services.pcg_service import AutoPCGService
 
@@ -17,13 +17,79 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Auto-PCG KI-Assistent")
     parser.add_argument("--project", type=Path, default=Path("."), help="Wurzelverzeichnis des Unreal-Projekts")
     parser.add_argument("--prompt", type=str, default="Erstelle einen dichten Wald", help="Natürlicher Sprachbefehl")
+    parser.add_argument(
+        "--prompts-file",
+        type=Path,
+        default=None,
+        help="Batch-Modus: Textdatei mit einem Prompt pro Zeile (leere Zeilen und #-Kommentare werden ignoriert)",
+    )
+    parser.add_argument(
+        "--batch-workers",
+        type=int,
+        default=None,
+        help="Parallele Plan-Anfragen im Batch-Modus (Standard: Kapazität des Plan-Backends)",
+    )
     parser.add_argument("--max-assets", type=int, default=None, help="Maximale Anzahl an Assets für den Scan")
     parser.add_argument("--batch-size", type=int, default=None, help="Anzahl Assets pro LLM-Klassifikationsbatch")
+    parser.add_argument(
+        "--llm-workers",
+        type=int,
+        default=None,
+        help="Parallel laufende Klassifikationsbatches (Standard: AUTO_PCG_LLM_WORKERS bzw. OLLAMA_NUM_PARALLEL oder 1)",
+    )
+    parser.add_argument(
+        "--llm-backend",
+        action="append",
+        default=None,
+        metavar="SPEC",
+        help=(
+            "Zusätzliches LLM-Backend, mehrfach angebbar, z. B. "
+            "'http://gpu-1:11434,model=llama3,weight=2,concurrency=4' oder 'gguf:/models/x.gguf'"
+        ),
+    )
+    parser.add_argument(
+        "--task-model",
+        action="append",
+        default=None,
+        metavar="AUFGABE=SPEC",
+        help=(
+            "Eigenes Modell je Aufgabe (mehrfach): classification, pcg_plan, heightmap_strategy, "
+            "material_blueprint, layer_plan; z. B. classification=model=qwen2.5:1.5b,ctx=2048,max_tokens=512"
+        ),
+    )
+    parser.add_argument(
+        "--llm-routing",
+        type=str,
+        default="least_outstanding",
+        choices=["least_outstanding", "latency"],
+        help="Verteilung der Anfragen auf mehrere Backends",
+    )
+    parser.add_argument(
+        "--no-adaptive-batching",
+        action="store_true",
+        help="Hält die Batch-Größe fest, statt sie nach Token-Budget und Latenz anzupassen",
+    )
     parser.add_argument(
         "--heuristic-only",
         action="store_true",
         help="Überspringt das LLM und nutzt nur heuristische Klassifikation (am schnellsten)",
     )
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        help="Klassifiziert sofort heuristisch und verfeinert per LLM im Hintergrund (vorläufige Einträge im Cache)",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Klassifiziert per LLM nur die zum Prompt passenden Assets und merkt sie sich im Cache",
+    )
+    parser.add_argument(
+        "--refine-wait",
+        type=float,
+        default=0.0,
+        help="Sekunden, die nach der Pipeline noch auf die Hintergrund-Klassifikation gewartet wird",
+    )
     parser.add_argument(
         "--export-graph",
         type=Path,
@@ -31,6 +97,19 @@ def parse_args() -> argparse.Namespace:
         help="Optionales Zielverzeichnis, in das Graph-/Materialdaten exportiert werden",
     )
     parser.add_argument("--heightmap", type=Path, default=None, help="Pfad zu einer Heightmap-Datei")
+    parser.add_argument(
+        "--heightmap-size",
+        type=_dimensions,
+        default=None,
+        metavar="BREITExHÖHE",
+        help="Abmessungen einer .r16/.raw-Heightmap (z. B. 2017x2017; Standard: quadratisch aus der Dateigröße)",
+    )
+    parser.add_argument(
+        "--sea-level",
+        type=float,
+        default=None,
+        help="Meereshöhe für den Wasseranteil, normiert 0–1 (Standard: 10 %% über der niedrigsten Höhe)",
+    )
     parser.add_argument(
         "--performance-profile",
         type=str,
@@ -58,11 +137,62 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="HTTP-Timeout für Ollama-Requests in Sekunden (Standard 10)",
     )
+    parser.add_argument(
+        "--stream-llm",
+        action="store_true",
+        help="Streamt LLM-Antworten und übernimmt Klassifikationen/Layer, sobald sie vollständig sind",
+    )
+    parser.add_argument(
+        "--verbose-prompts",
+        action="store_true",
+        help="Sendet Assets/Terrain-Daten als eingerücktes JSON statt kompakt kodiert (mehr Token)",
+    )
+    parser.add_argument(
+        "--embeddings",
+        type=str,
+        default=None,
+        help="Semantische Asset-Suche: hash[:DIM], ollama[:MODELL[@URL]] oder gguf:PFAD (Standard: aus)",
+    )
+    parser.add_argument(
+        "--no-plan-cache",
+        action="store_true",
+        help="Fordert jeden PCG-Plan neu beim LLM an, statt gleiche Prompts aus dem Plan-Cache zu bedienen",
+    )
+    parser.add_argument(
+        "--plan-cache-similarity",
+        type=float,
+        default=None,
+        help="Nutzt gespeicherte Pläne auch für ähnliche Prompts ab dieser Embedding-Ähnlichkeit (z. B. 0.9)",
+    )
     parser.add_argument(
         "--no-local-model",
         action="store_true",
         help="Deaktiviert das lokale GGUF-Modell und nutzt ausschließlich Ollama",
     )
+    parser.add_argument(
+        "--local-processes",
+        type=int,
+        default=None,
+        help="Anzahl lokaler GGUF-Prozesse für CPU-Maschinen mit vielen Kernen (Standard 1)",
+    )
+    parser.add_argument(
+        "--local-threads",
+        type=int,
+        default=None,
+        help="Threads je lokalem GGUF-Prozess (Standard: alle Kerne bzw. 8 bei mehreren Prozessen)",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=None,
+        help="Zeitbudget des Laufs in Sekunden; danach greifen Heuristiken (z. B. 20)",
+    )
+    parser.add_argument(
+        "--telemetry",
+        type=Path,
+        default=None,
+        help="Ziel der LLM-Telemetrie als JSON (Standard: neben dem Asset-Cache)",
+    )
     parser.add_argument(
         "--no-layer-paint",
         action="store_true",
@@ -106,19 +236,48 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def _dimensions(value: str) -> Tuple[int, int]:
+    """Liest ``BREITExHÖHE`` (z. B. ``2017x2017``)."""
+    try:
+        width, height = (int(part) for part in value.lower().replace("*", "x").split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Erwartet BREITExHÖHE, erhalten: {value}") from None
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"Abmessungen müssen positiv sein: {value}")
+    return width, height
+
+
 def main() -> None:
     args = parse_args()
     service = AutoPCGService(
         args.project,
         max_assets=args.max_assets,
         prefer_heuristics=args.heuristic_only,
+        speculative_classification=args.speculative,
+        lazy_classification=args.lazy,
         classification_batch_size=args.batch_size,
+        classification_workers=args.llm_workers,
+        adaptive_batching=not args.no_adaptive_batching,
+        stream_responses=args.stream_llm,
+        compact_prompts=not args.verbose_prompts,
+        embeddings=args.embeddings,
+        plan_cache=not args.no_plan_cache,
+        plan_cache_similarity=args.plan_cache_similarity,
+        llm_backends=args.llm_backend,
+        llm_routing=args.llm_routing,
+        task_models=args.task_model,
         ollama_url=args.ollama_url,
         ollama_model=args.ollama_model,
         ollama_timeout=args.ollama_timeout,
         use_local_model=not args.no_local_model,
+        local_processes=args.local_processes,
+        local_threads=args.local_threads,
         export_directory=args.export_graph,
+        telemetry_path=args.telemetry,
+        time_budget=args.time_budget,
         heightmap=args.heightmap,
+        heightmap_size=args.heightmap_size,
+        sea_level=args.sea_level,
         performance_profile=args.performance_profile,
         target_style=args.target_style,
         auto_layer_paint=not args.no_layer_paint,
@@ -133,32 +292,70 @@ def main() -> None:
         hierarchical_pcg=args.hierarchical_pcg,
     )
 
-    logging.info("Starte vollautomatische KI-Pipeline...")
-    result = service.run_full_pipeline(args.prompt)
-    logging.info("Pipeline abgeschlossen.")
-    payload = _serialize_result(result)
+    if args.prompts_file:
+        prompts = _read_prompts_file(args.prompts_file)
+        logging.info("Starte Batch-Planung für %s Prompts aus %s...", len(prompts), args.prompts_file)
+        try:
+            result = service.build_graphs_for_prompts(prompts, max_workers=args.batch_workers)
+        finally:
+            service.close(refine_timeout=args.refine_wait)
+        logging.info("Batch abgeschlossen.")
+        payload = _serialize_batch_result(result)
+    else:
+        logging.info("Starte vollautomatische KI-Pipeline...")
+        try:
+            result = service.run_full_pipeline(args.prompt)
+        finally:
+            service.close(refine_timeout=args.refine_wait)
+        logging.info("Pipeline abgeschlossen.")
+        payload = _serialize_result(result)
     print(json.dumps(payload, indent=2, ensure_ascii=False))
 
 
+def _read_prompts_file(path: Path) -> List[str]:
+    """Ein Prompt pro Zeile; leere Zeilen und Kommentare (``#``) entfallen."""
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
 def _serialize_result(result: Dict[str, Any]) -> Dict[str, Any]:
     graph = result.get("graph")
     assets = result.get("assets") or []
     analysis = result.get("heightmap_analysis")
     blueprint = result.get("material_blueprint")
     layer_plan = result.get("layer_plan")
+    telemetry_path = result.get("telemetry_path")
     return {
         "graph": _graph_to_dict(graph) if graph else None,
         "assets": [asset.to_dict() for asset in assets],
         "heightmap_analysis": analysis.to_dict() if analysis else None,
         "material_blueprint": blueprint.to_dict() if blueprint else None,
         "layer_plan": layer_plan.to_dict() if layer_plan else None,
+        "llm_telemetry": str(telemetry_path) if telemetry_path else None,
+        "time_budget": result.get("time_budget"),
+    }
+
+
+def _serialize_batch_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    manifest_path = result.get("manifest_path")
+    telemetry_path = result.get("telemetry_path")
+    payload: Dict[str, Any] = {
+        "manifest": str(manifest_path) if manifest_path else None,
+        "graphs": result.get("entries") or [],
+        "llm_telemetry": str(telemetry_path) if telemetry_path else None,
+        "time_budget": result.get("time_budget"),
     }
+    if not manifest_path:
+        # Ohne Exportordner gibt es keine Dateien – die Graphen stehen dann in der Ausgabe.
+        payload["graph_data"] = [_graph_to_dict(graph) for graph in result.get("graphs") or []]
+    return payload
 
 
 def _graph_to_dict(graph):
     return {
         "generated_at": graph.generated_at.isoformat(),
         "description": graph.description,
+        "degraded_stages": graph.degraded_stages,
         "nodes": [_node_to_dict(node) for node in graph.root_nodes],
     }
 
@@ -1,6 +1,7 @@
 """Auto-PCG Datenmodule."""
 
 from .asset_database import AssetDatabase
+from .search_index import BM25Index
 from .spatial_database import SpatialAssetDatabase
 
-__all__ = ["AssetDatabase", "SpatialAssetDatabase"]
+__all__ = ["AssetDatabase", "BM25Index", "SpatialAssetDatabase"]
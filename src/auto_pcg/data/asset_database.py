@@ -4,16 +4,21 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence
 
 from auto_pcg.models.schemas import AssetData, AssetMetadata
 
+from .search_index import BM25Index
+from .vector_index import Embedder, VectorIndex
+
 
 class AssetDatabase:
     """Verwaltet Assets, Tags und Statistiken."""
 
     def __init__(self) -> None:
         self._assets: Dict[str, AssetData] = {}
+        self._search_index = BM25Index()
+        self._vector_index: Optional[VectorIndex] = None
 
     def store_asset(self, asset_data: AssetData) -> None:
         """Speichert oder aktualisiert ein Asset."""
@@ -26,6 +31,9 @@ class AssetDatabase:
             if not asset_data.usage_stats:
                 asset_data.usage_stats = existing.usage_stats
         self._assets[asset_data.asset_id] = asset_data
+        self._search_index.add(asset_data)
+        if self._vector_index is not None:
+            self._vector_index.add(asset_data)
 
     def get_asset(self, asset_id: str) -> AssetData | None:
         """Liefert ein Asset anhand seiner ID."""
@@ -34,6 +42,9 @@ class AssetDatabase:
     def remove_asset(self, asset_id: str) -> None:
         """Entfernt ein Asset aus der Datenbank."""
         self._assets.pop(asset_id, None)
+        self._search_index.remove(asset_id)
+        if self._vector_index is not None:
+            self._vector_index.remove(asset_id)
 
     def query_assets_by_tags(self, tags: Sequence[str]) -> List[AssetData]:
         """Liefert alle Assets, die mindestens einen der Tags besitzen."""
@@ -63,6 +74,43 @@ class AssetDatabase:
         scored.sort(key=lambda item: item[0], reverse=True)
         return [asset for score, asset in scored if score > 0][:limit]
 
+    def search_assets(self, query: str, limit: int = 10, *, diversify: bool = True) -> List[AssetData]:
+        """Volltextsuche (BM25) über Name, Tags, Kategorie, Biome und Stil."""
+        hits = self._search_index.search(query, limit, diversify=diversify)
+        return [self._assets[asset_id] for asset_id, _ in hits if asset_id in self._assets]
+
+    def enable_semantic_search(
+        self,
+        embedder: Optional[Embedder] = None,
+        storage_dir: Optional[Path] = None,
+    ) -> VectorIndex:
+        """Aktiviert den Embedding-Index (ohne ``embedder``: modellfreie n-Gramm-Vektoren)."""
+        self._vector_index = VectorIndex(embedder, storage_dir)
+        self._vector_index.add_many(self._assets.values())
+        self._vector_index.retain(self._assets)
+        return self._vector_index
+
+    @property
+    def semantic_search_enabled(self) -> bool:
+        return self._vector_index is not None
+
+    @property
+    def embedder(self) -> Optional[Embedder]:
+        """Embedding-Quelle des semantischen Index (``None``, solange er aus ist)."""
+        return self._vector_index.embedder if self._vector_index is not None else None
+
+    def semantic_search(self, query: str, limit: int = 10) -> List[AssetData]:
+        """Semantische Suche (Kosinus-Ähnlichkeit der Embeddings)."""
+        return self.semantic_search_many([query], limit)[0]
+
+    def semantic_search_many(self, queries: Sequence[str], limit: int = 10) -> List[List[AssetData]]:
+        """Semantische Suche für mehrere Anfragen; alle werden in einem Aufruf eingebettet."""
+        index = self._vector_index if self._vector_index is not None else self.enable_semantic_search()
+        return [
+            [self._assets[asset_id] for asset_id, _ in hits if asset_id in self._assets]
+            for hits in index.search_many(queries, limit)
+        ]
+
     def all_assets(self) -> Iterable[AssetData]:
         """Iterator über alle Assets."""
         return self._assets.values()
@@ -81,6 +129,7 @@ class AssetDatabase:
         if not isinstance(payload, list):
             return
         self._assets.clear()
+        self._search_index.clear()
         for entry in payload:
             metadata = entry["metadata"]
             asset = AssetData(
@@ -99,3 +148,5 @@ class AssetDatabase:
                 relationships=entry.get("relationships", []),
             )
             self.store_asset(asset)
+        if self._vector_index is not None:
+            self._vector_index.retain(self._assets)
@@ -0,0 +1,270 @@
+"""Cache für PCG-Pläne: gleiche Absicht im gleichen Kontext braucht keinen neuen LLM-Aufruf."""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from auto_pcg.models.schemas import AssetData
+
+from .search_index import fold, stem
+from .vector_index import Embedder, HashedNgramEmbedder
+
+LOGGER = logging.getLogger(__name__)
+
+# Höchstzahl gespeicherter Pläne; darüber fallen die am längsten ungenutzten heraus.
+DEFAULT_MAX_ENTRIES = 256
+CACHE_VERSION = 2
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# Nur reine Füllwörter fallen weg. Anders als beim BM25-Index bleiben Präpositionen,
+# Verneinungen und Mengenwörter erhalten: "Wald ohne Felsen" ist nicht "Wald mit Felsen".
+_FILLER_WORDS = frozenset(
+    """
+    a an the ein eine einem einen einer eines der die das dem den des
+    bitte please create generate make build erstelle erstellen erzeuge generiere baue
+    """.split()
+)
+# Wörter, die die Bedeutung umkehren oder skalieren; ähnliche Prompts müssen sie teilen.
+_MODIFIER_WORDS = frozenset(
+    stem(word)
+    for word in """
+    ohne kein keine keinen keiner no not without none
+    mehr more viel viele many much weniger less few wenig wenige
+    """.split()
+)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Vergleichsform eines Prompts: gestemmte Wörter in Originalreihenfolge, ohne Füllwörter.
+
+    Kleinschreibung, Umlaute und Stemming sorgen dafür, dass "dichter Wald" und
+    "Erstelle einen dichten Wald" denselben Schlüssel haben; Reihenfolge, Anzahl
+    und Wörter wie "ohne"/"mehr" bleiben Teil des Schlüssels.
+    """
+    return " ".join(stem(word) for word in _WORD_PATTERN.findall(fold(prompt)) if word not in _FILLER_WORDS)
+
+
+def _similar_wording(normalized: str, other: str) -> bool:
+    """Darf ``other`` per Embedding-Ähnlichkeit für ``normalized`` einspringen?"""
+    words, other_words = normalized.split(), other.split()
+    if sorted(words) == sorted(other_words):
+        return words == other_words
+    modifiers = {word for word in words if word in _MODIFIER_WORDS}
+    return modifiers == {word for word in other_words if word in _MODIFIER_WORDS}
+
+
+def context_fingerprint(assets: Sequence[AssetData]) -> str:
+    """Hash über Name, Typ und Tags der Kontext-Assets, unabhängig von Pfad und Reihenfolge.
+
+    Verschobene Assets ändern den Fingerabdruck nicht (der Plan wird beim Treffer
+    gegen die aktuellen Pfade aufgelöst), neue oder umklassifizierte Assets schon.
+    """
+    parts = sorted(
+        "|".join((asset.asset_path.stem.lower(), asset.asset_type, ",".join(sorted(asset.semantic_tags))))
+        for asset in assets
+    )
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """Rohe ``pcg_plan``-Objekte je normalisiertem Prompt, Kontext, Weltgröße und Saison.
+
+    Mit ``similarity`` (0–1) gilt zusätzlich ein anders formulierter Prompt im
+    selben Kontext als Treffer, wenn die Kosinus-Ähnlichkeit der Embeddings den
+    Schwellwert erreicht. Mit ``path`` überlebt der Cache Neustarts als JSON-Datei.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        *,
+        similarity: Optional[float] = None,
+        embedder: Optional[Embedder] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.path = Path(path) if path else None
+        self.similarity = None if similarity is None else min(1.0, max(0.0, float(similarity)))
+        self.embedder = embedder or (HashedNgramEmbedder() if self.similarity is not None else None)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, object]] = {}
+        self._stats = {"hits": 0, "similar_hits": 0, "misses": 0, "stores": 0}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(
+        self,
+        prompt: str,
+        context_assets: Sequence[AssetData],
+        *,
+        world_size: float,
+        season: str,
+    ) -> Optional[Dict[str, object]]:
+        """Gespeichertes ``pcg_plan``-Objekt (Kopie) oder ``None``."""
+        scope = self._scope(context_fingerprint(context_assets), world_size, season)
+        key = self._key(normalize_prompt(prompt), scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._stats["hits"] += 1
+                return self._use(entry)
+        if self.similarity is not None:
+            entry = self._similar_entry(prompt, scope)
+            if entry is not None:
+                with self._lock:
+                    self._stats["similar_hits"] += 1
+                    return self._use(entry)
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def store(
+        self,
+        prompt: str,
+        context_assets: Sequence[AssetData],
+        plan: Dict[str, object],
+        *,
+        world_size: float,
+        season: str,
+    ) -> None:
+        """Merkt sich das rohe ``pcg_plan``-Objekt eines vollständigen LLM-Plans."""
+        normalized = normalize_prompt(prompt)
+        scope = self._scope(context_fingerprint(context_assets), world_size, season)
+        entry: Dict[str, object] = {
+            "prompt": prompt,
+            "normalized": normalized,
+            "scope": scope,
+            "plan": copy.deepcopy(plan),
+            "created": time.time(),
+            "last_used": time.time(),
+            "hits": 0,
+        }
+        if self.similarity is not None:
+            vector = self._embed([prompt])
+            if vector:
+                entry["embedding"] = vector[0]
+                entry["embedder"] = self.embedder.name  # type: ignore[union-attr]
+        with self._lock:
+            self._entries[self._key(normalized, scope)] = entry
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                del self._entries[min(self._entries, key=self._last_used)]
+            self._save()
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {"entries": len(self._entries), "similarity": self.similarity, **self._stats}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    # Intern ----------------------------------------------------------------------------
+
+    @staticmethod
+    def _scope(fingerprint: str, world_size: float, season: str) -> str:
+        return f"{fingerprint}|{float(world_size):g}|{(season or '').strip().lower()}"
+
+    @staticmethod
+    def _key(normalized: str, scope: str) -> str:
+        return hashlib.sha1(f"{normalized}\n{scope}".encode("utf-8")).hexdigest()
+
+    def _last_used(self, key: str) -> float:
+        return float(self._entries[key]["last_used"])  # type: ignore[arg-type]
+
+    def _use(self, entry: Dict[str, object]) -> Dict[str, object]:
+        """Zählt den Treffer (unter dem Lock) und liefert eine Kopie des Plans."""
+        entry["hits"] = int(entry["hits"]) + 1  # type: ignore[arg-type]
+        entry["last_used"] = time.time()
+        return copy.deepcopy(entry["plan"])  # type: ignore[return-value]
+
+    def _similar_entry(self, prompt: str, scope: str) -> Optional[Dict[str, object]]:
+        """Ähnlichster gespeicherter Prompt im selben Kontext, sofern über dem Schwellwert.
+
+        Embeddings trennen "mit" und "ohne" kaum und ignorieren die Wortreihenfolge;
+        Kandidaten müssen deshalb dieselben Verneinungs- und Mengenwörter enthalten und
+        dürfen keine bloße Umstellung des Prompts sein ("Felsen auf Bäumen").
+        """
+        normalized = normalize_prompt(prompt)
+        with self._lock:
+            candidates = [
+                entry
+                for entry in self._entries.values()
+                if entry["scope"] == scope and _similar_wording(normalized, str(entry["normalized"]))
+            ]
+        if not candidates:
+            return None
+        name = self.embedder.name  # type: ignore[union-attr]
+        stale = [entry for entry in candidates if entry.get("embedder") != name]
+        vectors = self._embed([prompt] + [str(entry["prompt"]) for entry in stale])
+        if not vectors:
+            return None
+        query = vectors[0]
+        with self._lock:
+            for entry, vector in zip(stale, vectors[1:]):
+                entry["embedding"] = vector
+                entry["embedder"] = name
+        best, best_score = None, -1.0
+        for entry in candidates:
+            score = sum(a * b for a, b in zip(query, entry["embedding"]))  # type: ignore[arg-type]
+            if score > best_score:
+                best, best_score = entry, score
+        if best is None or best_score < self.similarity:  # type: ignore[operator]
+            return None
+        LOGGER.info("PCG-Plan-Cache: '%s' ähnelt '%s' (%.3f).", prompt, best["prompt"], best_score)
+        return best
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Normierte Embeddings; bei Fehlern leer (dann gibt es nur exakte Treffer)."""
+        try:
+            vectors = self.embedder.embed(texts)  # type: ignore[union-attr]
+        except (RuntimeError, OSError, ValueError) as exc:
+            LOGGER.warning("PCG-Plan-Cache: Prompt konnte nicht eingebettet werden: %s", exc)
+            return []
+        normalized = []
+        for vector in vectors:
+            norm = math.sqrt(sum(value * value for value in vector))
+            normalized.append([value / norm for value in vector] if norm > 0.0 else [0.0 for _ in vector])
+        return normalized
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+            if payload.get("version") != CACHE_VERSION:
+                raise ValueError(f"Version {payload.get('version')}")
+            entries = {str(key): dict(entry) for key, entry in payload["entries"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as exc:
+            LOGGER.warning("PCG-Plan-Cache %s wird verworfen: %s", self.path, exc)
+            return
+        self._entries = entries
+        LOGGER.info("PCG-Plan-Cache geladen: %s Pläne.", len(entries))
+
+    def _save(self) -> None:
+        """Schreibt den Cache atomar; Aufrufer halten den Lock."""
+        if self.path is None:
+            return
+        temp_path = self.path.with_suffix(".tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_text(
+                json.dumps({"version": CACHE_VERSION, "entries": self._entries}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            os.replace(temp_path, self.path)
+        except OSError as exc:  # pragma: no cover - Dateifehler
+            LOGGER.warning("PCG-Plan-Cache konnte nicht gespeichert werden (%s): %s", self.path, exc)
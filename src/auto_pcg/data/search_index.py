@@ -0,0 +1,357 @@
+"""BM25-Volltextindex für die Auswahl des PCG-Kontexts."""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from auto_pcg.models.schemas import AssetData
+
+# Feldgewichte: ein Treffer im Dateinamen zählt dreifach, in Tags einfach.
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "category": 2.0,
+    "biomes": 1.5,
+    "tags": 1.0,
+    "style": 1.0,
+}
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_SPLIT_PATTERN = re.compile(r"[^a-z0-9]+")
+_CAMEL_PATTERN = re.compile(r"(?<=[a-z])(?=[A-Z])|(?<=[A-Za-z])(?=[0-9])|(?<=[0-9])(?=[A-Za-z])")
+
+# Häufige Füllwörter in Prompts sowie UE-Namenspräfixe (SM_, T_, BP_, ...).
+_STOPWORDS = frozenset(
+    """
+    a an and at by for from in into of on or the to with without
+    am an auf aus bei das dem den der des die ein eine einem einen einer eines fuer im
+    in mit mehr ohne oder sehr und viel viele vom von zu zum zur
+    bitte please create generate make build erstelle erstellen generiere baue
+    sm sk t m mi mat bp tex fx ns
+    """.split()
+)
+
+_SUFFIXES = ("ies", "ern", "en", "er", "es", "e", "s")
+
+# Deutsche Begriffe auf die englischen Bezeichnungen abbilden, die in Assetnamen,
+# Tags und Biomen vorkommen. Schlüssel decken auch Plural- und Kompositaenden ab.
+_GERMAN_TERMS = {
+    "baum": "tree",
+    "baeume": "tree",
+    "wald": "forest",
+    "waelder": "forest",
+    "nadelbaum": "pine",
+    "tanne": "fir",
+    "fichte": "spruce",
+    "kiefer": "pine",
+    "eiche": "oak",
+    "birke": "birch",
+    "busch": "bush",
+    "buesche": "bush",
+    "strauch": "shrub",
+    "straeucher": "shrub",
+    "gras": "grass",
+    "graeser": "grass",
+    "wiese": "grassland",
+    "blume": "flower",
+    "blumen": "flower",
+    "pilz": "mushroom",
+    "pilze": "mushroom",
+    "farn": "fern",
+    "moos": "moss",
+    "blatt": "leaf",
+    "blaetter": "leaf",
+    "laub": "leaf",
+    "ast": "branch",
+    "aeste": "branch",
+    "stamm": "trunk",
+    "wurzel": "root",
+    "fels": "rock",
+    "felsen": "rock",
+    "stein": "stone",
+    "steine": "stone",
+    "geroell": "rubble",
+    "klippe": "cliff",
+    "berg": "mountain",
+    "gebirge": "mountain",
+    "huegel": "hill",
+    "hoehle": "cave",
+    "wueste": "desert",
+    "duene": "dune",
+    "kaktus": "cactus",
+    "kakteen": "cactus",
+    "schnee": "snow",
+    "eis": "ice",
+    "frost": "frost",
+    "tundra": "tundra",
+    "dschungel": "jungle",
+    "sumpf": "swamp",
+    "moor": "bog",
+    "wasser": "water",
+    "fluss": "river",
+    "see": "lake",
+    "meer": "ocean",
+    "strand": "beach",
+    "ufer": "shore",
+    "stadt": "urban",
+    "strasse": "road",
+    "weg": "path",
+    "pfad": "path",
+    "haus": "house",
+    "haeuser": "house",
+    "gebaeude": "building",
+    "mauer": "wall",
+    "wand": "wall",
+    "ruine": "ruin",
+    "bruecke": "bridge",
+    "zaun": "fence",
+    "turm": "tower",
+    "burg": "castle",
+    "dorf": "village",
+    "kiste": "crate",
+    "fass": "barrel",
+    "laterne": "lantern",
+    "fackel": "torch",
+    "vulkan": "volcanic",
+    "lava": "lava",
+    "herbst": "autumn",
+    "winter": "winter",
+    "sommer": "summer",
+    "fruehling": "spring",
+    "dunkel": "dark",
+    "duester": "dark",
+    "hell": "bright",
+    "alt": "old",
+    "kaputt": "broken",
+    "gross": "large",
+    "klein": "small",
+    "dicht": "dense",
+    "nass": "wet",
+    "trocken": "dry",
+    "unterholz": "undergrowth",
+}
+# Für Komposita wie "nadelwald" oder "felswand": nur ausreichend lange Endungen.
+_COMPOUND_TAILS = sorted((key for key in _GERMAN_TERMS if len(key) >= 4), key=len, reverse=True)
+
+
+def fold(token: str) -> str:
+    """Kleinschreibung und Umlaut-Faltung (ä -> ae, ß -> ss)."""
+    return token.lower().translate(_UMLAUTS)
+
+
+def stem(token: str) -> str:
+    """Leichter, sprachneutraler Suffix-Stemmer für deutsche und englische Wörter.
+
+    Entfernt höchstens zwei Endungen und nie unter drei Zeichen Stammlänge. Er muss
+    nicht linguistisch korrekt sein, nur für Index und Anfrage identisch arbeiten.
+    """
+    for _ in range(2):
+        if len(token) < 5 or token.endswith("ss"):
+            break
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                token = token[: -len(suffix)] + ("y" if suffix == "ies" else "")
+                break
+        else:
+            break
+    return token
+
+
+# Flektierte Formen ("Bäumen", "Felsens") über den gemeinsamen Stamm nachschlagen.
+_GERMAN_STEMS = {stem(key): term for key, term in _GERMAN_TERMS.items()}
+
+
+def tokenize(text: str, *, translate: bool = True) -> List[str]:
+    """Zerlegt Text in normalisierte, gestemmte Terme.
+
+    CamelCase, Unterstriche und Ziffern trennen Wörter; mit ``translate`` werden
+    deutsche Begriffe zusätzlich auf ihre englische Entsprechung abgebildet, sodass
+    "Nadelwald" sowohl als eigener Term als auch als ``forest`` gefunden wird.
+    Für englische Assetnamen abschalten: "Seashell" endet auf "hell", "Wand" und
+    "Strand" sind auch englische Wörter.
+    """
+    terms: List[str] = []
+    for raw in _SPLIT_PATTERN.split(fold(_CAMEL_PATTERN.sub(" ", text))):
+        if len(raw) < 2 or raw.isdigit() or raw in _STOPWORDS:
+            continue
+        stemmed = stem(raw)
+        terms.append(stemmed)
+        if not translate:
+            continue
+        translated = _GERMAN_TERMS.get(raw) or _GERMAN_STEMS.get(stemmed)
+        if translated is None:
+            translated = next((_GERMAN_TERMS[tail] for tail in _COMPOUND_TAILS if raw.endswith(tail)), None)
+        if translated is not None and translated != raw:
+            terms.append(stem(translated))
+    return terms
+
+
+def asset_fields(asset: AssetData) -> Dict[str, str]:
+    """Durchsuchbare Textfelder eines Assets."""
+    profile = asset.semantic_profile or {}
+    biomes = profile.get("biomes") or []
+    return {
+        "name": f"{asset.asset_path.stem} {asset.asset_type}",
+        "category": f"{profile.get('primary_category', '')} {profile.get('sub_category', '')}",
+        "biomes": " ".join(str(biome) for biome in biomes) if isinstance(biomes, list) else str(biomes),
+        "tags": " ".join(asset.semantic_tags),
+        "style": str(profile.get("style", "")),
+    }
+
+
+def asset_category(asset: AssetData) -> str:
+    """Kategorie für die Diversitätsregel (LLM-Kategorie, sonst Asset-Typ)."""
+    profile = asset.semantic_profile or {}
+    category = profile.get("primary_category") or asset.asset_type
+    sub_category = profile.get("sub_category") or ""
+    return f"{category}/{sub_category}".lower()
+
+
+class BM25Index:
+    """Inkrementeller BM25-Index über Name, Tags, Kategorie, Biome und Stil.
+
+    ``add`` ersetzt einen vorhandenen Eintrag, sodass Klassifikationen, die erst
+    später eintreffen, den Index aktuell halten. Deutsch→Englisch übersetzt nur
+    die Anfrage; Assettexte werden unverändert indexiert. Abfragen betrachten nur Dokumente
+    aus den Postings der Anfrageterme und bleiben damit auch bei großen
+    Katalogen im Millisekundenbereich.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, diversity_decay: float = 0.6) -> None:
+        self.k1 = k1
+        self.b = b
+        self.diversity_decay = min(1.0, max(0.0, diversity_decay))
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._categories: Dict[str, str] = {}
+        self._total_length = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, asset: AssetData) -> None:
+        """Indexiert ein Asset (oder aktualisiert es)."""
+        weighted: Counter = Counter()
+        for field, text in asset_fields(asset).items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text, translate=False):
+                weighted[term] += weight
+        with self._lock:
+            self._remove_locked(asset.asset_id)
+            terms = dict(weighted)
+            self._doc_terms[asset.asset_id] = terms
+            length = float(sum(terms.values()))
+            self._doc_lengths[asset.asset_id] = length
+            self._total_length += length
+            self._categories[asset.asset_id] = asset_category(asset)
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[asset.asset_id] = frequency
+
+    def add_many(self, assets: Iterable[AssetData]) -> None:
+        for asset in assets:
+            self.add(asset)
+
+    def remove(self, asset_id: str) -> None:
+        with self._lock:
+            self._remove_locked(asset_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_lengths.clear()
+            self._categories.clear()
+            self._total_length = 0.0
+
+    def search(self, query: str, limit: int = 10, *, diversify: bool = True) -> List[Tuple[str, float]]:
+        """Liefert ``(asset_id, score)`` der besten Treffer.
+
+        Mit ``diversify`` wird jeder weitere Treffer derselben Kategorie um den
+        Faktor ``diversity_decay`` abgewertet, damit ein Prompt wie "Wald mit
+        Felsen" nicht nur Bäume liefert.
+        """
+        terms = Counter(tokenize(query))
+        if not terms or limit <= 0:
+            return []
+        with self._lock:
+            scores = self._score(terms)
+            categories = {asset_id: self._categories.get(asset_id, "") for asset_id in scores}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if not diversify or self.diversity_decay >= 1.0:
+            return ranked[:limit]
+        return self._diversify(ranked, categories, limit)
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _remove_locked(self, asset_id: str) -> None:
+        terms = self._doc_terms.pop(asset_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._doc_lengths.pop(asset_id, 0.0)
+        self._categories.pop(asset_id, None)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(asset_id, None)
+            if not posting:
+                del self._postings[term]
+
+    def _score(self, terms: Counter) -> Dict[str, float]:
+        documents = len(self._doc_terms)
+        if not documents:
+            return {}
+        average_length = self._total_length / documents or 1.0
+        lengths = self._doc_lengths
+        # BM25-Normalisierung k1 * (1 - b + b * dl / avgdl), in Konstanten zerlegt.
+        base = self.k1 * (1.0 - self.b)
+        scale = self.k1 * self.b / average_length
+        saturation = self.k1 + 1.0
+        scores: Dict[str, float] = {}
+        for term, query_frequency in terms.items():
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1.0 + (documents - len(posting) + 0.5) / (len(posting) + 0.5))
+            weight = query_frequency * idf * saturation
+            for asset_id, frequency in posting.items():
+                contribution = weight * frequency / (frequency + base + scale * lengths[asset_id])
+                scores[asset_id] = scores.get(asset_id, 0.0) + contribution
+        return scores
+
+    def _diversify(
+        self,
+        ranked: Sequence[Tuple[str, float]],
+        categories: Dict[str, str],
+        limit: int,
+    ) -> List[Tuple[str, float]]:
+        """Greedy-Auswahl mit abnehmendem Gewicht je bereits gewählter Kategorie.
+
+        Innerhalb einer Kategorie bleibt die BM25-Reihenfolge erhalten, daher genügt
+        es, pro Schritt nur den jeweils besten Kandidaten jeder Kategorie zu vergleichen.
+        """
+        queues: Dict[str, List[Tuple[str, float]]] = {}
+        for asset_id, score in ranked:
+            queues.setdefault(categories[asset_id], []).append((asset_id, score))
+        cursors = {category: 0 for category in queues}
+        selected: List[Tuple[str, float]] = []
+        while len(selected) < limit:
+            best_category: Optional[str] = None
+            best_score = 0.0
+            for category, queue in queues.items():
+                cursor = cursors[category]
+                if cursor >= len(queue):
+                    continue
+                adjusted = queue[cursor][1] * self.diversity_decay**cursor
+                if best_category is None or adjusted > best_score:
+                    best_category, best_score = category, adjusted
+            if best_category is None:
+                break
+            selected.append(queues[best_category][cursors[best_category]])
+            cursors[best_category] += 1
+        return selected
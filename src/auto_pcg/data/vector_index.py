@@ -0,0 +1,418 @@
+"""Embedding-Index für semantische Asset-Suche (Kosinus-Ähnlichkeit)."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from auto_pcg.models.schemas import AssetData
+
+from .search_index import asset_fields, tokenize
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+LOGGER = logging.getLogger(__name__)
+
+# Zeilen pro Matrixblock einer Abfrage; begrenzt den Speicher bei großen Katalogen.
+QUERY_BLOCK_ROWS = 65536
+# Nach einem Embedding-Fehler wird so lange nur der vorhandene Bestand durchsucht.
+RETRY_AFTER_SECONDS = 30.0
+
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class Embedder(ABC):
+    """Gemeinsame Schnittstelle aller Embedding-Quellen.
+
+    ``embed`` liefert je Text einen Vektor; ``name`` identifiziert Modell und
+    Parameter und bestimmt, welcher persistierte Index wiederverwendet wird.
+    Fehler werden als ``RuntimeError`` bzw. ``OSError`` gemeldet.
+    """
+
+    name = "embedder"
+    dimensions: Optional[int] = None
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Ein Vektor je Text, in Eingabereihenfolge."""
+
+
+class HashedNgramEmbedder(Embedder):
+    """Modellfreier Fallback: gehashte Zeichen-n-Gramme der normalisierten Tokens.
+
+    Nutzt dieselbe Tokenisierung wie der BM25-Index (Stemming, Deutsch→Englisch),
+    ergänzt um n-Gramme, damit Wortvarianten und Teilwörter ähnlich landen.
+    """
+
+    def __init__(self, dimensions: int = 256, ngram_sizes: Sequence[int] = (3, 4)) -> None:
+        self.dimensions = max(16, int(dimensions))
+        self.ngram_sizes = tuple(sorted({max(2, int(size)) for size in ngram_sizes}))
+        self.name = f"hash-{self.dimensions}-{'_'.join(str(size) for size in self.ngram_sizes)}"
+        self._features = lru_cache(maxsize=65536)(self._token_features)
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimensions
+            for token in tokenize(text):
+                for index, weight in self._features(token):
+                    vector[index] += weight
+            vectors.append(vector)
+        return vectors
+
+    def _token_features(self, token: str) -> Tuple[Tuple[int, float], ...]:
+        """Bucket und Gewicht je Merkmal; das ganze Token zählt so viel wie alle n-Gramme."""
+        padded = f"<{token}>"
+        grams = [padded[start : start + size] for size in self.ngram_sizes for start in range(len(padded) - size + 1)]
+        features = [(token, 1.0)] + [(gram, 1.0 / len(grams)) for gram in grams]
+        result = []
+        for feature, weight in features:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            sign = 1.0 if digest >> 63 else -1.0
+            result.append((digest % self.dimensions, sign * weight))
+        return tuple(result)
+
+
+def embedding_text(asset: AssetData) -> str:
+    """Text, der für ein Asset eingebettet wird (Name, Kategorie, Biome, Tags, Stil)."""
+    fields = asset_fields(asset)
+    return " | ".join(value.strip() for value in fields.values() if value.strip())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class VectorIndex:
+    """Embedding-Matrix (float32) je Asset-ID mit Top-k-Kosinussuche.
+
+    ``add`` merkt Assets nur vor; eingebettet wird gebündelt vor der nächsten
+    Abfrage (:meth:`sync`), und zwar nur, wenn sich der eingebettete Text seit dem
+    letzten Mal geändert hat (Inhalts-Hash). Mit ``storage_dir`` liegt die Matrix
+    als Memory-Map auf der Platte und überlebt Neustarts; ohne NumPy bleibt der
+    Index im Speicher und wird in reinem Python durchsucht.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        storage_dir: Optional[Path] = None,
+        *,
+        batch_size: int = 32,
+    ) -> None:
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.batch_size = max(1, batch_size)
+        self._directory: Optional[Path] = None
+        if storage_dir is not None:
+            if np is None:
+                LOGGER.info("NumPy fehlt – Embedding-Index wird nicht auf der Platte gehalten.")
+            else:
+                self._directory = Path(storage_dir) / _UNSAFE_NAME.sub("_", self.embedder.name)
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._hashes: Dict[str, str] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._pending: Dict[str, Tuple[str, str]] = {}
+        self._dimensions: Optional[int] = None
+        self._capacity = 0
+        self._matrix: object = None
+        self._valid: object = None
+        self._retry_at = 0.0
+        self._dirty = False
+        self._load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, asset: AssetData) -> None:
+        """Merkt ein Asset zum Einbetten vor, sofern sich sein Text geändert hat."""
+        text = embedding_text(asset)
+        digest = content_hash(text)
+        with self._lock:
+            if self._hashes.get(asset.asset_id) == digest:
+                self._pending.pop(asset.asset_id, None)
+            else:
+                self._pending[asset.asset_id] = (text, digest)
+
+    def add_many(self, assets: Iterable[AssetData]) -> None:
+        for asset in assets:
+            self.add(asset)
+
+    def remove(self, asset_id: str) -> None:
+        with self._lock:
+            self._pending.pop(asset_id, None)
+            self._hashes.pop(asset_id, None)
+            row = self._rows.pop(asset_id, None)
+            if row is not None:
+                self._ids[row] = None
+                self._set_valid(row, False)
+                self._free.append(row)
+                self._dirty = True
+
+    def retain(self, asset_ids: Iterable[str]) -> None:
+        """Entfernt alle Einträge, deren ID nicht in ``asset_ids`` vorkommt."""
+        keep = set(asset_ids)
+        with self._lock:
+            stale = [asset_id for asset_id in set(self._rows) | set(self._pending) if asset_id not in keep]
+        for asset_id in stale:
+            self.remove(asset_id)
+
+    def sync(self) -> int:
+        """Bettet alle vorgemerkten Assets ein; liefert die Anzahl neuer Vektoren."""
+        with self._sync_lock:
+            with self._lock:
+                if not self._pending or time.monotonic() < self._retry_at:
+                    if self._dirty:
+                        self._flush()
+                    return 0
+                pending = list(self._pending.items())
+            started = time.perf_counter()
+            written = 0
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start : start + self.batch_size]
+                try:
+                    vectors = self.embedder.embed([text for _, (text, _) in batch])
+                except (RuntimeError, OSError, ValueError) as exc:
+                    LOGGER.warning("Embeddings konnten nicht berechnet werden (%s): %s", self.embedder.name, exc)
+                    self._retry_at = time.monotonic() + RETRY_AFTER_SECONDS
+                    break
+                with self._lock:
+                    written += self._store_batch(batch, vectors)
+            if written or self._dirty:
+                self._flush()
+        if written:
+            LOGGER.info(
+                "Embedding-Index (%s): %s Vektoren in %.2fs aktualisiert, %s gesamt.",
+                self.embedder.name,
+                written,
+                time.perf_counter() - started,
+                len(self),
+            )
+        return written
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Top-k-Assets nach Kosinus-Ähnlichkeit als ``(asset_id, score)``."""
+        return self.search_many([query], limit)[0]
+
+    def search_many(self, queries: Sequence[str], limit: int = 10) -> List[List[Tuple[str, float]]]:
+        """Beantwortet mehrere Anfragen mit einer Matrixmultiplikation je Block."""
+        if not queries:
+            return []
+        self.sync()
+        if limit <= 0 or not len(self):
+            return [[] for _ in queries]
+        try:
+            query_vectors = [_normalized(vector) for vector in self.embedder.embed(list(queries))]
+        except (RuntimeError, OSError, ValueError) as exc:
+            LOGGER.warning("Anfrage konnte nicht eingebettet werden (%s): %s", self.embedder.name, exc)
+            return [[] for _ in queries]
+        with self._lock:
+            if self._dimensions is None or any(len(vector) != self._dimensions for vector in query_vectors):
+                LOGGER.warning("Embedding-Dimension der Anfrage passt nicht zum Index.")
+                return [[] for _ in queries]
+            if np is None:
+                return [self._search_python(vector, limit) for vector in query_vectors]
+            return self._search_numpy(query_vectors, limit)
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _store_batch(self, batch: Sequence[Tuple[str, Tuple[str, str]]], vectors: Sequence[Sequence[float]]) -> int:
+        """Schreibt Vektoren in die Matrix (Lock muss gehalten werden)."""
+        written = 0
+        for (asset_id, (_, digest)), vector in zip(batch, vectors):
+            if self._pending.get(asset_id, (None, None))[1] != digest:
+                continue  # zwischenzeitlich entfernt oder erneut geändert
+            if self._dimensions != len(vector):
+                if self._rows:
+                    LOGGER.warning(
+                        "Embedding-Dimension geändert (%s → %s) – Index wird neu aufgebaut.",
+                        self._dimensions,
+                        len(vector),
+                    )
+                self._reset(len(vector))
+            row = self._rows.get(asset_id)
+            if row is None:
+                row = self._free.pop() if self._free else self._next_row()
+                self._rows[asset_id] = row
+                self._ids[row] = asset_id
+            if np is None:
+                self._matrix[row] = _normalized(vector)  # type: ignore[index]
+            else:
+                array = np.asarray(vector, dtype=np.float32)
+                norm = float(np.linalg.norm(array))
+                self._matrix[row] = array / norm if norm > 0.0 else 0.0  # type: ignore[index]
+            self._set_valid(row, True)
+            self._hashes[asset_id] = digest
+            del self._pending[asset_id]
+            written += 1
+        return written
+
+    def _next_row(self) -> int:
+        row = len(self._ids)
+        if row >= self._capacity:
+            self._grow(max(1024, self._capacity * 2))
+        self._ids.append(None)
+        return row
+
+    def _reset(self, dimensions: int) -> None:
+        for asset_id in list(self._rows):
+            self._hashes.pop(asset_id, None)
+        self._rows.clear()
+        self._ids.clear()
+        self._free.clear()
+        self._dimensions = dimensions
+        self._capacity = 0
+        self._matrix = None
+        self._valid = None
+        self._grow(1024)
+
+    def _grow(self, capacity: int) -> None:
+        """Vergrößert Matrix und Gültigkeitsmaske; auf der Platte per Dateiverlängerung."""
+        dimensions = self._dimensions or 0
+        if np is None:
+            matrix = list(self._matrix or [])  # type: ignore[arg-type]
+            matrix.extend([[0.0] * dimensions for _ in range(capacity - len(matrix))])
+            valid = list(self._valid or [])  # type: ignore[arg-type]
+            valid.extend([False] * (capacity - len(valid)))
+            self._matrix, self._valid, self._capacity = matrix, valid, capacity
+            return
+        valid = np.zeros(capacity, dtype=bool)
+        if self._valid is not None:
+            valid[: self._capacity] = self._valid
+        if self._directory is None:
+            matrix = np.zeros((capacity, dimensions), dtype=np.float32)
+            if self._matrix is not None:
+                matrix[: self._capacity] = self._matrix
+        else:
+            path = self._directory / "vectors.f32"
+            self._directory.mkdir(parents=True, exist_ok=True)
+            if self._matrix is not None:
+                self._matrix.flush()  # type: ignore[attr-defined]
+            # Die alte Abbildung muss vor dem Verlängern geschlossen sein (Windows).
+            self._matrix = None
+            with path.open("ab") as stream:
+                stream.truncate(capacity * dimensions * 4)
+            matrix = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, dimensions))
+        self._matrix, self._valid, self._capacity = matrix, valid, capacity
+
+    def _set_valid(self, row: int, value: bool) -> None:
+        if self._valid is not None:
+            self._valid[row] = value  # type: ignore[index]
+
+    def _search_numpy(self, query_vectors: Sequence[List[float]], limit: int) -> List[List[Tuple[str, float]]]:
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        used = len(self._ids)
+        best_rows: List[List[np.ndarray]] = [[] for _ in query_vectors]
+        best_scores: List[List[np.ndarray]] = [[] for _ in query_vectors]
+        for start in range(0, used, QUERY_BLOCK_ROWS):
+            stop = min(used, start + QUERY_BLOCK_ROWS)
+            scores = queries @ np.asarray(self._matrix[start:stop]).T  # type: ignore[index]
+            scores[:, ~self._valid[start:stop]] = -np.inf  # type: ignore[index]
+            keep = min(limit, stop - start)
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            for query_index in range(len(query_vectors)):
+                best_rows[query_index].append(top[query_index] + start)
+                best_scores[query_index].append(scores[query_index, top[query_index]])
+        results = []
+        for rows, scores in zip(best_rows, best_scores):
+            merged_rows = np.concatenate(rows)
+            merged_scores = np.concatenate(scores)
+            order = np.argsort(-merged_scores, kind="stable")[:limit]
+            results.append(
+                [
+                    (self._ids[int(merged_rows[index])], float(merged_scores[index]))
+                    for index in order
+                    if np.isfinite(merged_scores[index])
+                ]
+            )
+        return results  # type: ignore[return-value]
+
+    def _search_python(self, query: List[float], limit: int) -> List[Tuple[str, float]]:
+        scored = [
+            (asset_id, sum(a * b for a, b in zip(query, self._matrix[row])))  # type: ignore[index]
+            for asset_id, row in self._rows.items()
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def _load(self) -> None:
+        """Öffnet einen persistierten Index, sofern Modell und Dateigröße passen."""
+        if self._directory is None:
+            return
+        meta_path = self._directory / "index.json"
+        vectors_path = self._directory / "vectors.f32"
+        if not meta_path.exists() or not vectors_path.exists():
+            return
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            dimensions = int(meta["dimensions"])
+            capacity = int(meta["capacity"])
+            rows = {str(asset_id): (int(row), str(digest)) for asset_id, (row, digest) in meta["rows"].items()}
+            if meta.get("embedder") != self.embedder.name:
+                raise ValueError(f"anderes Modell ({meta.get('embedder')})")
+            if vectors_path.stat().st_size != capacity * dimensions * 4:
+                raise ValueError("Dateigröße passt nicht zur Kapazität")
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            LOGGER.warning("Embedding-Index %s wird verworfen: %s", self._directory, exc)
+            return
+        self._dimensions = dimensions
+        self._capacity = capacity
+        self._matrix = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dimensions))
+        self._valid = np.zeros(capacity, dtype=bool)
+        used = max((row for row, _ in rows.values()), default=-1) + 1
+        self._ids = [None] * used
+        for asset_id, (row, digest) in rows.items():
+            self._rows[asset_id] = row
+            self._hashes[asset_id] = digest
+            self._ids[row] = asset_id
+            self._valid[row] = True
+        self._free = [row for row in range(used) if self._ids[row] is None]
+        LOGGER.info("Embedding-Index geladen: %s Vektoren (%s).", len(rows), self.embedder.name)
+
+    def _flush(self) -> None:
+        if self._directory is None or self._matrix is None:
+            return
+        with self._lock:
+            self._matrix.flush()  # type: ignore[attr-defined]
+            meta = {
+                "embedder": self.embedder.name,
+                "dimensions": self._dimensions,
+                "capacity": self._capacity,
+                "rows": {asset_id: [row, self._hashes[asset_id]] for asset_id, row in self._rows.items()},
+            }
+            self._dirty = False
+        path = self._directory / "index.json"
+        temp_path = path.with_suffix(".tmp")
+        try:
+            temp_path.write_text(json.dumps(meta), encoding="utf-8")
+            os.replace(temp_path, path)
+        except OSError as exc:  # pragma: no cover - Dateifehler
+            LOGGER.warning("Embedding-Index konnte nicht gespeichert werden (%s): %s", path, exc)
+
+
+def _normalized(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm <= 0.0:
+        return [0.0 for _ in vector]
+    return [value / norm for value in vector]
@@ -45,6 +45,7 @@ class AutoPCGControlPanel(tk.Tk):
         self.season_var = tk.StringVar(value="summer")
         self.max_assets_var = tk.StringVar(value="")
         self.batch_size_var = tk.StringVar(value="")
+        self.llm_workers_var = tk.StringVar(value="")
         self.world_size_var = tk.StringVar(value="10000")
         self.sector_size_var = tk.StringVar(value="1000")
         self.ollama_url_var = tk.StringVar(value="")
@@ -74,6 +75,7 @@ class AutoPCGControlPanel(tk.Tk):
         row = self._add_combo_field(form, row, "Saison", self.season_var, ["summer", "autumn", "winter", "spring"])
         row = self._add_text_field(form, row, "Max Assets", self.max_assets_var)
         row = self._add_text_field(form, row, "Batch Size", self.batch_size_var)
+        row = self._add_text_field(form, row, "LLM Worker", self.llm_workers_var)
         row = self._add_text_field(form, row, "World Size (m)", self.world_size_var)
         row = self._add_text_field(form, row, "Sector Size (m)", self.sector_size_var)
         row = self._add_text_field(form, row, "Ollama URL", self.ollama_url_var)
@@ -179,6 +181,7 @@ class AutoPCGControlPanel(tk.Tk):
             "max_assets": parse_int(self.max_assets_var.get()),
             "prefer_heuristics": self.heuristic_only_var.get(),
             "classification_batch_size": parse_int(self.batch_size_var.get()),
+            "classification_workers": parse_int(self.llm_workers_var.get()),
             "ollama_url": self.ollama_url_var.get() or None,
             "ollama_model": self.ollama_model_var.get() or None,
             "ollama_timeout": parse_float(self.ollama_timeout_var.get()),
@@ -121,3 +121,5 @@ class PCGGraph:
     root_nodes: List[PCGNode]
     generated_at: datetime
     description: Optional[str] = None
+    # Stufen, die wegen des Zeitbudgets auf Heuristiken ausgewichen sind.
+    degraded_stages: List[Dict[str, object]] = field(default_factory=list)
@@ -18,6 +18,12 @@ class HeightmapMetadata:
     max_elevation: float
     average_slope: float
     water_ratio: float
+    mean_elevation: float = 0.0
+    sea_level: float = 0.0
+    height_percentiles: Dict[str, float] = field(default_factory=dict)
+    slope_percentiles: Dict[str, float] = field(default_factory=dict)
+    slope_histogram: List[Tuple[Optional[float], float]] = field(default_factory=list)
+    curvature: Dict[str, float] = field(default_factory=dict)
 
     def to_dict(self) -> Dict[str, object]:
         payload = asdict(self)
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from auto_pcg.models.schemas import PCGFilterSpec, PCGGraph, PCGLayer, PCGNode, PCGPlan
 from auto_pcg.models.spatial import BoundingBox, Vector3
@@ -13,11 +13,23 @@ from auto_pcg.models.spatial import BoundingBox, Vector3
 class PCGBuilder:
     """Konvertiert PCG-Pläne in eine Graphstruktur, die später nach UE exportiert werden kann."""
 
-    def create_pcg_graph_from_plan(self, plan: PCGPlan) -> PCGGraph:
-        """Überführt alle Layer in PCG-Knoten."""
-        nodes = [self._layer_to_node(layer, index) for index, layer in enumerate(plan.layers)]
+    def create_pcg_graph_from_plan(
+        self,
+        plan: PCGPlan,
+        prebuilt_nodes: Optional[Dict[int, Tuple[PCGLayer, PCGNode]]] = None,
+    ) -> PCGGraph:
+        """Überführt alle Layer in PCG-Knoten.
+
+        ``prebuilt_nodes`` enthält bereits während des LLM-Streams gebaute Knoten;
+        sie werden übernommen, wenn der finale Layer unverändert ist.
+        """
+        nodes = [self._node_for(layer, index, prebuilt_nodes) for index, layer in enumerate(plan.layers)]
         return PCGGraph(root_nodes=nodes, generated_at=datetime.utcnow(), description=plan.description)
 
+    def build_node(self, layer: PCGLayer, index: int) -> PCGNode:
+        """Erzeugt den Knoten für einen einzelnen Layer, z. B. noch während des Streams."""
+        return self._layer_to_node(layer, index)
+
     def build_surface_layer(self, spec: PCGLayer) -> PCGNode:
         """Erzeugt einen SURFACE-Knoten inkl. Parameter."""
         config = {
@@ -44,6 +56,19 @@ class PCGBuilder:
 
     # Hilfsfunktionen -------------------------------------------------------------------------
 
+    def _node_for(
+        self,
+        layer: PCGLayer,
+        index: int,
+        prebuilt_nodes: Optional[Dict[int, Tuple[PCGLayer, PCGNode]]],
+    ) -> PCGNode:
+        """Nutzt einen vorab gebauten Knoten, falls dessen Layer dem finalen entspricht."""
+        if prebuilt_nodes and index in prebuilt_nodes:
+            streamed_layer, node = prebuilt_nodes[index]
+            if streamed_layer == layer:
+                return node
+        return self._layer_to_node(layer, index)
+
     def _layer_to_node(self, layer: PCGLayer, index: int) -> PCGNode:
         """Wandelt einen Layer in einen Knoten mit eindeutigen Namen um."""
         if layer.layer_type == "SURFACE":
@@ -71,6 +96,7 @@ class HierarchicalPCGBuilder(PCGBuilder):
         self,
         plan: PCGPlan,
         world_bounds: Optional[BoundingBox] = None,
+        prebuilt_nodes: Optional[Dict[int, Tuple[PCGLayer, PCGNode]]] = None,
     ) -> PCGGraph:
         """Teilt Layer in Hierarchieebenen und erstellt ein Baum-Layout."""
         macro_nodes: List[PCGNode] = []
@@ -78,7 +104,7 @@ class HierarchicalPCGBuilder(PCGBuilder):
         micro_nodes: List[PCGNode] = []
         for index, layer in enumerate(plan.layers):
             tier = self._classify_layer(layer)
-            node = self._layer_to_node(layer, index)
+            node = self._node_for(layer, index, prebuilt_nodes)
             node.config.setdefault("lod_tier", tier)
             if world_bounds:
                 node.config.setdefault("world_bounds", self._bounds_to_dict(world_bounds))
@@ -5,7 +5,7 @@ from __future__ import annotations
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Sequence
 
 from auto_pcg.models.schemas import PCGGraph, PCGNode
 
@@ -25,10 +25,29 @@ class UnrealPCGExporter:
         destination.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
         return destination
 
+    def export_manifest(
+        self,
+        entries: Sequence[Dict[str, object]],
+        file_prefix: str = "pcg_batch",
+        **extra: object,
+    ) -> Path:
+        """Speichert ein Manifest über mehrere exportierte Graphen (Batch-Läufe)."""
+        timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        destination = self.export_root / f"{file_prefix}_manifest_{timestamp}.json"
+        payload = {
+            "generated_at": datetime.utcnow().isoformat(),
+            "count": len(entries),
+            **extra,
+            "graphs": list(entries),
+        }
+        destination.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+        return destination
+
     def _graph_to_dict(self, graph: PCGGraph) -> Dict[str, object]:
         return {
             "description": graph.description,
             "generated_at": graph.generated_at.isoformat(),
+            "degraded_stages": graph.degraded_stages,
             "nodes": [self._node_to_dict(node) for node in graph.root_nodes],
         }
 
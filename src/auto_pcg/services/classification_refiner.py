@@ -0,0 +1,247 @@
+"""Hintergrund-Verfeinerung vorläufiger (heuristischer) Asset-Klassifikationen."""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from auto_pcg.ai.llm_manager import LLMManager
+from auto_pcg.models.schemas import AssetData, Classification
+
+LOGGER = logging.getLogger(__name__)
+
+# Markierung im semantischen Profil; eine LLM-Klassifikation ersetzt das Profil
+# vollständig und entfernt sie damit automatisch.
+PROVISIONAL_KEY = "provisional"
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9äöüß]+")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def is_provisional(asset: AssetData) -> bool:
+    """True, wenn die Klassifikation des Assets nur heuristisch geschätzt ist."""
+    return bool(asset.semantic_profile.get(PROVISIONAL_KEY))
+
+
+def mark_provisional(asset: AssetData) -> None:
+    asset.semantic_profile[PROVISIONAL_KEY] = True
+
+
+def prompt_keywords(user_prompt: str) -> FrozenSet[str]:
+    """Zerlegt einen Prompt in kleingeschriebene Schlagworte (mind. drei Zeichen)."""
+    return frozenset(token for token in _TOKEN_PATTERN.findall(user_prompt.lower()) if len(token) > 2)
+
+
+def asset_keywords(asset: AssetData) -> FrozenSet[str]:
+    """Günstige Signale eines Assets: Namensbestandteile, Typ und bekannte Tags."""
+    stem = _CAMEL_BOUNDARY.sub(" ", asset.asset_path.stem)
+    tokens = {token for token in _TOKEN_PATTERN.findall(stem.lower()) if len(token) > 2}
+    tokens.add(asset.asset_type.lower())
+    tokens.update(tag.lower() for tag in asset.semantic_tags)
+    return frozenset(tokens)
+
+
+def prompt_relevance(asset: AssetData, prompts: Sequence[FrozenSet[str]]) -> float:
+    """Schlagwort-Überlappung mit den Prompts; frühere Einträge zählen stärker."""
+    if not prompts:
+        return 0.0
+    keywords = asset_keywords(asset)
+    return sum(len(keywords & prompt) / (age + 1) for age, prompt in enumerate(prompts))
+
+
+def rank_for_prompt(assets: Iterable[AssetData], user_prompt: str, limit: int) -> List[AssetData]:
+    """Liefert die ``limit`` relevantesten Assets für einen Prompt.
+
+    Assets ohne Treffer werden in Eingabereihenfolge aufgefüllt – genau diese
+    landen sonst im Fallback-Kontext der Planerstellung.
+    """
+    keywords = prompt_keywords(user_prompt)
+    indexed = list(enumerate(assets))
+    if keywords:
+        indexed.sort(key=lambda item: (-prompt_relevance(item[1], [keywords]), item[0]))
+    return [asset for _, asset in indexed[: max(0, limit)]]
+
+
+class ClassificationRefiner:
+    """Arbeitet eine priorisierte Warteschlange vorläufiger Assets über das LLM ab.
+
+    Ein einzelner Worker-Thread holt jeweils ``chunk_size`` Assets – zuerst die,
+    die am besten zu den zuletzt gesehenen Prompts passen – und übergibt jede
+    erhaltene LLM-Klassifikation an ``on_refined``. Assets, für die das LLM keine
+    Antwort liefert, bleiben vorläufig und werden in dieser Sitzung nicht erneut
+    versucht. ``on_chunk_done`` eignet sich zum Persistieren des Zwischenstands.
+    """
+
+    def __init__(
+        self,
+        llm_manager: LLMManager,
+        on_refined: Callable[[AssetData, Classification], None],
+        *,
+        on_chunk_done: Optional[Callable[[], None]] = None,
+        chunk_size: int = 16,
+        recent_prompts: int = 4,
+    ) -> None:
+        self._llm_manager = llm_manager
+        self._on_refined = on_refined
+        self._on_chunk_done = on_chunk_done
+        self._chunk_size = max(1, chunk_size)
+        self._pending: Dict[str, AssetData] = {}
+        self._recent: Deque[FrozenSet[str]] = deque(maxlen=max(1, recent_prompts))
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._busy = False
+        self._in_flight = 0
+        self._refined = 0
+        self._unresolved = 0
+        self._chunks = 0
+        self._busy_seconds = 0.0
+
+    def submit(self, assets: Iterable[AssetData]) -> int:
+        """Reiht Assets zur Verfeinerung ein und startet bei Bedarf den Worker."""
+        added = 0
+        with self._condition:
+            for asset in assets:
+                if asset.asset_id not in self._pending:
+                    self._pending[asset.asset_id] = asset
+                    added += 1
+            if added:
+                self._stopping = False
+                self._ensure_worker()
+                self._condition.notify_all()
+        if added:
+            LOGGER.info("%s vorläufige Klassifikationen zur LLM-Verfeinerung eingereiht.", added)
+        return added
+
+    def prioritize(self, user_prompt: str) -> None:
+        """Zieht Assets, die zum Prompt passen, in der Warteschlange nach vorn."""
+        keywords = prompt_keywords(user_prompt)
+        if not keywords:
+            return
+        with self._condition:
+            if not self._recent or self._recent[0] != keywords:
+                self._recent.appendleft(keywords)
+
+    def discard(self, asset_ids: Iterable[str]) -> None:
+        """Entfernt Assets aus der Warteschlange, z. B. weil sie anderweitig klassifiziert werden."""
+        with self._condition:
+            for asset_id in asset_ids:
+                self._pending.pop(asset_id, None)
+            self._condition.notify_all()
+
+    def pending_count(self) -> int:
+        """Noch nicht verfeinerte Assets inklusive des laufenden Chunks."""
+        with self._condition:
+            return len(self._pending) + self._in_flight
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wartet, bis die Warteschlange abgearbeitet ist (False bei Timeout)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while (self._pending or self._busy) and self._thread is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Beendet den Worker nach dem laufenden Chunk; offene Assets bleiben vorläufig."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Kennzahlen für Logs und Diagnose."""
+        with self._condition:
+            return {
+                "pending": len(self._pending),
+                "busy": self._busy,
+                "refined": self._refined,
+                "unresolved": self._unresolved,
+                "chunks": self._chunks,
+                "busy_seconds": round(self._busy_seconds, 2),
+            }
+
+    # Intern ----------------------------------------------------------------------------
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="auto-pcg-refiner", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    self._thread = None
+                    self._condition.notify_all()
+                    return
+                chunk = self._take_chunk()
+                self._busy = True
+                self._in_flight = len(chunk)
+            started = time.perf_counter()
+            refined = 0
+            try:
+                refined = self._refine(chunk)
+            except Exception as exc:  # pragma: no cover - Worker darf nicht sterben
+                LOGGER.warning("Hintergrund-Klassifikation fehlgeschlagen: %s", exc)
+            elapsed = time.perf_counter() - started
+            if self._on_chunk_done:
+                try:
+                    self._on_chunk_done()
+                except Exception as exc:  # pragma: no cover - Dateifehler
+                    LOGGER.warning("Zwischenstand der Verfeinerung nicht gespeichert: %s", exc)
+            with self._condition:
+                self._busy = False
+                self._in_flight = 0
+                self._chunks += 1
+                self._refined += refined
+                self._unresolved += len(chunk) - refined
+                self._busy_seconds += elapsed
+                remaining = len(self._pending)
+                self._condition.notify_all()
+            LOGGER.info(
+                "Hintergrund-Klassifikation: %s/%s Assets verfeinert (%.1fs), %s ausstehend.",
+                refined,
+                len(chunk),
+                elapsed,
+                remaining,
+            )
+
+    def _take_chunk(self) -> List[AssetData]:
+        """Entnimmt die relevantesten Assets; ohne Prompt-Bezug gilt die Einreihungsfolge."""
+        if self._recent:
+            prompts = list(self._recent)
+            ranked = sorted(
+                enumerate(self._pending.values()),
+                key=lambda item: (-prompt_relevance(item[1], prompts), item[0]),
+            )
+            chunk = [asset for _, asset in ranked[: self._chunk_size]]
+        else:
+            chunk = list(self._pending.values())[: self._chunk_size]
+        for asset in chunk:
+            del self._pending[asset.asset_id]
+        return chunk
+
+    def _refine(self, chunk: Sequence[AssetData]) -> int:
+        classifications = self._llm_manager.send_classification_request(chunk, fallback=False)
+        by_path = {classification.asset_path.resolve(): classification for classification in classifications}
+        refined = 0
+        for asset in chunk:
+            classification = by_path.get(asset.asset_path.resolve())
+            if classification is None:
+                continue
+            self._on_refined(asset, classification)
+            refined += 1
+        return refined
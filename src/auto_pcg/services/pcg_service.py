@@ -2,20 +2,35 @@
 
 from __future__ import annotations
 
+import concurrent.futures
 import os
 import logging
+import re
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import hashlib
 
+from auto_pcg.ai.backend_pool import LLMBackend, parse_backend_spec, parse_task_route
+from auto_pcg.ai.embeddings import EmbeddingError, create_embedder
 from auto_pcg.ai.llm_manager import LLMManager
-from auto_pcg.ai.prompt_engine import PromptEngine
+from auto_pcg.ai.local_llm import LocalGGUFClient, LocalLLMError
+from auto_pcg.ai.prompt_engine import (
+    TASK_HEIGHTMAP_STRATEGY,
+    TASK_LAYER_PLAN,
+    TASK_MATERIAL_BLUEPRINT,
+    TASK_PCG_PLAN,
+    PromptEngine,
+)
+from auto_pcg.ai.time_budget import TimeBudget
 from auto_pcg.core.asset_analyzer import AssetAnalyzer
 from auto_pcg.core.asset_scanner import AssetScanner
 from auto_pcg.data import AssetDatabase
+from auto_pcg.data.plan_cache import PlanCache
 from auto_pcg.data.spatial_database import SpatialAssetDatabase
-from auto_pcg.models.schemas import AssetData, Classification, PCGGraph, PCGPlan
+from auto_pcg.models.schemas import AssetData, Classification, PCGGraph, PCGLayer, PCGNode, PCGPlan
 from auto_pcg.models.spatial import BoundingBox, Vector3
 from auto_pcg.models.terrain import (
     HeightmapAnalysisResult,
@@ -27,7 +42,13 @@ from auto_pcg.models.terrain import (
 from auto_pcg.pcg.graph_builder import HierarchicalPCGBuilder, PCGBuilder
 from auto_pcg.pcg.unreal_exporter import UnrealPCGExporter
 from auto_pcg.pcg.ue_integration import run_unreal_import
-from auto_pcg.terrain import HeightmapProcessor, LayerPainter, MaterialPlanner
+from auto_pcg.services.classification_refiner import (
+    ClassificationRefiner,
+    is_provisional,
+    mark_provisional,
+    rank_for_prompt,
+)
+from auto_pcg.terrain import HeightmapDecodeError, HeightmapProcessor, LayerPainter, MaterialPlanner
 
 
 LOGGER = logging.getLogger(__name__)
@@ -36,19 +57,41 @@ LOGGER = logging.getLogger(__name__)
 class AutoPCGService:
     """Öffnet eine einfache Python-API für das Auto-PCG-System."""
 
+    # Anteil des Zeitbudgets, der Terrain und Klassifikation für den PCG-Plan freihalten.
+    PLAN_BUDGET_SHARE = 0.35
+
     def __init__(
         self,
         project_root: Path,
         *,
         max_assets: Optional[int] = None,
         prefer_heuristics: bool = False,
+        speculative_classification: bool = False,
+        lazy_classification: bool = False,
+        lazy_candidates: Optional[int] = None,
         classification_batch_size: Optional[int] = None,
+        classification_workers: Optional[int] = None,
+        adaptive_batching: bool = True,
+        stream_responses: bool = False,
+        compact_prompts: bool = True,
+        embeddings: Optional[str] = None,
+        plan_cache: bool = True,
+        plan_cache_similarity: Optional[float] = None,
+        llm_backends: Optional[Sequence[str]] = None,
+        llm_routing: str = "least_outstanding",
+        task_models: Optional[Sequence[str]] = None,
         ollama_url: Optional[str] = None,
         ollama_model: Optional[str] = None,
         ollama_timeout: Optional[float] = None,
         use_local_model: bool = True,
+        local_processes: Optional[int] = None,
+        local_threads: Optional[int] = None,
         export_directory: Optional[Path] = None,
+        telemetry_path: Optional[Path] = None,
+        time_budget: Optional[float] = None,
         heightmap: Optional[Path] = None,
+        heightmap_size: Optional[Tuple[int, int]] = None,
+        sea_level: Optional[float] = None,
         performance_profile: str = "desktop",
         target_style: str = "realistic",
         auto_layer_paint: bool = True,
@@ -73,26 +116,45 @@ class AutoPCGService:
         self._has_scanned = False
         self._max_assets = max_assets
         self._prefer_heuristics = prefer_heuristics
+        self._lazy_classification = lazy_classification and not prefer_heuristics
         self._project_root = Path(project_root)
         self._export_directory = export_directory
         self._heightmap_path = Path(heightmap).resolve() if heightmap else None
+        self._heightmap_size = heightmap_size
         self._performance_profile = performance_profile
         self._target_style = target_style
         self._auto_layer_paint = auto_layer_paint
         self._season = season
         self._use_hierarchical_pcg = hierarchical_pcg
+        self._stream_responses = stream_responses
         self._ue_editor = Path(ue_editor) if ue_editor else None
         self._ue_map = ue_map
         self._ue_asset_folder = ue_asset_folder
         self._ue_spawn = ue_spawn
         self._ue_script = Path(__file__).resolve().parents[1] / "scripts" / "ue_pcg_import.py"
         self.cache_path = self._resolve_cache_path(project_root)
+        self.telemetry_path = self._resolve_telemetry_path(telemetry_path)
+        self._time_budget = time_budget if time_budget is not None else self._time_budget_from_env()
+        self._persist_lock = threading.Lock()
         if self.cache_path and self.cache_path.exists():
             try:
                 self.database.load_from_json(self.cache_path)
                 LOGGER.info("Geladene Asset-Datenbank: %s", self.cache_path)
             except Exception as exc:  # pragma: no cover - Dateifehler
                 LOGGER.warning("Konnte Asset-Cache nicht laden (%s): %s", self.cache_path, exc)
+        embedding_spec = embeddings or os.getenv("AUTO_PCG_EMBEDDINGS")
+        if embedding_spec:
+            self._enable_semantic_search(embedding_spec, ollama_url or "http://localhost:11434")
+        # Gleiche Absicht im gleichen Kontext → Plan ohne LLM-Aufruf; ähnliche Prompts nur auf Wunsch.
+        self.plan_cache: Optional[PlanCache] = (
+            PlanCache(
+                self.cache_path.with_name(f"{self.cache_path.stem}.plans.json") if self.cache_path else None,
+                similarity=plan_cache_similarity,
+                embedder=self.database.embedder,
+            )
+            if plan_cache
+            else None
+        )
         position_resolver = self._resolve_asset_position if self._use_spatial_database else None
         lod_resolver = self._estimate_asset_lod if self._use_spatial_database else None
         self.scanner = AssetScanner(
@@ -102,11 +164,29 @@ class AutoPCGService:
             lod_resolver=lod_resolver,
         )
         self.analyzer = AssetAnalyzer()
-        self.prompt_engine = PromptEngine()
+        self.prompt_engine = PromptEngine(compact=compact_prompts)
+        backend_specs = list(llm_backends or []) or self._backend_specs_from_env()
         self.llm_manager = LLMManager(
+            backends=[
+                parse_backend_spec(spec, default_model=ollama_model or "llama3", timeout=ollama_timeout or 10.0)
+                for spec in backend_specs
+            ]
+            or None,
+            routing=llm_routing,
+            task_backends=self._task_backends(
+                list(task_models or []) or self._task_specs_from_env(),
+                default_url=ollama_url or "http://localhost:11434",
+                default_model=ollama_model or "llama3",
+                timeout=ollama_timeout or 10.0,
+            ),
             prompt_engine=self.prompt_engine,
             local_model_path=self._resolve_local_model_path() if use_local_model else None,
+            local_processes=local_processes,
+            local_threads=local_threads,
             classification_batch_size=classification_batch_size,
+            classification_workers=classification_workers,
+            adaptive_batching=adaptive_batching,
+            stream_responses=stream_responses,
             base_url=ollama_url or "http://localhost:11434",
             model=ollama_model or "llama3",
             timeout=ollama_timeout or 10.0,
@@ -115,7 +195,18 @@ class AutoPCGService:
             self.graph_builder: PCGBuilder = HierarchicalPCGBuilder()
         else:
             self.graph_builder = PCGBuilder()
-        self.heightmap_processor = HeightmapProcessor()
+        # Im spekulativen Modus liefert der Scan sofort Heuristiken; das LLM
+        # verfeinert sie anschließend im Hintergrund.
+        self.refiner: Optional[ClassificationRefiner] = None
+        if speculative_classification and not prefer_heuristics:
+            self.refiner = ClassificationRefiner(
+                self.llm_manager,
+                self._apply_refined_classification,
+                on_chunk_done=self._persist_database,
+                chunk_size=max(1, classification_batch_size or 8) * self.llm_manager.classification_workers,
+            )
+        self._lazy_candidates = max(1, lazy_candidates or LLMManager.PCG_CONTEXT_LIMIT)
+        self.heightmap_processor = HeightmapProcessor(sea_level=sea_level)
         self.material_planner = MaterialPlanner(llm_manager=self.llm_manager)
         self.layer_painter = LayerPainter()
         self.heightmap_analysis: Optional[HeightmapAnalysisResult] = None
@@ -125,11 +216,15 @@ class AutoPCGService:
             UnrealPCGExporter(self._export_directory) if self._export_directory else None
         )
         self._uproject_path = self._find_uproject(self._project_root)
-        if not self.llm_manager._local_client:
+        if not self.llm_manager.uses_local_model:
             self.llm_manager.setup_ollama_connection()
 
-    def scan_and_classify_assets(self) -> List[AssetData]:
-        """Führt den Asset-Scan durch und klassifiziert jedes Asset."""
+    def scan_and_classify_assets(self, budget: Optional[TimeBudget] = None) -> List[AssetData]:
+        """Führt den Asset-Scan durch und klassifiziert jedes Asset.
+
+        Reicht ``budget`` nicht mehr für weitere LLM-Batches, werden die übrigen
+        Assets heuristisch klassifiziert.
+        """
         assets = self.scanner.scan_project_assets(limit=self._max_assets)
         if self._max_assets is not None:
             LOGGER.info(
@@ -138,17 +233,39 @@ class AutoPCGService:
                 len(assets),
             )
         assets_to_classify: List[AssetData] = []
+        provisional: List[AssetData] = []
         for asset in assets:
             cached = self.database.get_asset(asset.asset_id)
-            if cached and cached.semantic_tags:
+            # Vorläufige Einträge früherer spekulativer/Lazy-Läufe werden übernommen,
+            # sofern dieser Lauf sie später verfeinert oder mit Heuristiken auskommt.
+            if cached and cached.semantic_tags and not (
+                is_provisional(cached)
+                and not self._prefer_heuristics
+                and not self._lazy_classification
+                and self.refiner is None
+            ):
                 asset.semantic_tags = cached.semantic_tags
                 asset.semantic_profile = cached.semantic_profile
                 self.database.store_asset(asset)
+                if self.refiner is not None and is_provisional(asset):
+                    provisional.append(asset)
             else:
                 assets_to_classify.append(asset)
 
         if assets_to_classify:
-            if self._prefer_heuristics:
+            if self.refiner is not None or self._lazy_classification:
+                LOGGER.info(
+                    "%s Assets heuristisch vorbelegt; LLM-Klassifikation folgt %s.",
+                    len(assets_to_classify),
+                    "im Hintergrund" if self.refiner is not None else "bei Bedarf pro Prompt",
+                )
+                for asset in assets_to_classify:
+                    classification = self.analyzer.classify_asset_semantics(asset)
+                    self._apply_classification(asset, classification)
+                    mark_provisional(asset)
+                    self.database.store_asset(asset)
+                provisional.extend(assets_to_classify)
+            elif self._prefer_heuristics:
                 LOGGER.info(
                     "Überspringe LLM-Klassifikation und nutze heuristischen Schnellmodus (%s Assets).",
                     len(assets_to_classify),
@@ -158,7 +275,19 @@ class AutoPCGService:
                     self._apply_classification(asset, classification)
                     self.database.store_asset(asset)
             else:
-                classifications = self.llm_manager.send_classification_request(assets_to_classify)
+                assets_by_path = {asset.asset_path.resolve(): asset for asset in assets_to_classify}
+
+                def apply_streamed(classification: Classification) -> None:
+                    asset = assets_by_path.get(classification.asset_path.resolve())
+                    if asset:
+                        self._apply_classification(asset, classification)
+                        self.database.store_asset(asset)
+
+                classifications = self.llm_manager.send_classification_request(
+                    assets_to_classify,
+                    on_result=apply_streamed if self._stream_responses else None,
+                    budget=budget,
+                )
                 by_path = {
                     classification.asset_path.resolve(): classification
                     for classification in classifications
@@ -171,78 +300,350 @@ class AutoPCGService:
 
         self._persist_database()
         self._has_scanned = True
+        if self.refiner is not None and provisional:
+            self.refiner.submit(provisional)
         return assets
 
-    def generate_pcg_plan(self, user_prompt: str, asset_subset: Sequence[AssetData] | None = None) -> PCGPlan:
-        """Erstellt einen PCG-Plan für den angegebenen Textbefehl."""
+    def generate_pcg_plan(
+        self,
+        user_prompt: str,
+        asset_subset: Sequence[AssetData] | None = None,
+        on_layer: Optional[Callable[[int, PCGLayer], None]] = None,
+        budget: Optional[TimeBudget] = None,
+    ) -> PCGPlan:
+        """Erstellt einen PCG-Plan für den angegebenen Textbefehl.
+
+        Im spekulativen Modus nutzt der Plan die zu diesem Zeitpunkt beste
+        verfügbare Klassifikation jedes Assets. Mit ``budget`` bleibt für die
+        Planung ein fester Anteil reserviert; reicht der Rest nicht, greift der
+        lokale Fallback-Plan.
+        """
+        if self.refiner is not None:
+            self.refiner.prioritize(user_prompt)
         if not self._has_scanned:
             LOGGER.info("Starte automatischen Asset-Scan vor der Planerstellung.")
-            self.scan_and_classify_assets()
+            self.scan_and_classify_assets(self._stage_budget(budget))
+        if self._lazy_classification:
+            self._classify_for_prompts([user_prompt], asset_subset, self._stage_budget(budget))
         context_assets = list(asset_subset or self._choose_context_assets(user_prompt))
         if not context_assets:
             context_assets = list(self.database.all_assets())
-        return self.llm_manager.send_pcg_generation_request(
-            user_prompt,
-            context_assets,
-            world_size=self._world_size,
-            season=self._season,
-        )
-        return self.llm_manager.send_pcg_generation_request(
+        return self._request_pcg_plan(user_prompt, context_assets, on_layer=on_layer, budget=budget)
+
+    def build_graph_for_prompt(
+        self,
+        user_prompt: str,
+        *,
+        time_budget: Union[float, TimeBudget, None] = None,
+    ) -> PCGGraph:
+        """Kompletter Workflow von Text zu PCG-Graph.
+
+        ``time_budget`` (Sekunden oder ein laufendes :class:`TimeBudget`, sonst der
+        Service-Standard) begrenzt Scan, Klassifikation und Planung; ausgewichene
+        Stufen stehen in ``graph.degraded_stages``.
+        """
+        budget = self._budget(time_budget)
+        if not self._has_scanned:
+            LOGGER.info("Assets wurden noch nicht gescannt – führe Scan jetzt aus.")
+            self.scan_and_classify_assets(self._stage_budget(budget))
+        streamed_nodes: Dict[int, Tuple[PCGLayer, PCGNode]] = {}
+
+        def build_streamed_node(index: int, layer: PCGLayer) -> None:
+            streamed_nodes[index] = (layer, self.graph_builder.build_node(layer, index))
+
+        plan = self.generate_pcg_plan(
             user_prompt,
-            context_assets,
-            world_size=self._world_size,
-            season=self._season,
+            on_layer=build_streamed_node if self._stream_responses else None,
+            budget=budget,
         )
+        graph = self._graph_from_plan(plan, streamed_nodes)
+        graph.degraded_stages = budget.degraded
+        self._export_graph(graph)
+        return graph
+
+    def build_graphs_for_prompts(
+        self,
+        prompts: Sequence[str],
+        *,
+        time_budget: Union[float, TimeBudget, None] = None,
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, object]:
+        """Erstellt Graphen für viele Prompts (z. B. je Sektor oder Biom) in einem Lauf.
 
-    def build_graph_for_prompt(self, user_prompt: str) -> PCGGraph:
-        """Kompletter Workflow von Text zu PCG-Graph."""
+        Scan und Klassifikation laufen einmal für alle Prompts, die Kontextsuche
+        bettet alle Prompts gemeinsam ein und gleichlautende Prompts teilen sich
+        ihren Kontext. Die Plan-Anfragen laufen parallel (``max_workers``, Standard:
+        :meth:`LLMManager.plan_concurrency`). Jeder Graph wird einzeln exportiert,
+        dazu ein Manifest mit Prompt, Datei und ausgewichenen Stufen je Eintrag.
+        ``time_budget`` gilt für den ganzen Batch.
+        """
+        budget = self._budget(time_budget)
+        prompts = [prompt.strip() for prompt in prompts if prompt and prompt.strip()]
+        if not prompts:
+            return {"graphs": [], "entries": [], "manifest_path": None, "time_budget": budget.report()}
+        started = time.perf_counter()
+        if self.refiner is not None:
+            self.refiner.prioritize(" ".join(prompts))
         if not self._has_scanned:
-            LOGGER.info("Assets wurden noch nicht gescannt – führe Scan jetzt aus.")
-            self.scan_and_classify_assets()
-        plan = self.generate_pcg_plan(user_prompt)
-        world_bounds = self._world_bounds()
-        if isinstance(self.graph_builder, HierarchicalPCGBuilder):
-            graph = self.graph_builder.create_hierarchical_graph(plan, world_bounds=world_bounds)
-        else:
-            graph = self.graph_builder.create_pcg_graph_from_plan(plan)
-        export_path = None
+            LOGGER.info("Assets wurden noch nicht gescannt – führe Scan für den Batch aus.")
+            self.scan_and_classify_assets(self._stage_budget(budget))
+        unique_prompts = list(dict.fromkeys(self._normalize_prompt(prompt) for prompt in prompts))
+        if self._lazy_classification:
+            self._classify_for_prompts(unique_prompts, None, self._stage_budget(budget))
+        contexts = dict(zip(unique_prompts, self._choose_context_assets_many(unique_prompts)))
+        shared_degraded = budget.degraded
+        workers = min(len(prompts), self.llm_manager.plan_concurrency(max_workers))
+        LOGGER.info(
+            "Batch: %s Prompts (%s verschieden), %s parallele Plan-Anfragen.",
+            len(prompts),
+            len(unique_prompts),
+            workers,
+        )
+
+        def plan_for(prompt: str) -> Tuple[PCGPlan, TimeBudget, float]:
+            prompt_budget = budget.fork()
+            plan_started = time.perf_counter()
+            plan = self._request_pcg_plan(prompt, contexts[self._normalize_prompt(prompt)], budget=prompt_budget)
+            return plan, prompt_budget, time.perf_counter() - plan_started
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="auto-pcg-plan",
+        ) as executor:
+            planned = list(executor.map(plan_for, prompts))
+
+        graphs: List[PCGGraph] = []
+        entries: List[Dict[str, object]] = []
+        for index, (prompt, (plan, prompt_budget, seconds)) in enumerate(zip(prompts, planned), start=1):
+            graph = self._graph_from_plan(plan)
+            graph.degraded_stages = shared_degraded + prompt_budget.degraded
+            for entry in prompt_budget.degraded:
+                budget.degrade(str(entry["stage"]), str(entry["reason"]))
+            file_prefix = f"pcg_graph_{index:03d}_{self._prompt_slug(prompt)}"
+            export_path = self._export_graph(graph, file_prefix=file_prefix)
+            graphs.append(graph)
+            entries.append(
+                {
+                    "index": index,
+                    "prompt": prompt,
+                    "file": export_path.name if export_path else None,
+                    "description": graph.description,
+                    "layers": len(plan.layers),
+                    "plan_seconds": round(seconds, 3),
+                    "degraded_stages": graph.degraded_stages,
+                }
+            )
+        report = budget.report()
+        manifest_path = None
         if self._exporter:
-            export_path = self._exporter.export(graph)
-            LOGGER.info("PCG-Graph nach %s exportiert.", export_path)
-        if self._ue_editor and export_path:
-            self._trigger_unreal_import(export_path)
-        return graph
+            manifest_path = self._exporter.export_manifest(
+                entries,
+                elapsed=round(time.perf_counter() - started, 3),
+                time_budget=report,
+            )
+            LOGGER.info("Batch-Manifest (%s Graphen) nach %s exportiert.", len(entries), manifest_path)
+        LOGGER.info("Batch mit %s Prompts abgeschlossen (%.1fs).", len(prompts), time.perf_counter() - started)
+        return {
+            "graphs": graphs,
+            "entries": entries,
+            "manifest_path": manifest_path,
+            "telemetry_path": self._dump_llm_telemetry(),
+            "time_budget": report,
+        }
 
-    def run_full_pipeline(self, user_prompt: str) -> Dict[str, object]:
-        """Führt Heightmap-, Asset-, PCG- und Material-Schritte automatisch aus."""
-        analysis = self._ensure_heightmap_analysis()
-        assets = self.scan_and_classify_assets()
-        graph = self.build_graph_for_prompt(user_prompt)
-        blueprint = self._ensure_material_blueprint()
-        layer_plan = self._ensure_layer_plan()
+    def run_full_pipeline(self, user_prompt: str, *, time_budget: Optional[float] = None) -> Dict[str, object]:
+        """Führt Heightmap-, Asset-, PCG- und Material-Schritte automatisch aus.
+
+        ``time_budget`` (Sekunden, sonst der Service-Standard) gilt für den ganzen
+        Lauf: Jede LLM-Anfrage erhält das Restbudget als Timeout, Stufen ohne
+        ausreichendes Budget nutzen Heuristiken bzw. die lokalen Terrain-Entwürfe.
+        ``time_budget`` im Ergebnis nennt die ausgewichenen Stufen.
+        """
+        budget = self._budget(time_budget)
+        if self.refiner is not None:
+            self.refiner.prioritize(user_prompt)
+        analysis, blueprint, layer_plan = self._ensure_terrain_plans(self._stage_budget(budget))
+        assets = self.scan_and_classify_assets(self._stage_budget(budget))
+        graph = self.build_graph_for_prompt(user_prompt, time_budget=budget)
+        report = budget.report()
+        if report["degraded"]:
+            LOGGER.warning(
+                "Zeitbudget %.1fs: %s Stufe(n) auf Heuristiken ausgewichen (%s).",
+                budget.seconds,
+                len(report["degraded"]),
+                ", ".join(str(entry["stage"]) for entry in report["degraded"]),  # type: ignore[union-attr]
+            )
         return {
             "graph": graph,
             "assets": assets,
             "heightmap_analysis": analysis,
             "material_blueprint": blueprint,
             "layer_plan": layer_plan,
+            "telemetry_path": self._dump_llm_telemetry(),
+            "time_budget": report,
         }
 
+    def wait_for_refinement(self, timeout: Optional[float] = None) -> bool:
+        """Wartet auf die Hintergrund-Klassifikation (True, wenn nichts mehr aussteht)."""
+        if self.refiner is None:
+            return True
+        return self.refiner.wait(timeout)
+
+    def close(self, refine_timeout: float = 0.0) -> None:
+        """Gibt der Hintergrund-Klassifikation bis zu ``refine_timeout`` Sekunden und beendet sie.
+
+        Noch nicht verfeinerte Assets bleiben im Cache als vorläufig markiert und
+        werden beim nächsten spekulativen Lauf erneut eingereiht.
+        """
+        if self.refiner is None:
+            return
+        if refine_timeout > 0:
+            self.refiner.wait(refine_timeout)
+        self.refiner.stop()
+        self._persist_database()
+        LOGGER.info("Hintergrund-Klassifikation beendet: %s", self.refiner.snapshot())
+
     # Private Hilfen ----------------------------------------------------------------------------
 
-    def _ensure_heightmap_analysis(self) -> Optional[HeightmapAnalysisResult]:
+    def _budget(self, time_budget: Union[float, TimeBudget, None]) -> TimeBudget:
+        """Übernimmt ein laufendes Budget oder startet eines (Standard: Service-Einstellung)."""
+        if isinstance(time_budget, TimeBudget):
+            return time_budget
+        return TimeBudget(time_budget if time_budget is not None else self._time_budget)
+
+    def _stage_budget(self, budget: Optional[TimeBudget]) -> Optional[TimeBudget]:
+        """Budget für Stufen vor der Planung: endet so früh, dass der PCG-Plan noch Zeit hat."""
+        if budget is None or not budget.limited:
+            return budget
+        reserve = max(self.llm_manager.expected_latency(TASK_PCG_PLAN), budget.seconds * self.PLAN_BUDGET_SHARE)
+        return budget.reserve(reserve)
+
+    def _ensure_terrain_plans(
+        self,
+        budget: Optional[TimeBudget] = None,
+    ) -> Tuple[Optional[HeightmapAnalysisResult], Optional[MaterialBlueprint], Optional[LandscapeLayerPlan]]:
+        """Plant Heightmap, Material und Layer-Paint mit parallelen LLM-Anfragen.
+
+        Material- und Layer-Prompts brauchen nur die heuristische Analyse und ihre
+        lokal berechneten Entwürfe, daher laufen alle drei Anfragen gleichzeitig.
+        Zusammengeführt wird in der bisherigen Reihenfolge; ändert die Strategie
+        die Analyse, werden die (günstigen) Entwürfe vorher neu abgeleitet. Was bis
+        zum Ende von ``budget`` nicht beantwortet ist, bleibt beim lokalen Entwurf.
+        """
         if self.heightmap_analysis or not self._heightmap_path:
-            return self.heightmap_analysis
+            return (
+                self._ensure_heightmap_analysis(budget),
+                self._ensure_material_blueprint(budget),
+                self._ensure_layer_plan(budget),
+            )
+        analysis = self._process_heightmap()
+        if not analysis:
+            return None, None, None
+        blueprint = self._draft_material_blueprint(analysis)
+        layer_plan = self._draft_layer_plan(analysis) if self._auto_layer_paint else None
+        tasks = [TASK_HEIGHTMAP_STRATEGY, TASK_MATERIAL_BLUEPRINT]
+        if layer_plan is not None:
+            tasks.append(TASK_LAYER_PLAN)
+        # Nur anfragen, was bis zum Stufenende fertig werden kann: ein lokales Modell
+        # arbeitet die Aufrufe nacheinander ab und ist nicht abbrechbar.
+        affordable = set(self.llm_manager.tasks_within_budget(tasks, budget))
+        started = time.perf_counter()
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=LLMManager.TERRAIN_REQUESTS,
+            thread_name_prefix="auto-pcg-terrain",
+        )
+        try:
+            strategy_future = (
+                executor.submit(self.llm_manager.plan_heightmap_strategy, analysis, budget)
+                if TASK_HEIGHTMAP_STRATEGY in affordable
+                else None
+            )
+            material_future = (
+                executor.submit(self.llm_manager.plan_material_blueprint, analysis, blueprint, budget)
+                if TASK_MATERIAL_BLUEPRINT in affordable
+                else None
+            )
+            layer_future = (
+                executor.submit(self.llm_manager.plan_layer_paint, layer_plan, budget)
+                if TASK_LAYER_PLAN in affordable
+                else None
+            )
+            strategy = self._terrain_result(strategy_future, TASK_HEIGHTMAP_STRATEGY, budget)
+            material_suggestion = self._terrain_result(material_future, TASK_MATERIAL_BLUEPRINT, budget)
+            layer_suggestion = self._terrain_result(layer_future, TASK_LAYER_PLAN, budget)
+        finally:
+            # Noch wartende Aufrufe verwerfen; laufende prüfen das Budget erneut, bevor sie generieren.
+            executor.shutdown(wait=False, cancel_futures=True)
+        LOGGER.info("Terrain-LLM-Anfragen parallel abgeschlossen (%.1fs).", time.perf_counter() - started)
+        if strategy:
+            self._apply_heightmap_strategy(analysis, strategy)
+            blueprint = self._draft_material_blueprint(analysis)
+            layer_plan = self._draft_layer_plan(analysis) if self._auto_layer_paint else None
+        self.heightmap_analysis = analysis
+        if material_suggestion:
+            blueprint = self._merge_material_blueprint(blueprint, material_suggestion)
+        self.material_blueprint = blueprint
+        if layer_plan is not None and layer_suggestion:
+            layer_plan = self._merge_layer_plan(layer_plan, layer_suggestion)
+        self.layer_plan = layer_plan
+        return analysis, blueprint, layer_plan
+
+    @staticmethod
+    def _terrain_result(
+        future: Optional[concurrent.futures.Future],
+        task: str,
+        budget: Optional[TimeBudget] = None,
+    ) -> Optional[Dict[str, object]]:
+        """Wartet höchstens bis zum Budgetende; danach (oder ohne Anfrage) gilt der lokale Entwurf."""
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=budget.remaining() if budget is not None else None)
+        except concurrent.futures.TimeoutError:
+            LOGGER.warning("%s: Zeitbudget abgelaufen – nutze den lokalen Entwurf.", task)
+            if budget is not None:
+                budget.degrade(task, "Zeitbudget vor der LLM-Antwort abgelaufen")
+            return None
+        except Exception as exc:  # pragma: no cover - Worker-Fehler
+            LOGGER.warning("%s über das LLM fehlgeschlagen: %s", task, exc)
+            return None
+
+    def _process_heightmap(self) -> Optional[HeightmapAnalysisResult]:
+        """Heuristische Heightmap-Analyse ohne LLM."""
         try:
-            analysis = self.heightmap_processor.process_heightmap(
+            return self.heightmap_processor.process_heightmap(
                 self._heightmap_path,
                 target_style=self._target_style,
                 performance_profile=self._performance_profile,
+                dimensions=self._heightmap_size,
             )
-        except FileNotFoundError as exc:
+        except (FileNotFoundError, HeightmapDecodeError) as exc:
             LOGGER.warning("Heightmap konnte nicht verarbeitet werden: %s", exc)
             return None
-        strategy = self.llm_manager.plan_heightmap_strategy(analysis)
+
+    def _draft_material_blueprint(self, analysis: HeightmapAnalysisResult) -> MaterialBlueprint:
+        return self.material_planner.build_blueprint(
+            analysis,
+            target_style=self._target_style,
+            performance_profile=self._performance_profile,
+            season=self._season,
+            enable_transitions=True,
+        )
+
+    def _draft_layer_plan(self, analysis: HeightmapAnalysisResult) -> LandscapeLayerPlan:
+        return self.layer_painter.build_layer_plan(
+            analysis,
+            output_dir=self._export_directory,
+            season=self._season,
+        )
+
+    def _ensure_heightmap_analysis(self, budget: Optional[TimeBudget] = None) -> Optional[HeightmapAnalysisResult]:
+        if self.heightmap_analysis or not self._heightmap_path:
+            return self.heightmap_analysis
+        analysis = self._process_heightmap()
+        if not analysis:
+            return None
+        strategy = self.llm_manager.plan_heightmap_strategy(analysis, budget)
         if strategy:
             self._apply_heightmap_strategy(analysis, strategy)
         self.heightmap_analysis = analysis
@@ -284,20 +685,14 @@ class AutoPCGService:
                     if isinstance(values, (list, tuple)) and len(values) == 2:
                         biome.slope_range = (float(values[0]), float(values[1]))
 
-    def _ensure_material_blueprint(self) -> Optional[MaterialBlueprint]:
+    def _ensure_material_blueprint(self, budget: Optional[TimeBudget] = None) -> Optional[MaterialBlueprint]:
         if self.material_blueprint:
             return self.material_blueprint
-        analysis = self._ensure_heightmap_analysis()
+        analysis = self._ensure_heightmap_analysis(budget)
         if not analysis:
             return None
-        blueprint = self.material_planner.build_blueprint(
-            analysis,
-            target_style=self._target_style,
-            performance_profile=self._performance_profile,
-            season=self._season,
-            enable_transitions=True,
-        )
-        suggestion = self.llm_manager.plan_material_blueprint(analysis, blueprint)
+        blueprint = self._draft_material_blueprint(analysis)
+        suggestion = self.llm_manager.plan_material_blueprint(analysis, blueprint, budget)
         if suggestion:
             blueprint = self._merge_material_blueprint(blueprint, suggestion)
         self.material_blueprint = blueprint
@@ -351,18 +746,14 @@ class AutoPCGService:
             },
         )
 
-    def _ensure_layer_plan(self) -> Optional[LandscapeLayerPlan]:
+    def _ensure_layer_plan(self, budget: Optional[TimeBudget] = None) -> Optional[LandscapeLayerPlan]:
         if self.layer_plan or not self._auto_layer_paint:
             return self.layer_plan
-        analysis = self._ensure_heightmap_analysis()
+        analysis = self._ensure_heightmap_analysis(budget)
         if not analysis:
             return None
-        plan = self.layer_painter.build_layer_plan(
-            analysis,
-            output_dir=self._export_directory,
-            season=self._season,
-        )
-        suggestion = self.llm_manager.plan_layer_paint(plan)
+        plan = self._draft_layer_plan(analysis)
+        suggestion = self.llm_manager.plan_layer_paint(plan, budget)
         if suggestion:
             plan = self._merge_layer_plan(plan, suggestion)
         self.layer_plan = plan
@@ -422,18 +813,128 @@ class AutoPCGService:
         return assets
 
     def _choose_context_assets(self, user_prompt: str) -> Iterable[AssetData]:
-        """Nutzt einfache Keyword-Extraktion, um relevante Assets zu finden."""
-        keywords = [
-            token.lower()
-            for token in user_prompt.replace(",", " ").split()
-            if len(token) > 3
-        ]
-        if not keywords:
-            return self.database.all_assets()
-        recommendations = self.database.get_asset_recommendations(keywords, limit=5)
-        if recommendations:
-            return recommendations
-        return self.database.all_assets()
+        """Wählt per BM25 (und ggf. Embeddings) die relevantesten Assets."""
+        return self._choose_context_assets_many([user_prompt])[0]
+
+    def _choose_context_assets_many(self, prompts: Sequence[str]) -> List[List[AssetData]]:
+        """Kontextauswahl für mehrere Prompts; Embeddings entstehen in einem Aufruf.
+
+        Beide Ranglisten werden per Reciprocal Rank Fusion zusammengeführt, damit
+        sowohl exakte Namenstreffer als auch nur sinnverwandte Assets vorn landen.
+        """
+        limit = LLMManager.PCG_CONTEXT_LIMIT
+        keyword_rankings = [self.database.search_assets(prompt, limit=limit) for prompt in prompts]
+        if self.database.semantic_search_enabled:
+            semantic_rankings = self.database.semantic_search_many(prompts, limit=limit)
+        else:
+            semantic_rankings = [[] for _ in prompts]
+        contexts: List[List[AssetData]] = []
+        for matches, semantic in zip(keyword_rankings, semantic_rankings):
+            if semantic:
+                ranked: Dict[str, float] = {}
+                by_id: Dict[str, AssetData] = {}
+                for ranking in (matches, semantic):
+                    for rank, asset in enumerate(ranking):
+                        ranked[asset.asset_id] = ranked.get(asset.asset_id, 0.0) + 1.0 / (60 + rank)
+                        by_id[asset.asset_id] = asset
+                matches = [by_id[asset_id] for asset_id in sorted(ranked, key=ranked.__getitem__, reverse=True)[:limit]]
+            contexts.append(matches or list(self.database.all_assets()))
+        return contexts
+
+    def _request_pcg_plan(
+        self,
+        user_prompt: str,
+        context_assets: Sequence[AssetData],
+        *,
+        on_layer: Optional[Callable[[int, PCGLayer], None]] = None,
+        budget: Optional[TimeBudget] = None,
+    ) -> PCGPlan:
+        """PCG-Plan aus dem Plan-Cache oder per LLM (vollständige LLM-Pläne werden gespeichert).
+
+        Bei einem Treffer werden die Asset-Namen des gespeicherten Plans gegen die
+        aktuellen Pfade der Kontext-Assets aufgelöst.
+        """
+        if self.plan_cache is None:
+            return self.llm_manager.send_pcg_generation_request(
+                user_prompt,
+                context_assets,
+                world_size=self._world_size,
+                season=self._season,
+                on_layer=on_layer,
+                budget=budget,
+            )
+        plan_context = list(context_assets)[: LLMManager.PCG_CONTEXT_LIMIT]
+        cached = self.plan_cache.lookup(user_prompt, plan_context, world_size=self._world_size, season=self._season)
+        if cached is not None:
+            plan = self.llm_manager.plan_from_cache(cached, plan_context)
+            if plan is not None:
+                LOGGER.info("PCG-Plan für '%s' aus dem Cache übernommen.", user_prompt)
+                return plan
+
+        def remember(plan_data: Dict[str, object]) -> None:
+            self.plan_cache.store(  # type: ignore[union-attr]
+                user_prompt,
+                plan_context,
+                plan_data,
+                world_size=self._world_size,
+                season=self._season,
+            )
+
+        return self.llm_manager.send_pcg_generation_request(
+            user_prompt,
+            context_assets,
+            world_size=self._world_size,
+            season=self._season,
+            on_layer=on_layer,
+            budget=budget,
+            on_plan=remember,
+        )
+
+    def _graph_from_plan(
+        self,
+        plan: PCGPlan,
+        prebuilt_nodes: Optional[Dict[int, Tuple[PCGLayer, PCGNode]]] = None,
+    ) -> PCGGraph:
+        """Baut den Graphen (hierarchisch, falls konfiguriert) aus einem Plan."""
+        if isinstance(self.graph_builder, HierarchicalPCGBuilder):
+            return self.graph_builder.create_hierarchical_graph(
+                plan,
+                world_bounds=self._world_bounds(),
+                prebuilt_nodes=prebuilt_nodes,
+            )
+        return self.graph_builder.create_pcg_graph_from_plan(plan, prebuilt_nodes=prebuilt_nodes)
+
+    def _export_graph(self, graph: PCGGraph, file_prefix: str = "pcg_graph") -> Optional[Path]:
+        """Exportiert den Graphen (falls ein Zielordner gesetzt ist) und stößt den UE-Import an."""
+        if not self._exporter:
+            return None
+        export_path = self._exporter.export(graph, file_prefix=file_prefix)
+        LOGGER.info("PCG-Graph nach %s exportiert.", export_path)
+        if self._ue_editor:
+            self._trigger_unreal_import(export_path)
+        return export_path
+
+    @staticmethod
+    def _normalize_prompt(prompt: str) -> str:
+        """Vergleichsform eines Prompts: Kleinschreibung, einfache Leerzeichen."""
+        return " ".join(prompt.lower().split())
+
+    @staticmethod
+    def _prompt_slug(prompt: str, max_length: int = 40) -> str:
+        """Dateinamentauglicher Kurzname eines Prompts."""
+        slug = re.sub(r"[^a-z0-9]+", "-", prompt.lower()).strip("-")[:max_length].rstrip("-")
+        return slug or "prompt"
+
+    def _enable_semantic_search(self, spec: str, ollama_url: str) -> None:
+        """Aktiviert den Embedding-Index; Vektoren liegen neben dem Asset-Cache."""
+        try:
+            embedder = create_embedder(spec, default_url=ollama_url)
+        except (EmbeddingError, ValueError) as exc:
+            LOGGER.warning("Semantische Suche deaktiviert (%s): %s", spec, exc)
+            return
+        storage_dir = self.cache_path.with_name(f"{self.cache_path.stem}.vectors") if self.cache_path else None
+        self.database.enable_semantic_search(embedder, storage_dir)
+        LOGGER.info("Semantische Asset-Suche aktiv (%s).", embedder.name)
 
     def _resolve_asset_position(self, asset_path: Path) -> Optional[Vector3]:
         try:
@@ -457,7 +958,64 @@ class AutoPCGService:
             return 1
         return 2
 
-    def _resolve_local_model_path(self) -> Optional[Path]:
+    @staticmethod
+    def _time_budget_from_env() -> Optional[float]:
+        """Liest das Standard-Zeitbudget (Sekunden) aus ``AUTO_PCG_TIME_BUDGET``."""
+        env_value = os.getenv("AUTO_PCG_TIME_BUDGET", "").strip()
+        if not env_value:
+            return None
+        try:
+            return float(env_value)
+        except ValueError:
+            LOGGER.warning("Zeitbudget %s konnte nicht interpretiert werden – ohne Budget.", env_value)
+            return None
+
+    @staticmethod
+    def _backend_specs_from_env() -> List[str]:
+        """Liest zusätzliche LLM-Backends aus ``AUTO_PCG_LLM_BACKENDS`` (durch ``;`` getrennt)."""
+        env_value = os.getenv("AUTO_PCG_LLM_BACKENDS", "")
+        return [spec.strip() for spec in env_value.split(";") if spec.strip()]
+
+    @staticmethod
+    def _task_specs_from_env() -> List[str]:
+        """Liest das Modell-Routing je Aufgabe aus ``AUTO_PCG_TASK_MODELS`` (durch ``;`` getrennt)."""
+        env_value = os.getenv("AUTO_PCG_TASK_MODELS", "")
+        return [spec.strip() for spec in env_value.split(";") if spec.strip()]
+
+    @staticmethod
+    def _task_backends(
+        specs: Sequence[str],
+        *,
+        default_url: str,
+        default_model: str,
+        timeout: float,
+    ) -> Dict[str, List[LLMBackend]]:
+        """Baut aus ``AUFGABE=BACKEND``-Einträgen die Backends je Aufgabe (mehrfach = Pool)."""
+        routed: Dict[str, List[LLMBackend]] = {}
+        for spec in specs:
+            task, backend = parse_task_route(spec, default_url=default_url, default_model=default_model, timeout=timeout)
+            routed.setdefault(task, []).append(backend)
+        return routed
+
+    @classmethod
+    def warmup_local_model(cls) -> bool:
+        """Lädt das lokale GGUF-Modell vorab in die prozessweite Modell-Registry.
+
+        Spätere Service-Instanzen (z. B. jeder GUI-Lauf) übernehmen die bereits
+        geladene Instanz, statt das Modell erneut von der Platte zu lesen.
+        """
+        model_path = cls._resolve_local_model_path()
+        if not model_path:
+            return False
+        try:
+            LocalGGUFClient(model_path)
+        except LocalLLMError as exc:
+            LOGGER.warning("Warmup des GGUF-Modells fehlgeschlagen: %s", exc)
+            return False
+        return True
+
+    @staticmethod
+    def _resolve_local_model_path() -> Optional[Path]:
         """Sucht nach einem GGUF-Modell im Projekt oder über Umgebungsvariable."""
         env_path = os.getenv("AUTO_PCG_GGUF_MODEL")
         if env_path:
@@ -490,13 +1048,38 @@ class AutoPCGService:
             project_root = Path.cwd()
         return project_root / ".auto_pcg_assets.json"
 
+    def _resolve_telemetry_path(self, override: Optional[Path]) -> Optional[Path]:
+        """Ziel der LLM-Telemetrie: Parameter, ``AUTO_PCG_TELEMETRY`` oder neben dem Asset-Cache."""
+        if override:
+            return Path(override).expanduser()
+        env_value = os.getenv("AUTO_PCG_TELEMETRY")
+        if env_value:
+            return Path(env_value).expanduser()
+        if self.cache_path:
+            return self.cache_path.with_name(f"{self.cache_path.stem}.telemetry.json")
+        return None
+
+    def _dump_llm_telemetry(self) -> Optional[Path]:
+        """Schreibt die LLM-Messwerte des Laufs als JSON (Fehler werden nur geloggt)."""
+        if not self.telemetry_path:
+            return None
+        try:
+            path = self.llm_manager.dump_llm_telemetry(self.telemetry_path)
+        except Exception as exc:  # pragma: no cover - Dateifehler
+            LOGGER.warning("Konnte LLM-Telemetrie nicht schreiben (%s): %s", self.telemetry_path, exc)
+            return None
+        LOGGER.info("LLM-Telemetrie gespeichert: %s", path)
+        return path
+
     def _persist_database(self) -> None:
         """Schreibt die aktuelle Datenbank auf die Platte."""
         if not self.cache_path:
             return
         try:
             self.cache_path.parent.mkdir(parents=True, exist_ok=True)
-            self.database.save_to_file(self.cache_path)
+            # Der Hintergrund-Worker speichert ebenfalls – nie zwei Schreibvorgänge zugleich.
+            with self._persist_lock:
+                self.database.save_to_file(self.cache_path)
         except Exception as exc:  # pragma: no cover - Dateifehler
             LOGGER.warning("Konnte Asset-Cache nicht speichern (%s): %s", self.cache_path, exc)
 
@@ -505,6 +1088,52 @@ class AutoPCGService:
         asset.semantic_tags = classification.tags
         asset.semantic_profile = classification.to_profile()
 
+    def _classify_for_prompts(
+        self,
+        prompts: Sequence[str],
+        candidates: Sequence[AssetData] | None = None,
+        budget: Optional[TimeBudget] = None,
+    ) -> int:
+        """Klassifiziert nur die vorläufigen Assets, die für diese Prompts infrage kommen.
+
+        Die Vorauswahl nutzt günstige Signale (Name, Typ, heuristische Tags); die
+        Kandidaten aller Prompts gehen gemeinsam in eine Klassifikationsanfrage.
+        Das Ergebnis landet im Cache, sodass sich der Katalog über viele Prompts füllt.
+        """
+        pool = list(candidates) if candidates else list(self.database.all_assets())
+        ranked_by_id: Dict[str, AssetData] = {}
+        for prompt in prompts:
+            for asset in rank_for_prompt(pool, prompt, self._lazy_candidates):
+                ranked_by_id.setdefault(asset.asset_id, asset)
+        ranked = list(ranked_by_id.values())
+        pending = [asset for asset in ranked if is_provisional(asset)]
+        if not pending:
+            return 0
+        if self.refiner is not None:
+            self.refiner.discard(asset.asset_id for asset in pending)
+        LOGGER.info(
+            "Lazy-Klassifikation: %s von %s Kandidaten für %s Prompt(s) noch vorläufig (Katalog: %s Assets).",
+            len(pending),
+            len(ranked),
+            len(prompts),
+            len(pool),
+        )
+        classifications = self.llm_manager.send_classification_request(pending, fallback=False, budget=budget)
+        by_path = {classification.asset_path.resolve(): classification for classification in classifications}
+        classified = 0
+        for asset in pending:
+            classification = by_path.get(asset.asset_path.resolve())
+            if classification:
+                self._apply_refined_classification(asset, classification)
+                classified += 1
+        self._persist_database()
+        return classified
+
+    def _apply_refined_classification(self, asset: AssetData, classification: Classification) -> None:
+        """Ersetzt eine vorläufige Klassifikation durch das LLM-Ergebnis."""
+        self._apply_classification(asset, classification)
+        self.database.store_asset(asset)
+
     def _find_uproject(self, start_path: Path) -> Optional[Path]:
         """Sucht im angegebenen Pfad und darüber nach einer .uproject Datei."""
         current = start_path
@@ -1,7 +1,22 @@
 """Terrain-bezogene Pipelines für Heightmap-Analyse und Layer-Painting."""
 
+from .heightmap_io import HeightmapData, HeightmapDecodeError, HeightmapSource, open_heightmap, read_heightmap
 from .heightmap_processor import HeightmapProcessor
+from .terrain_stats import TerrainStatistics, TerrainStatsAccumulator, compute_statistics
 from .material_planner import MaterialPlanner, TextureLibrary
 from .layer_painter import LayerPainter
 
-__all__ = ["HeightmapProcessor", "MaterialPlanner", "TextureLibrary", "LayerPainter"]
+__all__ = [
+    "HeightmapData",
+    "HeightmapDecodeError",
+    "HeightmapSource",
+    "HeightmapProcessor",
+    "open_heightmap",
+    "read_heightmap",
+    "TerrainStatistics",
+    "TerrainStatsAccumulator",
+    "compute_statistics",
+    "MaterialPlanner",
+    "TextureLibrary",
+    "LayerPainter",
+]
@@ -0,0 +1,536 @@
+"""Dekodiert Heightmaps (PNG, R16/RAW) in 16-Bit-Höhenwerte.
+
+PNG-Bilddaten werden blockweise aus den IDAT-Chunks entpackt und in Stapeln
+von Zeilen entfiltert, sodass nie die komprimierte und die entpackte Datei
+gleichzeitig im Speicher liegen. RAW-Dateien (``.r16``/``.raw``) sind wie beim
+UE-Landscape-Import unkomprimierte Little-Endian-Werte ohne Header; ihre
+Abmessungen werden angegeben oder bei quadratischen Karten aus der Dateigröße
+abgeleitet.
+
+Für Karten, die nicht als Ganzes in den Speicher sollen, liefert
+:func:`open_heightmap` eine :class:`HeightmapSource`: RAW-Dateien werden direkt
+per Memory-Map gelesen, PNGs zeilenweise in eine temporäre 16-Bit-Datei
+dekodiert. Gelesen wird immer nur ein Fenster (Kachel samt Halo).
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import sys
+import tempfile
+import zlib
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Sequence, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+LOGGER = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+RAW_SUFFIXES = (".r16", ".raw")
+MAX_HEIGHT = 65535
+# Blockgröße beim Lesen der IDAT-Daten und Obergrenze je Entpack-Schritt.
+READ_BLOCK_BYTES = 1 << 20
+# Arbeitsspeicher für das gemeinsame Entfiltern mehrerer Zeilen (Average/Paeth).
+WAVEFRONT_BYTES = 48 << 20
+
+# PNG-Farbtyp -> Kanäle; Höhen stehen im ersten Kanal (Grau bzw. Rot).
+_PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+
+class HeightmapDecodeError(ValueError):
+    """Die Datei ist beschädigt oder nutzt ein nicht unterstütztes Format."""
+
+
+@dataclass(slots=True)
+class HeightmapData:
+    """Dekodierte Höhen (0–65535), zeilenweise von oben nach unten.
+
+    ``heights`` ist mit NumPy ein ``uint16``-Array der Form ``(height, width)``,
+    sonst ein flaches ``array('H')``. 8-Bit-Quellen werden auf 16 Bit gestreckt.
+    """
+
+    width: int
+    height: int
+    heights: object
+    bit_depth: int = 16
+    source_format: str = "raw"
+
+    @property
+    def pixel_count(self) -> int:
+        return self.width * self.height
+
+    def flat(self) -> Sequence[int]:
+        """Alle Höhen als flache Sequenz (ohne Kopie, wo möglich)."""
+        if np is not None and isinstance(self.heights, np.ndarray):
+            return self.heights.reshape(-1)
+        return self.heights  # type: ignore[return-value]
+
+
+@dataclass(slots=True)
+class HeightmapSource:
+    """Höhen in einer Datei (zeilenweise, ohne Header), fensterweise per Memory-Map lesbar.
+
+    ``dtype`` ist ``"<u2"`` für 16-Bit-Werte oder ``"u1"`` für 8-Bit-RAW-Dateien;
+    :meth:`read_window` liefert in beiden Fällen ``uint16`` im Bereich 0–65535.
+    """
+
+    path: Path
+    width: int
+    height: int
+    dtype: str = "<u2"
+    bit_depth: int = 16
+    source_format: str = "raw"
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.height, self.width)
+
+    def read_window(self, rows: slice, cols: slice) -> "np.ndarray":
+        """Kopie des Fensters ``[rows, cols]``; gemappt werden nur die betroffenen Zeilen."""
+        start, stop = rows.indices(self.height)[:2]
+        item_size = np.dtype(self.dtype).itemsize
+        strip = np.memmap(
+            self.path,
+            dtype=self.dtype,
+            mode="r",
+            offset=start * self.width * item_size,
+            shape=(max(0, stop - start), self.width),
+        )
+        window = np.array(strip[:, cols], dtype=np.uint16)
+        del strip  # Mapping sofort freigeben, nicht erst beim nächsten GC-Lauf.
+        if item_size == 1:
+            window *= 257
+        return window
+
+
+@contextmanager
+def open_heightmap(
+    path: Path,
+    *,
+    dimensions: Optional[Tuple[int, int]] = None,
+    scratch_dir: Optional[Path] = None,
+) -> Iterator[HeightmapSource]:
+    """Öffnet eine Heightmap für die kachelweise Verarbeitung (benötigt NumPy).
+
+    RAW-Dateien werden ohne Kopie gemappt. PNGs werden Scanline für Scanline in
+    eine temporäre Datei in ``scratch_dir`` (Standard: System-Temp) dekodiert,
+    die beim Verlassen des Kontexts wieder gelöscht wird.
+    """
+    if np is None:
+        raise RuntimeError("NumPy wird für die kachelweise Heightmap-Verarbeitung benötigt")
+    path = Path(path)
+    if path.suffix.lower() != ".png":
+        width, height = dimensions if dimensions else (None, None)
+        width, height, sample_bytes = _raw_layout(path.stat().st_size, width, height)
+        dtype = "u1" if sample_bytes == 1 else "<u2"
+        yield HeightmapSource(path, width, height, dtype=dtype, bit_depth=8 * sample_bytes)
+        return
+    handle, temp_name = tempfile.mkstemp(prefix=f"{path.stem}_", suffix=".u16", dir=scratch_dir)
+    temp_path = Path(temp_name)
+    try:
+        with os.fdopen(handle, "wb") as sink:
+            data = _decode_png(path, sink)
+        yield HeightmapSource(temp_path, data.width, data.height, bit_depth=data.bit_depth, source_format="png")
+    finally:
+        try:
+            temp_path.unlink()
+        except OSError as exc:  # pragma: no cover - z. B. noch gemappt unter Windows
+            LOGGER.warning("Temporäre Heightmap %s konnte nicht gelöscht werden: %s", temp_path, exc)
+
+
+def read_heightmap(path: Path, *, dimensions: Optional[Tuple[int, int]] = None) -> HeightmapData:
+    """Dekodiert ``path`` anhand der Endung; alles außer PNG gilt als RAW."""
+    path = Path(path)
+    if path.suffix.lower() == ".png":
+        return decode_png(path)
+    width, height = dimensions if dimensions else (None, None)
+    return decode_raw(path, width, height)
+
+
+def decode_png(path: Path) -> HeightmapData:
+    """Dekodiert ein nicht interlacetes 8- oder 16-Bit-PNG (Graustufen, optional mit Farbe/Alpha)."""
+    return _decode_png(path)
+
+
+def decode_raw(
+    path: Path,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    *,
+    byteorder: str = "little",
+) -> HeightmapData:
+    """Liest headerlose 16-Bit- (``.r16``) oder 8-Bit-Höhen.
+
+    Ohne Abmessungen wird eine quadratische 16-Bit-Karte angenommen; ist nur eine
+    Seite bekannt, ergibt sich die andere aus der Dateigröße.
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    width, height, sample_bytes = _raw_layout(size, width, height)
+    count = width * height
+    if np is not None:
+        dtype = np.uint8 if sample_bytes == 1 else np.dtype("<u2" if byteorder == "little" else ">u2")
+        heights = np.fromfile(path, dtype=dtype, count=count).reshape(height, width).astype(np.uint16)
+        if sample_bytes == 1:
+            heights *= 257
+    else:
+        with path.open("rb") as stream:
+            if sample_bytes == 1:
+                heights = array("H", (value * 257 for value in stream.read(count)))
+            else:
+                heights = array("H")
+                heights.fromfile(stream, count)
+                if sys.byteorder != byteorder:
+                    heights.byteswap()
+    return HeightmapData(width, height, heights, bit_depth=8 * sample_bytes, source_format="raw")
+
+
+# Intern ----------------------------------------------------------------------------
+
+
+def _decode_png(path: Path, sink: Optional[BinaryIO] = None) -> HeightmapData:
+    """Dekodiert ein PNG; mit ``sink`` landen die Zeilen als ``<u2`` dort statt im Speicher."""
+    with Path(path).open("rb") as stream:
+        if stream.read(8) != PNG_SIGNATURE:
+            raise HeightmapDecodeError(f"{path}: keine PNG-Signatur")
+        decoder: Optional[_ScanlineDecoder] = None
+        for chunk_type, length in _png_chunks(stream):
+            if chunk_type == b"IHDR":
+                decoder = _ScanlineDecoder.from_header(stream.read(length), sink)
+            elif chunk_type == b"IDAT":
+                if decoder is None:
+                    raise HeightmapDecodeError(f"{path}: IDAT vor IHDR")
+                remaining = length
+                while remaining > 0:
+                    block = stream.read(min(READ_BLOCK_BYTES, remaining))
+                    if not block:
+                        raise HeightmapDecodeError(f"{path}: IDAT-Chunk abgeschnitten")
+                    decoder.feed(block)
+                    remaining -= len(block)
+            elif chunk_type == b"IEND":
+                break
+            else:
+                stream.seek(length, 1)
+            stream.seek(4, 1)  # CRC; die Nutzdaten prüft zlib über Adler-32.
+        if decoder is None:
+            raise HeightmapDecodeError(f"{path}: IHDR fehlt")
+        return decoder.finish()
+
+
+def _raw_layout(size: int, width: Optional[int], height: Optional[int]) -> Tuple[int, int, int]:
+    """Breite, Höhe und Bytes je Wert einer RAW-Datei der Größe ``size``."""
+    if width is None and height is None:
+        edge = math.isqrt(size // 2)
+        if edge == 0 or edge * edge * 2 != size:
+            raise HeightmapDecodeError(
+                f"RAW-Heightmap mit {size} Bytes ist nicht quadratisch – bitte Breite und Höhe angeben"
+            )
+        return edge, edge, 2
+    if width is None or height is None:
+        known = width or height
+        if not known or known <= 0 or size % (known * 2):
+            raise HeightmapDecodeError(f"RAW-Heightmap mit {size} Bytes passt nicht zur Kantenlänge {known}")
+        other = size // (known * 2)
+        return (known, other, 2) if width else (other, known, 2)
+    if width <= 0 or height <= 0:
+        raise HeightmapDecodeError(f"Ungültige Abmessungen {width}x{height}")
+    pixels = width * height
+    if size == pixels * 2:
+        return width, height, 2
+    if size == pixels:
+        return width, height, 1
+    raise HeightmapDecodeError(
+        f"RAW-Heightmap mit {size} Bytes passt nicht zu {width}x{height} (erwartet {pixels * 2} Bytes)"
+    )
+
+
+def _png_chunks(stream: BinaryIO) -> Iterator[Tuple[bytes, int]]:
+    """Liefert ``(Typ, Länge)``; der Aufrufer liest bzw. überspringt Daten und CRC."""
+    while True:
+        header = stream.read(8)
+        if not header:
+            return
+        if len(header) < 8:
+            raise HeightmapDecodeError("PNG-Chunk-Header abgeschnitten")
+        length = int.from_bytes(header[:4], "big")
+        yield header[4:8], length
+
+
+class _ScanlineDecoder:
+    """Entpackt IDAT-Daten schrittweise und entfiltert jede vollständige Scanline."""
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        bit_depth: int,
+        channels: int,
+        sink: Optional[BinaryIO] = None,
+    ) -> None:
+        self.width = width
+        self.height = height
+        self.bit_depth = bit_depth
+        self.channels = channels
+        self.pixel_bytes = channels * bit_depth // 8
+        self.stride = width * self.pixel_bytes
+        self._inflater = zlib.decompressobj()
+        self._pending = bytearray()
+        self._previous = bytearray(self.stride)
+        self._row = 0
+        # Zeilen je Stapel; ohne NumPy wird jede Zeile sofort einzeln entfiltert.
+        self._batch_rows = _wavefront_rows(width, self.pixel_bytes, height) if np is not None else 1
+        self._sink = sink
+        self._heights: object = None
+        if sink is not None:
+            if np is None:
+                raise RuntimeError("NumPy wird für das Dekodieren in eine Datei benötigt")
+        elif np is not None:
+            self._heights = np.empty((height, width), dtype=np.uint16)
+        else:
+            self._heights = array("H")
+
+    @classmethod
+    def from_header(cls, ihdr: bytes, sink: Optional[BinaryIO] = None) -> "_ScanlineDecoder":
+        if len(ihdr) != 13:
+            raise HeightmapDecodeError("ungültige IHDR-Länge")
+        width, height = int.from_bytes(ihdr[0:4], "big"), int.from_bytes(ihdr[4:8], "big")
+        bit_depth, color_type, compression, filter_method, interlace = ihdr[8:13]
+        if width == 0 or height == 0:
+            raise HeightmapDecodeError("PNG ohne Pixel")
+        if color_type not in _PNG_CHANNELS:
+            raise HeightmapDecodeError(f"PNG-Farbtyp {color_type} (Palette) wird nicht unterstützt")
+        if bit_depth not in (8, 16):
+            raise HeightmapDecodeError(f"PNG-Bittiefe {bit_depth} wird nicht unterstützt (nur 8/16)")
+        if compression != 0 or filter_method != 0:
+            raise HeightmapDecodeError("unbekannte PNG-Kompression bzw. Filtermethode")
+        if interlace != 0:
+            raise HeightmapDecodeError("interlacete PNGs (Adam7) werden nicht unterstützt")
+        return cls(width, height, bit_depth, _PNG_CHANNELS[color_type], sink)
+
+    def feed(self, data: bytes) -> None:
+        """Entpackt ``data`` in Häppchen begrenzter Größe und verarbeitet fertige Zeilen."""
+        limit = max(READ_BLOCK_BYTES, self.stride + 1)
+        while data:
+            try:
+                self._pending += self._inflater.decompress(data, limit)
+            except zlib.error as exc:
+                raise HeightmapDecodeError(f"PNG-Daten beschädigt: {exc}") from exc
+            self._drain()
+            data = self._inflater.unconsumed_tail
+
+    def finish(self) -> HeightmapData:
+        try:
+            self._pending += self._inflater.flush()
+        except zlib.error as exc:
+            raise HeightmapDecodeError(f"PNG-Daten beschädigt: {exc}") from exc
+        self._drain(final=True)
+        if self._row < self.height:
+            raise HeightmapDecodeError(f"PNG enthält nur {self._row} von {self.height} Zeilen")
+        return HeightmapData(
+            self.width,
+            self.height,
+            self._heights,
+            bit_depth=self.bit_depth,
+            source_format="png",
+        )
+
+    def _drain(self, final: bool = False) -> None:
+        line_bytes = self.stride + 1
+        pending = self._pending
+        offset = 0
+        while self._row < self.height:
+            available = min((len(pending) - offset) // line_bytes, self.height - self._row)
+            count = min(available, self._batch_rows)
+            if count == 0 or (count < self._batch_rows and not final and available < self.height - self._row):
+                break
+            if count > 1:
+                self._drain_batch(pending, offset, count)
+                offset += count * line_bytes
+                continue
+            filter_type = pending[offset]
+            line = pending[offset + 1 : offset + line_bytes]
+            offset += line_bytes
+            _unfilter(filter_type, line, self._previous, self.pixel_bytes)
+            self._store(line)
+            self._previous = line
+            self._row += 1
+        if offset:
+            del pending[:offset]
+
+    def _drain_batch(self, pending: bytearray, offset: int, count: int) -> None:
+        """Entfiltert ``count`` Zeilen; Average/Paeth gemeinsam als Wellenfront."""
+        block = np.frombuffer(pending, dtype=np.uint8, count=count * (self.stride + 1), offset=offset)
+        block = block.reshape(count, self.stride + 1)
+        filter_types = block[:, 0]
+        if int(filter_types.max()) > 4:
+            raise HeightmapDecodeError(f"unbekannter PNG-Zeilenfilter {int(filter_types.max())}")
+        if np.isin(filter_types, (3, 4)).any():
+            rows = _unfilter_wavefront(filter_types, block[:, 1:], self._previous, self.pixel_bytes)
+            for row in rows:
+                self._store(row)
+                self._row += 1
+            self._previous = bytearray(rows[-1].tobytes())
+            return
+        for filter_type, raw in zip(filter_types.tolist(), block[:, 1:]):
+            line = bytearray(raw.tobytes())
+            _unfilter(filter_type, line, self._previous, self.pixel_bytes)
+            self._store(line)
+            self._previous = line
+            self._row += 1
+
+    def _store(self, line: bytearray) -> None:
+        """Übernimmt den ersten Kanal jeder Zeile als 16-Bit-Höhe."""
+        if np is not None:
+            values = np.frombuffer(line, dtype=">u2" if self.bit_depth == 16 else np.uint8)[:: self.channels]
+            if self._sink is not None:
+                row = values.astype("<u2")
+                if self.bit_depth == 8:
+                    row *= 257
+                self._sink.write(row.tobytes())
+                return
+            target = self._heights[self._row]
+            target[:] = values
+            if self.bit_depth == 8:
+                target *= 257
+            return
+        if self.bit_depth == 16:
+            values = array("H", bytes(line))
+            if sys.byteorder == "little":
+                values.byteswap()
+            self._heights.extend(values[:: self.channels])
+        else:
+            self._heights.extend(value * 257 for value in line[:: self.channels])
+
+
+def _wavefront_rows(width: int, pixel_bytes: int, height: int) -> int:
+    """Zeilen je Stapel, sodass die Wellenfront-Puffer etwa ``WAVEFRONT_BYTES`` belegen."""
+    rows = 16
+    while rows < height and (width + rows * 2) * (rows * 2) * pixel_bytes * 3 <= WAVEFRONT_BYTES:
+        rows *= 2
+    return min(rows, height)
+
+
+def _unfilter_wavefront(
+    filter_types: "np.ndarray",
+    raw: "np.ndarray",
+    previous: bytearray,
+    pixel_bytes: int,
+) -> "np.ndarray":
+    """Entfiltert mehrere Zeilen gleichzeitig, auch mit Average- und Paeth-Filter.
+
+    Ein Byte hängt von seinem linken Nachbarn sowie den Bytes darüber und links
+    darüber ab. Pixel ``i`` der Stapelzeile ``r`` ist daher im Schritt ``i + r``
+    berechenbar; alle Zeilen rücken gemeinsam eine Diagonale weiter. In der
+    geschert abgelegten Matrix (Schritt, Zeile, Byte) ist jede Diagonale ein
+    zusammenhängender Ausschnitt, die Python-Schleife läuft also über
+    ``Breite + Zeilen`` Schritte statt über alle Bytes.
+    """
+    rows, stride = raw.shape
+    width = stride // pixel_bytes
+    steps = width + rows
+    # Zeile 0 ist die zuletzt rekonstruierte Zeile; Schritt t liegt bei Index t + 2,
+    # die Indizes davor (Pixel links vom Rand) bleiben 0.
+    done = np.zeros((steps + 2, rows + 1, pixel_bytes), dtype=np.int16)
+    done[2 : width + 2, 0] = np.frombuffer(bytes(previous), dtype=np.uint8).reshape(width, pixel_bytes)
+    filtered = np.zeros((steps, rows + 1, pixel_bytes), dtype=np.uint8)
+    for row in range(1, rows + 1):
+        filtered[row : row + width, row] = raw[row - 1].reshape(width, pixel_bytes)
+    kinds = np.zeros((rows + 1, 1), dtype=np.intp)
+    kinds[1:, 0] = filter_types
+    # Meist nutzt der ganze Stapel denselben Filter (libpng wählt für Heightmaps fast immer Paeth).
+    uniform = int(filter_types[0]) if bool((filter_types == filter_types[0]).all()) else None
+    for step in range(1, steps):
+        first, last = max(1, step - width + 1), min(rows, step)
+        left = done[step + 1, first : last + 1]
+        above = done[step + 1, first - 1 : last]
+        upper_left = done[step, first - 1 : last]
+        if uniform == 4:
+            predictor = _paeth(left, above, upper_left)
+        elif uniform == 3:
+            predictor = (left + above) >> 1
+        else:
+            predictor = np.choose(
+                kinds[first : last + 1],
+                (0, left, above, (left + above) >> 1, _paeth(left, above, upper_left)),
+            )
+        target = done[step + 2, first : last + 1]
+        np.add(filtered[step, first : last + 1], predictor, out=target)
+        np.bitwise_and(target, 0xFF, out=target)
+    result = np.empty((rows, stride), dtype=np.uint8)
+    for row in range(1, rows + 1):
+        result[row - 1] = done[row + 2 : row + 2 + width, row].reshape(-1)
+    return result
+
+
+def _paeth(left: "np.ndarray", above: "np.ndarray", upper_left: "np.ndarray") -> "np.ndarray":
+    """Paeth-Prädiktor (PNG-Spezifikation 9.4) elementweise für ``int16``-Arrays."""
+    from_left = left - upper_left
+    from_above = above - upper_left
+    distance_left = np.abs(from_above)
+    distance_above = np.abs(from_left)
+    distance_upper_left = np.abs(from_left + from_above)
+    return np.where(
+        (distance_left <= distance_above) & (distance_left <= distance_upper_left),
+        left,
+        np.where(distance_above <= distance_upper_left, above, upper_left),
+    )
+
+
+def _unfilter(filter_type: int, line: bytearray, previous: bytearray, pixel_bytes: int) -> None:
+    """Macht den PNG-Zeilenfilter in ``line`` rückgängig (in place).
+
+    Sub und Up lassen sich mit NumPy vektorisieren; Average und Paeth hängen vom
+    gerade rekonstruierten linken Nachbarn ab und laufen hier Byte für Byte. Mit
+    NumPy entfiltert der Decoder solche Zeilen stapelweise per
+    :func:`_unfilter_wavefront`.
+    """
+    if filter_type == 0:
+        return
+    length = len(line)
+    if filter_type == 1:
+        if np is not None:
+            lanes = np.frombuffer(line, dtype=np.uint8).reshape(-1, pixel_bytes)
+            np.cumsum(lanes, axis=0, dtype=np.uint8, out=lanes)
+            return
+        for index in range(pixel_bytes, length):
+            line[index] = (line[index] + line[index - pixel_bytes]) & 0xFF
+    elif filter_type == 2:
+        if np is not None:
+            current = np.frombuffer(line, dtype=np.uint8)
+            np.add(current, np.frombuffer(previous, dtype=np.uint8), out=current)
+            return
+        for index in range(length):
+            line[index] = (line[index] + previous[index]) & 0xFF
+    elif filter_type == 3:
+        for index in range(pixel_bytes):
+            line[index] = (line[index] + (previous[index] >> 1)) & 0xFF
+        for index in range(pixel_bytes, length):
+            line[index] = (line[index] + ((line[index - pixel_bytes] + previous[index]) >> 1)) & 0xFF
+    elif filter_type == 4:
+        for index in range(pixel_bytes):
+            line[index] = (line[index] + previous[index]) & 0xFF
+        for index in range(pixel_bytes, length):
+            left = line[index - pixel_bytes]
+            above = previous[index]
+            upper_left = previous[index - pixel_bytes]
+            distance_left = abs(above - upper_left)
+            distance_above = abs(left - upper_left)
+            distance_upper_left = abs(left + above - 2 * upper_left)
+            if distance_left <= distance_above and distance_left <= distance_upper_left:
+                predictor = left
+            elif distance_above <= distance_upper_left:
+                predictor = above
+            else:
+                predictor = upper_left
+            line[index] = (line[index] + predictor) & 0xFF
+    else:
+        raise HeightmapDecodeError(f"unbekannter PNG-Zeilenfilter {filter_type}")
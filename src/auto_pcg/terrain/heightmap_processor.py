@@ -2,14 +2,14 @@
 
 from __future__ import annotations
 
-import io
 import logging
-import math
-import os
-import struct
-from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence, Tuple
+from typing import Dict, List, Optional, Tuple, Union
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
 
 from auto_pcg.models.terrain import (
     BiomeLayer,
@@ -18,16 +18,16 @@ from auto_pcg.models.terrain import (
     LandscapeSettings,
 )
 
-LOGGER = logging.getLogger(__name__)
-
+from .heightmap_io import HeightmapData, HeightmapSource, open_heightmap, read_heightmap
+from .terrain_stats import (
+    DEFAULT_HEIGHT_RANGE_METERS,
+    DEFAULT_PIXEL_SPACING_METERS,
+    DEFAULT_TILE_SIZE,
+    compute_statistics,
+    sampled_statistics,
+)
 
-@dataclass(slots=True)
-class _HeightStatistics:
-    min_value: float
-    max_value: float
-    avg_value: float
-    slope_index: float
-    water_ratio: float
+LOGGER = logging.getLogger(__name__)
 
 
 class HeightmapProcessor:
@@ -41,7 +41,26 @@ class HeightmapProcessor:
         "high_end_pc": 127,
     }
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        sea_level: Optional[float] = None,
+        height_range: float = DEFAULT_HEIGHT_RANGE_METERS,
+        pixel_spacing: float = DEFAULT_PIXEL_SPACING_METERS,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        scratch_dir: Optional[Path] = None,
+    ) -> None:
+        """``sea_level`` ist normiert (0–1, ohne Angabe 10 % über dem Minimum);
+        ``height_range`` (m über den vollen 16-Bit-Bereich) und ``pixel_spacing``
+        (m je Pixel) bestimmen, wie steil ein Höhenunterschied ist.
+
+        Mit NumPy wird kachelweise (``tile_size``² Pixel) aus der Datei gelesen;
+        PNGs werden dafür in eine temporäre Datei in ``scratch_dir`` dekodiert."""
+        self.sea_level = sea_level
+        self.height_range = height_range
+        self.pixel_spacing = pixel_spacing
+        self.tile_size = max(16, int(tile_size))
+        self.scratch_dir = Path(scratch_dir) if scratch_dir else None
         self._cached_stats: dict[Path, HeightmapAnalysisResult] = {}
 
     def process_heightmap(
@@ -50,22 +69,34 @@ class HeightmapProcessor:
         *,
         target_style: str = "realistic",
         performance_profile: str = "desktop",
+        dimensions: Optional[Tuple[int, int]] = None,
     ) -> HeightmapAnalysisResult:
+        """Dekodiert und analysiert eine Heightmap.
+
+        PNGs liefern ihre Abmessungen selbst; für ``.r16``/``.raw`` gelten
+        ``dimensions`` (Breite, Höhe), ohne Angabe wird eine quadratische
+        16-Bit-Karte angenommen. Nicht lesbare Dateien lösen
+        :class:`HeightmapDecodeError` aus.
+        """
         heightmap_path = Path(heightmap_path)
         if not heightmap_path.exists():
             raise FileNotFoundError(f"Heightmap nicht gefunden: {heightmap_path}")
         cached = self._cached_stats.get(heightmap_path)
         if cached:
             return cached
-        metadata = self._build_metadata(heightmap_path)
+        metadata = self._build_metadata(heightmap_path, dimensions)
         biome_layers = self._derive_biome_layers(metadata, target_style)
         settings = self._calculate_landscape_settings(metadata, performance_profile)
         scale = self._calculate_scale(metadata)
         notes = [
             f"Heightmap {metadata.width}x{metadata.height} @ Δh {metadata.min_elevation:.1f}-{metadata.max_elevation:.1f}",
             f"Durchschnittliche Steigung: {metadata.average_slope:.2f}",
-            f"Wasseranteil (niedrige Höhen): {metadata.water_ratio:.2%}",
+            f"Wasseranteil (bis Meereshöhe {metadata.sea_level:.3f}): {metadata.water_ratio:.2%}",
         ]
+        if metadata.curvature:
+            notes.append(
+                "Krümmung: {convex_ratio:.1%} konvex, {concave_ratio:.1%} konkav".format(**metadata.curvature)
+            )
         result = HeightmapAnalysisResult(
             metadata=metadata,
             biomes=biome_layers,
@@ -78,83 +109,72 @@ class HeightmapProcessor:
 
     # ---------------------------------------------------------------------------------- intern
 
-    def _build_metadata(self, path: Path) -> HeightmapMetadata:
-        width, height = self._extract_dimensions(path)
-        stats = self._sample_height_values(path, width, height)
+    def _build_metadata(self, path: Path, dimensions: Optional[Tuple[int, int]] = None) -> HeightmapMetadata:
+        if np is not None:
+            with open_heightmap(path, dimensions=dimensions, scratch_dir=self.scratch_dir) as source:
+                self._log_source(path, source)
+                stats = compute_statistics(
+                    source,
+                    height_range=self.height_range,
+                    pixel_spacing=self.pixel_spacing,
+                    sea_level=self.sea_level,
+                    tile_size=self.tile_size,
+                )
+                width, height = source.width, source.height
+        else:
+            data = read_heightmap(path, dimensions=dimensions)
+            self._log_source(path, data)
+            stats = sampled_statistics(
+                data.flat(),
+                data.width,
+                height_range=self.height_range,
+                pixel_spacing=self.pixel_spacing,
+                sea_level=self.sea_level,
+            )
+            width, height = data.width, data.height
         return HeightmapMetadata(
             path=path,
             width=width,
             height=height,
-            min_elevation=stats.min_value,
-            max_elevation=stats.max_value,
-            average_slope=stats.slope_index,
+            min_elevation=stats.min_elevation,
+            max_elevation=stats.max_elevation,
+            average_slope=stats.average_slope,
             water_ratio=stats.water_ratio,
+            mean_elevation=stats.mean_elevation,
+            sea_level=stats.sea_level,
+            height_percentiles=stats.height_percentiles,
+            slope_percentiles=stats.slope_percentiles,
+            slope_histogram=stats.slope_histogram,
+            curvature=stats.curvature,
         )
 
-    def _extract_dimensions(self, path: Path) -> Tuple[int, int]:
-        if path.suffix.lower() == ".png":
-            try:
-                with path.open("rb") as stream:
-                    signature = stream.read(8)
-                    if signature != b"\x89PNG\r\n\x1a\n":
-                        raise ValueError("keine PNG-Signatur")
-                    ihdr = stream.read(25)
-                    if len(ihdr) < 25:
-                        raise ValueError("ungültige IHDR-Länge")
-                    width, height = struct.unpack(">II", ihdr[8:16])
-                    return max(8, width), max(8, height)
-            except Exception as exc:  # pragma: no cover - Headerfehler selten
-                LOGGER.warning("Konnte PNG-Dimensionen nicht lesen: %s", exc)
-        # Fallback: Quadratwurzel aus Dateigröße (16-bit Heightmap angenommen)
-        file_size = path.stat().st_size
-        pixels = max(1, file_size // 2)
-        edge = int(math.sqrt(pixels))
-        return max(8, edge), max(8, edge)
-
-    def _sample_height_values(
-        self,
-        path: Path,
-        width: int,
-        height: int,
-        sample_count: int = 4096,
-    ) -> _HeightStatistics:
-        data = path.read_bytes()
-        if len(data) < 2:
-            return _HeightStatistics(0.0, 0.0, 0.0, 0.0, 0.0)
-        step = max(2, len(data) // sample_count)
-        samples: List[int] = []
-        for index in range(0, len(data) - 1, step):
-            value = int.from_bytes(data[index : index + 2], "little")
-            samples.append(value)
-        if not samples:
-            samples.append(0)
-        min_value = min(samples) / 65535.0
-        max_value = max(samples) / 65535.0
-        avg_value = sum(samples) / (len(samples) * 65535.0)
-        slope_index = self._estimate_slope(samples)
-        water_threshold = min_value + (max_value - min_value) * 0.1
-        water_ratio = sum(1 for value in samples if value / 65535.0 <= water_threshold) / len(samples)
-        return _HeightStatistics(min_value, max_value, avg_value, slope_index, water_ratio)
-
     @staticmethod
-    def _estimate_slope(samples: Sequence[int]) -> float:
-        if len(samples) < 2:
-            return 0.0
-        diffs = [
-            abs(samples[index] - samples[index - 1]) / 65535.0
-            for index in range(1, len(samples))
-        ]
-        return sum(diffs) / len(diffs)
+    def _log_source(path: Path, source: Union[HeightmapData, HeightmapSource]) -> None:
+        LOGGER.info(
+            "Heightmap %s geöffnet: %sx%s, %s Bit (%s).",
+            path.name,
+            source.width,
+            source.height,
+            source.bit_depth,
+            source.source_format,
+        )
 
     def _derive_biome_layers(self, metadata: HeightmapMetadata, target_style: str) -> List[BiomeLayer]:
-        low = (metadata.min_elevation, metadata.min_elevation + (metadata.max_elevation - metadata.min_elevation) * 0.25)
-        mid = (low[1], metadata.min_elevation + (metadata.max_elevation - metadata.min_elevation) * 0.6)
+        """Höhenbänder aus den Perzentilen (Tal bis Meereshöhe/p25, Wald bis p75),
+        Steigungsbereiche aus der Steigungsverteilung."""
+        span = metadata.max_elevation - metadata.min_elevation
+        heights = metadata.height_percentiles
+        low_top = max(metadata.sea_level, heights.get("p25", metadata.min_elevation + span * 0.25))
+        mid_top = max(low_top, heights.get("p75", metadata.min_elevation + span * 0.6))
+        low = (metadata.min_elevation, min(low_top, metadata.max_elevation))
+        mid = (low[1], min(mid_top, metadata.max_elevation))
         high = (mid[1], metadata.max_elevation)
+        slopes = self._slope_bands(metadata.slope_percentiles)
         biomes = [
             BiomeLayer(
                 name="water" if metadata.water_ratio > 0.15 else "valley",
                 elevation_range=low,
-                slope_range=(0.0, 0.3),
+                slope_range=slopes[0],
                 water_coverage=metadata.water_ratio,
                 weight=0.8,
                 transitions={"forest": 0.6, "swamp": 0.2},
@@ -162,7 +182,7 @@ class HeightmapProcessor:
             BiomeLayer(
                 name="forest" if target_style != "desert" else "steppe",
                 elevation_range=mid,
-                slope_range=(0.1, 0.6),
+                slope_range=slopes[1],
                 water_coverage=max(0.05, metadata.water_ratio * 0.5),
                 weight=1.0,
                 transitions={"mountain": 0.4},
@@ -170,7 +190,7 @@ class HeightmapProcessor:
             BiomeLayer(
                 name="mountain" if metadata.average_slope > 0.25 else "plateau",
                 elevation_range=high,
-                slope_range=(0.3, 1.0),
+                slope_range=slopes[2],
                 water_coverage=0.05,
                 weight=0.6,
                 transitions={"snow": 0.3 if target_style == "tundra" else 0.1},
@@ -178,6 +198,15 @@ class HeightmapProcessor:
         ]
         return biomes
 
+    @staticmethod
+    def _slope_bands(percentiles: Dict[str, float]) -> List[Tuple[float, float]]:
+        """Flach bis p50, mittel p25–p95, steil ab p75; ohne Verteilung die festen Standardbereiche."""
+        if not percentiles:
+            return [(0.0, 0.3), (0.1, 0.6), (0.3, 1.0)]
+        p25, p50, p75 = percentiles["p25"], percentiles["p50"], percentiles["p75"]
+        p95, p99 = percentiles["p95"], percentiles["p99"]
+        return [(0.0, round(p50, 4)), (round(p25, 4), round(p95, 4)), (round(p75, 4), round(max(p75, p99), 4))]
+
     def _calculate_landscape_settings(
         self,
         metadata: HeightmapMetadata,
@@ -0,0 +1,296 @@
+"""Vollauflösende Geländekennwerte (Höhen, Steigung, Krümmung, Wasser) mit NumPy.
+
+Die Heightmap wird in quadratischen Kacheln mit einem Pixel Rand (Halo)
+verarbeitet. Gradient und Laplace-Operator sehen so an Kachelgrenzen dieselben
+Nachbarn wie bei der Berechnung am Stück; gesammelt werden nur Histogramme und
+Summen, deren Speicherbedarf nicht von der Kartengröße abhängt. Höhen-Perzentile
+und Wasseranteil sind über ein Histogramm aller 65536 Höhenwerte exakt.
+
+Eingabe ist ein ``uint16``-Array oder eine
+:class:`~auto_pcg.terrain.heightmap_io.HeightmapSource`; bei letzterer liegt
+immer nur eine Kachel im Speicher.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .heightmap_io import HeightmapSource
+
+# UE-Standard: Z-Scale 100 überspannt 512 m, X/Y-Scale 100 entspricht 1 m je Pixel.
+DEFAULT_HEIGHT_RANGE_METERS = 512.0
+DEFAULT_PIXEL_SPACING_METERS = 1.0
+# Kantenlänge einer Kachel; 1024² Pixel halten die Zwischenspeicher bei einigen zehn MB.
+DEFAULT_TILE_SIZE = 1024
+# Auflösung des Steigungswinkel-Histogramms, aus dem die Perzentile stammen.
+SLOPE_BINS_PER_DEGREE = 10
+# Obergrenzen (Steigung als Tangens) des gemeldeten Steigungs-Histogramms.
+SLOPE_HISTOGRAM_BOUNDS = (0.05, 0.1, 0.2, 0.3, 0.45, 0.6, 0.8, 1.0, 1.5, math.inf)
+# Laplace-Beträge darunter (1/m) gelten als eben, nicht als konvex/konkav.
+CURVATURE_EPSILON = 1e-3
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+_HEIGHT_LEVELS = 65536
+
+
+@dataclass(slots=True)
+class TerrainStatistics:
+    """Kennwerte einer Heightmap; Höhen normiert auf 0–1, Steigungen als Tangens."""
+
+    min_elevation: float
+    max_elevation: float
+    mean_elevation: float
+    sea_level: float
+    water_ratio: float
+    average_slope: float
+    height_percentiles: Dict[str, float] = field(default_factory=dict)
+    slope_percentiles: Dict[str, float] = field(default_factory=dict)
+    # [Obergrenze der Steigung, Flächenanteil]; ``None`` steht für den Überlauf-Bucket.
+    slope_histogram: List[Tuple[Optional[float], float]] = field(default_factory=list)
+    curvature: Dict[str, float] = field(default_factory=dict)
+
+
+class TerrainStatsAccumulator:
+    """Sammelt Kennwerte kachelweise und fasst sie in :meth:`result` zusammen.
+
+    Jede Kachel kommt mit ihrem Halo (``window``); ``rows``/``cols`` markieren
+    den Kernbereich, der zu dieser Kachel gehört. Am Kartenrand fehlt der Halo,
+    dort gelten einseitige Differenzen bzw. gespiegelte Randwerte.
+    """
+
+    def __init__(
+        self,
+        *,
+        height_range: float = DEFAULT_HEIGHT_RANGE_METERS,
+        pixel_spacing: float = DEFAULT_PIXEL_SPACING_METERS,
+        sea_level: Optional[float] = None,
+    ) -> None:
+        if np is None:
+            raise RuntimeError("NumPy wird für die vollauflösende Geländeanalyse benötigt")
+        self.height_range = float(height_range)
+        self.pixel_spacing = float(pixel_spacing)
+        self.sea_level = sea_level
+        self._height_counts = np.zeros(_HEIGHT_LEVELS, dtype=np.int64)
+        self._slope_counts = np.zeros(90 * SLOPE_BINS_PER_DEGREE + 1, dtype=np.int64)
+        self._slope_sum = 0.0
+        self._curvature_abs_sum = 0.0
+        self._convex = 0
+        self._concave = 0
+        self._pixels = 0
+
+    def add_tile(self, window: "np.ndarray", rows: slice, cols: slice) -> None:
+        """Verbucht den Kern ``window[rows, cols]``; der Rest des Fensters ist Halo."""
+        core = window[rows, cols]
+        self._height_counts += np.bincount(core.ravel(), minlength=_HEIGHT_LEVELS)
+        self._pixels += core.size
+        heights = window.astype(np.float32) * np.float32(self.height_range / (_HEIGHT_LEVELS - 1))
+        grad_y = _gradient(heights, 0, self.pixel_spacing)[rows, cols]
+        grad_x = _gradient(heights, 1, self.pixel_spacing)[rows, cols]
+        slope = np.hypot(grad_x, grad_y)
+        del grad_x, grad_y
+        self._slope_sum += float(slope.sum(dtype=np.float64))
+        angle_bins = np.degrees(np.arctan(slope)) * SLOPE_BINS_PER_DEGREE
+        del slope
+        self._slope_counts += np.bincount(
+            np.minimum(angle_bins.astype(np.int32), len(self._slope_counts) - 1).ravel(),
+            minlength=len(self._slope_counts),
+        )
+        del angle_bins
+        padded = np.pad(heights, 1, mode="edge")
+        laplace = (
+            padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:] - 4.0 * heights
+        )[rows, cols] / np.float32(self.pixel_spacing**2)
+        del padded
+        self._curvature_abs_sum += float(np.abs(laplace).sum(dtype=np.float64))
+        self._convex += int(np.count_nonzero(laplace < -CURVATURE_EPSILON))
+        self._concave += int(np.count_nonzero(laplace > CURVATURE_EPSILON))
+
+    def merge(self, other: "TerrainStatsAccumulator") -> None:
+        """Übernimmt die Summen eines anderen Akkumulators (z. B. aus einem Worker)."""
+        self._height_counts += other._height_counts
+        self._slope_counts += other._slope_counts
+        self._slope_sum += other._slope_sum
+        self._curvature_abs_sum += other._curvature_abs_sum
+        self._convex += other._convex
+        self._concave += other._concave
+        self._pixels += other._pixels
+
+    def result(self) -> TerrainStatistics:
+        if not self._pixels:
+            return TerrainStatistics(0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        pixels = self._pixels
+        scale = float(_HEIGHT_LEVELS - 1)
+        counts = self._height_counts
+        occupied = np.flatnonzero(counts)
+        min_value = float(occupied[0]) / scale
+        max_value = float(occupied[-1]) / scale
+        mean_value = float(np.dot(counts, np.arange(_HEIGHT_LEVELS, dtype=np.float64))) / pixels / scale
+        cumulative = np.cumsum(counts)
+        sea_level = self.sea_level if self.sea_level is not None else min_value + (max_value - min_value) * 0.1
+        sea_index = int(min(_HEIGHT_LEVELS - 1, max(-1, math.floor(sea_level * scale))))
+        water_ratio = float(cumulative[sea_index]) / pixels if sea_index >= 0 else 0.0
+        slope_cumulative = np.cumsum(self._slope_counts)
+        return TerrainStatistics(
+            min_elevation=min_value,
+            max_elevation=max_value,
+            mean_elevation=round(mean_value, 6),
+            sea_level=round(sea_level, 6),
+            water_ratio=water_ratio,
+            average_slope=self._slope_sum / pixels,
+            height_percentiles={
+                f"p{percent}": round(_rank(cumulative, percent, pixels) / scale, 4) for percent in PERCENTILES
+            },
+            slope_percentiles={
+                f"p{percent}": round(_bin_tangent(_rank(slope_cumulative, percent, pixels) + 1), 4)
+                for percent in PERCENTILES
+            },
+            slope_histogram=self._slope_histogram(slope_cumulative, pixels),
+            curvature={
+                "mean_abs": round(self._curvature_abs_sum / pixels, 6),
+                "convex_ratio": round(self._convex / pixels, 4),
+                "concave_ratio": round(self._concave / pixels, 4),
+            },
+        )
+
+    @staticmethod
+    def _slope_histogram(cumulative: "np.ndarray", pixels: int) -> List[Tuple[Optional[float], float]]:
+        histogram: List[Tuple[Optional[float], float]] = []
+        previous = 0
+        for bound in SLOPE_HISTOGRAM_BOUNDS:
+            if math.isinf(bound):
+                upper = int(cumulative[-1])
+            else:
+                index = int(math.degrees(math.atan(bound)) * SLOPE_BINS_PER_DEGREE) - 1
+                upper = int(cumulative[index]) if index >= 0 else 0
+            histogram.append((None if math.isinf(bound) else bound, round((upper - previous) / pixels, 4)))
+            previous = upper
+        return histogram
+
+
+def compute_statistics(
+    heights: Union["np.ndarray", "HeightmapSource"],
+    *,
+    height_range: float = DEFAULT_HEIGHT_RANGE_METERS,
+    pixel_spacing: float = DEFAULT_PIXEL_SPACING_METERS,
+    sea_level: Optional[float] = None,
+    tile_size: int = DEFAULT_TILE_SIZE,
+) -> TerrainStatistics:
+    """Kennwerte eines ``(height, width)``-``uint16``-Arrays oder einer Heightmap-Quelle, kachelweise."""
+    accumulator = TerrainStatsAccumulator(height_range=height_range, pixel_spacing=pixel_spacing, sea_level=sea_level)
+    read_window = getattr(heights, "read_window", None) or (lambda rows, cols: heights[rows, cols])
+    height, width = heights.shape
+    for window_rows, window_cols, core_rows, core_cols in halo_tiles(height, width, tile_size):
+        accumulator.add_tile(read_window(window_rows, window_cols), core_rows, core_cols)
+    return accumulator.result()
+
+
+def halo_tiles(
+    height: int,
+    width: int,
+    tile_size: int = DEFAULT_TILE_SIZE,
+) -> Iterator[Tuple[slice, slice, slice, slice]]:
+    """Kacheln in Zeilenreihenfolge: Fenster (mit Halo) in Kartenkoordinaten, Kern relativ zum Fenster.
+
+    Der Halo ist ein Pixel breit und fehlt am Kartenrand.
+    """
+    tile_size = max(1, int(tile_size))
+    for row_start in range(0, height, tile_size):
+        row_stop = min(height, row_start + tile_size)
+        top, bottom = max(0, row_start - 1), min(height, row_stop + 1)
+        for col_start in range(0, width, tile_size):
+            col_stop = min(width, col_start + tile_size)
+            left, right = max(0, col_start - 1), min(width, col_stop + 1)
+            yield (
+                slice(top, bottom),
+                slice(left, right),
+                slice(row_start - top, row_stop - top),
+                slice(col_start - left, col_stop - left),
+            )
+
+
+def sampled_statistics(
+    values: Sequence[int],
+    width: int,
+    *,
+    height_range: float = DEFAULT_HEIGHT_RANGE_METERS,
+    pixel_spacing: float = DEFAULT_PIXEL_SPACING_METERS,
+    sea_level: Optional[float] = None,
+    sample_count: int = 4096,
+) -> TerrainStatistics:
+    """Grobe Schätzung ohne NumPy aus gleichmäßig verteilten Stichproben.
+
+    ``values`` sind alle Höhen (0–65535) zeilenweise mit ``width`` Spalten. Die
+    Steigung je Stichprobe stammt wie bei :func:`compute_statistics` aus den
+    direkten Nachbarpixeln und ist ein metrischer Tangens.
+    """
+    if not values or width <= 0:
+        return TerrainStatistics(0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    step = max(1, len(values) // max(1, sample_count))
+    indices = range(0, len(values), step)
+    samples = [int(values[index]) for index in indices]
+    ordered = sorted(samples)
+    scale = float(_HEIGHT_LEVELS - 1)
+    min_value, max_value = ordered[0] / scale, ordered[-1] / scale
+    level = sea_level if sea_level is not None else min_value + (max_value - min_value) * 0.1
+    meters_per_level = float(height_range) / scale
+    slopes = [
+        math.hypot(
+            _neighbour_difference(values, index, 1, index % width, width),
+            _neighbour_difference(values, index, width, index // width, len(values) // width),
+        )
+        * meters_per_level
+        / float(pixel_spacing)
+        for index in indices
+    ]
+    return TerrainStatistics(
+        min_elevation=min_value,
+        max_elevation=max_value,
+        mean_elevation=sum(samples) / len(samples) / scale,
+        sea_level=level,
+        water_ratio=sum(1 for value in samples if value / scale <= level) / len(samples),
+        average_slope=sum(slopes) / len(slopes),
+        height_percentiles={
+            f"p{percent}": round(ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] / scale, 4)
+            for percent in PERCENTILES
+        },
+    )
+
+
+# Intern ----------------------------------------------------------------------------
+
+
+def _gradient(heights: "np.ndarray", axis: int, spacing: float) -> "np.ndarray":
+    """Zentrale Differenzen (am Rand einseitig); bei nur einer Zeile/Spalte 0."""
+    if heights.shape[axis] < 2:
+        return np.zeros_like(heights)
+    return np.gradient(heights, spacing, axis=axis)
+
+
+def _neighbour_difference(values: Sequence[int], index: int, stride: int, position: int, length: int) -> float:
+    """Höhendifferenz je Pixel entlang einer Achse wie ``np.gradient`` (am Rand einseitig)."""
+    if length < 2:
+        return 0.0
+    if position == 0:
+        return float(values[index + stride]) - float(values[index])
+    if position == length - 1:
+        return float(values[index]) - float(values[index - stride])
+    return (float(values[index + stride]) - float(values[index - stride])) / 2.0
+
+
+def _rank(cumulative: "np.ndarray", percent: float, total: int) -> int:
+    """Index des Buckets, der das ``percent``-Perzentil enthält (Nearest-Rank)."""
+    target = max(1, math.ceil(total * percent / 100.0))
+    return int(np.searchsorted(cumulative, target))
+
+
+def _bin_tangent(upper_bin: int) -> float:
+    """Steigung (Tangens) an der Obergrenze eines Winkel-Buckets."""
+    degrees = min(90.0, upper_bin / SLOPE_BINS_PER_DEGREE)
+    return math.tan(math.radians(min(degrees, 89.9)))